@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+"""
+Synthetic VEP annotated vcf files with matching gene list, male list and inner-freq json for benchmarks
+
+usage: python generate_vcf.py outdir --variants 100000 --samples 1 --transcripts 4 --files 1
+
+"""
+
+import os
+import gzip
+import json
+import random
+import argparse
+
+VEP_COLUMNS = [
+    'Allele', 'Consequence', 'IMPACT', 'SYMBOL', 'Gene', 'Feature_type', 'Feature', 'BIOTYPE', 'EXON', 'INTRON',
+    'HGVSc', 'HGVSp', 'cDNA_position', 'CDS_position', 'Protein_position', 'Amino_acids', 'Codons',
+    'Existing_variation', 'DISTANCE', 'STRAND', 'FLAGS', 'SYMBOL_SOURCE', 'HGNC_ID', 'CANONICAL', 'TSL', 'APPRIS',
+    'CCDS', 'ENSP', 'SWISSPROT', 'TREMBL', 'UNIPARC', 'SIFT', 'PolyPhen', 'DOMAINS', 'AFR_AF', 'AMR_AF', 'EAS_AF',
+    'EUR_AF', 'SAS_AF', 'gnomAD_AF', 'gnomAD_AFR_AF', 'gnomAD_AMR_AF', 'gnomAD_ASJ_AF', 'gnomAD_EAS_AF',
+    'gnomAD_FIN_AF', 'gnomAD_NFE_AF', 'gnomAD_OTH_AF', 'gnomAD_SAS_AF', 'CLIN_SIG', 'SOMATIC', 'PHENO',
+    'MOTIF_NAME', 'MOTIF_POS', 'HIGH_INF_POS', 'MOTIF_SCORE_CHANGE', 'MPC'
+]
+
+HEADER = """##fileformat=VCFv4.2
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=LowQual,Description="Low quality">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Approximate read depth (reads with MQ=255 or with bad mates are filtered)">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##INFO=<ID=1000GAF,Number=1,Type=Float,Description="Frequency in the 1000G database.">
+##INFO=<ID=CADD,Number=1,Type=Float,Description="The CADD relative score for this alternative.">
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Approximate read depth; some reads may have been filtered">
+##INFO=<ID=EXACAF,Number=A,Type=Float,Description="Allele Frequency, for each ALT allele, in the same order as listed">
+##INFO=<ID=MQ,Number=1,Type=Float,Description="RMS Mapping Quality">
+##INFO=<ID=QD,Number=1,Type=Float,Description="Variant Confidence/Quality by Depth">
+##INFO=<ID=SPIDEX,Number=1,Type=Float,Description="Z score from the spidex database.">
+##INFO=<ID=SWEGENAF,Number=A,Type=Float,Description="Allele Frequency, for each ALT allele, in the same order as listed">
+##INFO=<ID=dbNSFP_phyloP100way_vertebrate,Number=A,Type=Float,Description="Field 'phyloP100way_vertebrate' from dbNSFP">
+##INFO=<ID=set,Number=1,Type=String,Description="Source VCF for the merged record in CombineVariants">
+##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. Format: {0}">
+"""
+
+CHROMS = [str(i) for i in range(1, 23)] + ['X', 'Y']
+
+CONSEQUENCES = [
+    'missense_variant', 'missense_variant', 'synonymous_variant', 'intron_variant', 'intron_variant',
+    'upstream_gene_variant', '3_prime_UTR_variant', 'missense_variant&splice_region_variant',
+    'stop_gained', 'frameshift_variant', 'splice_donor_variant&intron_variant', 'start_lost'
+]
+SIFT = ['', 'tolerated(0.3)', 'deleterious(0.01)', 'deleterious_low_confidence(0.02)']
+POLYPHEN = ['', 'benign(0)', 'possibly_damaging(0.6)', 'probably_damaging(0.99)']
+SETS = ['Intersection', 'Intersection', 'freebayes-gatk', 'gatk-samtools', 'gatk', 'freebayes', 'samtools']
+GENOTYPES = ['0/1', '0/1', '1/1', '1/0', './1', '1/.']
+
+
+def make_genes(n_genes=2000, seed=1):
+    """
+    Synthetic genes
+    Return:
+        list of (chrom, symbol, ensembl gene ID)
+
+    """
+    rng = random.Random(seed)
+    genes = []
+    for i in range(n_genes):
+        chrom = rng.choice(CHROMS[:-1]) if i % 20 else rng.choice(['X', 'Y'])
+        genes.append((chrom, 'GENE{0}'.format(i), 'ENSG9{0:010d}'.format(i)))
+    return genes
+
+
+def write_gene_list(genefile, genes, fraction=0.3, seed=1):
+    """
+    Disorder related gene list (symbol,ensembl gene ID,inheritance) with a fraction of the genes
+
+    """
+    rng = random.Random(seed)
+    with open(genefile, mode='w') as gene_file:
+        for chrom, symbol, gene in genes:
+            if rng.random() >= fraction:
+                continue
+            if chrom in ('X', 'Y'):
+                mode = rng.choice(['XR', 'XD', 'XR|XD'])
+            else:
+                mode = rng.choice(['AR', 'AD', 'AR|AD'])
+            gene_file.write('{0},{1},{2}\n'.format(symbol, gene, mode))
+
+
+def write_male_list(genderfile, samples, seed=1):
+    """
+    Male sample IDs, about half of the samples
+
+    """
+    rng = random.Random(seed)
+    with open(genderfile, mode='w') as gender_file:
+        for sample in samples:
+            if rng.random() < 0.5:
+                gender_file.write(sample + '\n')
+
+
+def csq_transcript(rng, symbol, gene):
+    vep = [''] * len(VEP_COLUMNS)
+    vep[0] = 'G'
+    vep[1] = rng.choice(CONSEQUENCES)
+    vep[2] = rng.choice(['HIGH', 'MODERATE', 'LOW', 'MODIFIER'])
+    vep[3] = symbol
+    vep[4] = gene
+    vep[5] = 'Transcript'
+    vep[6] = 'ENST9{0:010d}'.format(rng.randrange(10 ** 9))
+    vep[7] = 'protein_coding'
+    vep[19] = rng.choice(['1', '-1'])
+    vep[31] = rng.choice(SIFT)
+    vep[32] = rng.choice(POLYPHEN)
+    if rng.random() < 0.6:
+        vep[39] = '{0:.5g}'.format(rng.random() ** 5)
+        for i in range(40, 48):
+            vep[i] = '{0:.4g}'.format(rng.random() ** 5)
+    vep[55] = rng.choice(['', 'NA', '{0:.3f}'.format(rng.uniform(0, 4))])
+    return '|'.join(vep)
+
+
+def write_vcf(vcffile, genes, variants=10000, samples=('SAMPLE1',), transcripts=4, seed=1):
+    """
+    Write a synthetic VEP annotated vcf file, gzipped when the file name ends with .gz
+    Arguments:
+        vcffile: output vcf file;
+        genes: list of (chrom, symbol, ensembl gene ID) from make_genes;
+        variants: number of variant lines;
+        samples: sample IDs;
+        transcripts: maximum number of VEP transcripts per variant;
+        seed: random seed
+    Return:
+        list of variant keys (chrom:pos:id:ref:alt)
+
+    """
+    rng = random.Random(seed)
+    by_chrom = {}
+    for chrom, symbol, gene in genes:
+        by_chrom.setdefault(chrom, []).append((symbol, gene))
+    chroms = [chrom for chrom in CHROMS if chrom in by_chrom]
+    per_chrom = -(-variants // len(chroms))
+
+    handle = gzip.open(vcffile, mode='wt') if vcffile.endswith('.gz') else open(vcffile, mode='w')
+    keys = []
+    with handle as vcf:
+        vcf.write(HEADER.format('|'.join(VEP_COLUMNS)))
+        for chrom in chroms:
+            vcf.write('##contig=<ID={0},length=250000000>\n'.format(chrom))
+        vcf.write('\t'.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT'] + list(samples)))
+        vcf.write('\n')
+        for n in range(variants):
+            chrom = chroms[n // per_chrom]
+            if n % per_chrom == 0:
+                pos = 10000
+            pos += rng.randint(1, 2000)
+            ref, alt = rng.choice([('A', 'G'), ('C', 'T'), ('G', 'A'), ('T', 'C'), ('AT', 'A'), ('C', 'CA')])
+            var_id = 'rs{0}'.format(rng.randrange(10 ** 8)) if rng.random() < 0.4 else '.'
+
+            info = []
+            if rng.random() < 0.95:
+                info.append('DP={0}'.format(rng.randint(1, 150)))
+            if rng.random() < 0.9:
+                info.append('QD={0:.2f}'.format(rng.uniform(0, 35)))
+            if rng.random() < 0.9:
+                info.append('MQ={0:.2f}'.format(rng.uniform(20, 60)))
+            for field in ('1000GAF', 'EXACAF', 'SWEGENAF'):
+                if rng.random() < 0.5:
+                    info.append('{0}={1:.4g}'.format(field, rng.random() ** 4))
+            if rng.random() < 0.7:
+                info.append('CADD={0:.3f}'.format(rng.uniform(0, 40)))
+            if rng.random() < 0.3:
+                info.append('SPIDEX={0:.3f}'.format(rng.uniform(-5, 5)))
+            if rng.random() < 0.6:
+                info.append('dbNSFP_phyloP100way_vertebrate={0:.3f}'.format(rng.uniform(-3, 8)))
+            info.append('set=' + rng.choice(SETS))
+            symbol, gene = rng.choice(by_chrom[chrom])
+            info.append('CSQ=' + ','.join(
+                csq_transcript(rng, symbol, gene) for i in range(rng.randint(1, transcripts))
+            ))
+
+            genotypes = [rng.choice(GENOTYPES) if len(samples) == 1 or rng.random() < 0.3 else '0/0'
+                         for sample in samples]
+            vcf.write('\t'.join(
+                [chrom, str(pos), var_id, ref, alt, '{0:.2f}'.format(rng.uniform(10, 3000)),
+                 'PASS' if rng.random() < 0.8 else 'LowQual', ';'.join(info), 'GT:DP']
+                + ['{0}:{1}'.format(gt, rng.randint(1, 99)) for gt in genotypes]
+            ))
+            vcf.write('\n')
+            keys.append(':'.join([chrom, str(pos), var_id, ref, alt]))
+    return keys
+
+
+def write_inner_freq(innerfreqfile, keys, seed=1):
+    """
+    Inner-freq json {variant: frequency} for the variants of the generated vcf files
+
+    """
+    rng = random.Random(seed)
+    with open(innerfreqfile, mode='w') as inner_file:
+        json.dump({key: round(rng.random() ** 3 * 0.05, 6) for key in keys}, inner_file)
+
+
+def generate(outdir, variants=10000, samples=1, transcripts=4, files=1, n_genes=2000, compress=False, seed=1):
+    """
+    Generate a benchmark data set
+    Arguments:
+        outdir: output directory;
+        variants: variant lines per vcf file;
+        samples: samples per vcf file;
+        transcripts: maximum number of VEP transcripts per variant;
+        files: number of vcf files, the files are written to outdir/vcf;
+        n_genes: number of synthetic genes;
+        compress: write .vcf.gz instead of .vcf;
+        seed: random seed
+    Return:
+        dictionary of the generated files {'vcf': [], 'genefile': '', 'genderfile': '', 'innerfreqfile': ''}
+
+    """
+    vcf_dir = os.path.join(outdir, 'vcf')
+    os.makedirs(vcf_dir, exist_ok=True)
+    genes = make_genes(n_genes, seed=seed)
+    data = {
+        'vcf': [],
+        'genefile': os.path.join(outdir, 'gene_list.csv'),
+        'genderfile': os.path.join(outdir, 'male_list.txt'),
+        'innerfreqfile': os.path.join(outdir, 'inner_freq.json'),
+    }
+    all_samples = []
+    keys = set()
+    for i in range(files):
+        sample_ids = ['SAMPLE{0}'.format(i * samples + j + 1) for j in range(samples)]
+        all_samples.extend(sample_ids)
+        vcffile = os.path.join(vcf_dir, 'sample{0}.vcf{1}'.format(i + 1, '.gz' if compress else ''))
+        keys.update(write_vcf(vcffile, genes, variants=variants, samples=sample_ids,
+                              transcripts=transcripts, seed=seed + i))
+        data['vcf'].append(vcffile)
+    write_gene_list(data['genefile'], genes, seed=seed)
+    write_male_list(data['genderfile'], all_samples, seed=seed)
+    write_inner_freq(data['innerfreqfile'], sorted(keys), seed=seed)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic VEP annotated vcf files for benchmarks')
+    parser.add_argument('outdir')
+    parser.add_argument('--variants', type=int, default=10000, help='variant lines per vcf file')
+    parser.add_argument('--samples', type=int, default=1, help='samples per vcf file')
+    parser.add_argument('--transcripts', type=int, default=4, help='maximum VEP transcripts per variant')
+    parser.add_argument('--files', type=int, default=1, help='number of vcf files')
+    parser.add_argument('--genes', type=int, default=2000, help='number of synthetic genes')
+    parser.add_argument('--gzip', action='store_true', help='write .vcf.gz files')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    data = generate(args.outdir, variants=args.variants, samples=args.samples, transcripts=args.transcripts,
+                    files=args.files, n_genes=args.genes, compress=args.gzip, seed=args.seed)
+    print(json.dumps(data, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+"""
+Measure the memory of one parsed variant of each record type (dict, lazy, compact) with tracemalloc
+on synthetic data, together with the test conditions (VEP columns, transcripts and INFO fields per variant)
+
+usage: python record_memory.py --variants 5000 --transcripts 4 --seed 1 --json memory.json
+
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vcf_varselect.variant_selection import open_vcf, read_vcf_header
+from vcf_varselect.read_variant import read_variant
+from generate_vcf import generate
+
+
+def read_lines(vcffile):
+    """
+    Header parser and variant lines of a vcf file
+
+    """
+    vcf = open_vcf(vcffile)
+    metadata, sample, next_line = read_vcf_header(vcf)
+    lines = []
+    while next_line:
+        lines.append(next_line)
+        next_line = vcf.readline().rstrip()
+    vcf.close()
+    return metadata, lines
+
+
+def record_bytes(metadata, lines, record, read_all=False):
+    """
+    Traced bytes per variant of the parsed variants of the lines, without the list holding them and the
+    variant keys
+    Arguments:
+        metadata: MetadataParser of the vcf header;
+        lines: variant lines;
+        record: 'dict', 'lazy' or 'compact';
+        read_all: read every field of each variant once after parsing, e.g. to decode lazy variants
+
+    """
+    # parse once so that interned strings and shared layouts are not counted
+    read_variant(lines[0], metadata, record=record)
+    tracemalloc.start()
+    variants = [None] * len(lines)
+    before = tracemalloc.get_traced_memory()[0]
+    for i, line in enumerate(lines):
+        # the variant without the {key: variant} dictionary of read_variant
+        variants[i] = next(iter(read_variant(line, metadata, record=record).values()))
+    if read_all:
+        for variant in variants:
+            for field in variant:
+                variant[field]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / float(len(lines))
+
+
+def conditions(metadata, lines):
+    """
+    VEP columns, mean transcripts and mean INFO fields per variant of the lines
+
+    """
+    transcripts = 0
+    info_fields = 0
+    for line in lines:
+        info = line.split('\t')[7].split(';')
+        info_fields += len(info)
+        for item in info:
+            if item.startswith('CSQ='):
+                transcripts += item.count(',') + 1
+    return {'vep_columns': len(metadata.vep_columns), 'transcripts_per_variant': transcripts / float(len(lines)),
+            'info_fields_per_variant': info_fields / float(len(lines))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per parsed variant of each record type')
+    parser.add_argument('--variants', type=int, default=5000, help='variant lines of the vcf file')
+    parser.add_argument('--transcripts', type=int, default=4, help='maximum VEP transcripts per variant')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the results to a json file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='vcf_varselect_memory_')
+    try:
+        data = generate(workdir, variants=args.variants, transcripts=args.transcripts, n_genes=200, seed=args.seed)
+        metadata, lines = read_lines(data['vcf'][0])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = conditions(metadata, lines)
+    result['bytes_per_variant'] = {
+        'dict': record_bytes(metadata, lines, 'dict'),
+        'lazy': record_bytes(metadata, lines, 'lazy'),
+        'lazy, every field read': record_bytes(metadata, lines, 'lazy', read_all=True),
+        'compact': record_bytes(metadata, lines, 'compact'),
+    }
+    print('{0} variants, {1} VEP columns, {2:.2f} transcripts and {3:.1f} INFO fields per variant'.format(
+        len(lines), result['vep_columns'], result['transcripts_per_variant'], result['info_fields_per_variant']))
+    for record, size in result['bytes_per_variant'].items():
+        print('{0:<24}{1:>8.2f} kB'.format(record, size / 1024.0))
+    if args.json:
+        with open(args.json, mode='w') as json_file:
+            json.dump(dict(result, parameters=vars(args), python=platform.python_version()), json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
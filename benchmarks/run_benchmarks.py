@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+"""
+Time each stage of variant selection on synthetic data and report throughput and peak RSS
+
+usage: python run_benchmarks.py --variants 100000 --samples 1 --transcripts 4 --files 4 --json result.json
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vcf_varselect.variant_selection import VariantSelection, open_vcf, read_vcf_header
+from vcf_varselect.read_variant import read_variant
+from vcf_varselect.match_gene import match_gene
+from vcf_varselect.dict_to_df import dict_to_df
+from vcf_varselect.sample_combine import sample_combine
+from vcf_varselect.profiler import peak_rss_mb
+from generate_vcf import generate
+
+CRITERIA = ['SIFT', 'POLYPHEN', 'MPC', 'CADD', 'SPIDEX', 'PHYLOP']
+QUALITY = dict(FILTER='PASS', DP=10.0, QD=2.0, MQ=40.0)
+FREQ = dict(KG=0.01, EXAC=0.01, GNOMAD=0.01, SWEGEN=0.01)
+
+
+class Benchmark(object):
+    """
+    Collect the wall time, record count, throughput and peak RSS of each stage
+
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, stage, func, records=None):
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+        self.stages.append({
+            'stage': stage,
+            'seconds': seconds,
+            'records': records,
+            'records_per_second': records / seconds if records and seconds else None,
+            'peak_rss_mb': peak_rss_mb(),
+        })
+        return value
+
+    def report(self):
+        lines = ['{0:<22}{1:>10}{2:>12}{3:>14}{4:>14}'.format('stage', 'seconds', 'records', 'records/s', 'peak RSS MB')]
+        for stage in self.stages:
+            lines.append('{0:<22}{1:>10.3f}{2:>12}{3:>14}{4:>14}'.format(
+                stage['stage'], stage['seconds'],
+                '' if stage['records'] is None else stage['records'],
+                '' if stage['records_per_second'] is None else '{0:.0f}'.format(stage['records_per_second']),
+                '' if stage['peak_rss_mb'] is None else '{0:.1f}'.format(stage['peak_rss_mb'])
+            ))
+        return '\n'.join(lines)
+
+
+def read_lines(vcffile, record):
+    """
+    Parse every variant line of a vcf file with read_variant, without keeping the variants
+
+    """
+    vcf = open_vcf(vcffile)
+    metadata, sample, next_line = read_vcf_header(vcf)
+    n = 0
+    while next_line:
+        read_variant(next_line, metadata, record=record)
+        n += 1
+        next_line = vcf.readline().rstrip()
+    vcf.close()
+    return n
+
+
+def benchmark(data, variants, record='dict', workers=None):
+    """
+    Run every stage on a generated data set
+    Arguments:
+        data: generated files from generate_vcf.generate;
+        variants: variant lines per vcf file;
+        record: variant record type of VariantSelection;
+        workers: worker processes of sample_combine
+    Return:
+        Benchmark object
+
+    """
+    bench = Benchmark()
+    vcffile = data['vcf'][0]
+
+    def header():
+        vcf = open_vcf(vcffile)
+        read_vcf_header(vcf)
+        vcf.close()
+
+    bench.run('header', header)
+    bench.run('read_variant', lambda: read_lines(vcffile, record), records=variants)
+    vcf = bench.run('VariantSelection', lambda: VariantSelection(infile=vcffile, record=record), records=variants)
+    bench.run('quality_selection', lambda: vcf.quality_selection(**QUALITY), records=variants)
+    bench.run('freq_selection', lambda: vcf.freq_selection(innerfreqfile=data['innerfreqfile'], **FREQ),
+              records=variants)
+    bench.run('damaging_selection', lambda: vcf.damaging_selection(criteria=CRITERIA), records=variants)
+    damage, lof, mis = bench.run('comb_selection', lambda: vcf.comb_selection(
+        innerfreqfile=data['innerfreqfile'], criteria=CRITERIA, **dict(QUALITY, **FREQ)), records=variants)
+    n_damage = sum(len(i) for i in damage.values())
+    gene_var = bench.run('match_gene', lambda: match_gene(
+        damage, genefile=data['genefile'], genderfile=data['genderfile']), records=n_damage)
+    bench.run('dict_to_df', lambda: dict_to_df(gene_var), records=sum(len(i) for i in gene_var.values()))
+    bench.run('sample_combine', lambda: sample_combine(
+        os.path.dirname(vcffile), data['innerfreqfile'], data['genefile'], data['genderfile'],
+        criteria=CRITERIA, workers=workers, **dict(QUALITY, **FREQ)), records=variants * len(data['vcf']))
+    return bench
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each stage of variant selection on synthetic data')
+    parser.add_argument('--variants', type=int, default=20000, help='variant lines per vcf file')
+    parser.add_argument('--samples', type=int, default=1, help='samples per vcf file')
+    parser.add_argument('--transcripts', type=int, default=4, help='maximum VEP transcripts per variant')
+    parser.add_argument('--files', type=int, default=4, help='vcf files for sample_combine')
+    parser.add_argument('--record', default='dict', choices=['dict', 'lazy', 'compact'])
+    parser.add_argument('--workers', type=int, default=None, help='worker processes of sample_combine')
+    parser.add_argument('--gzip', action='store_true', help='benchmark .vcf.gz files')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help='directory of the generated data, a temporary directory when not given')
+    parser.add_argument('--json', help='write the results to a json file')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='vcf_varselect_bench_')
+    try:
+        start = time.perf_counter()
+        data = generate(workdir, variants=args.variants, samples=args.samples, transcripts=args.transcripts,
+                        files=args.files, compress=args.gzip, seed=args.seed)
+        print('generated {0} file(s) in {1:.1f}s'.format(len(data['vcf']), time.perf_counter() - start))
+        bench = benchmark(data, args.variants, record=args.record, workers=args.workers)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(bench.report())
+    if args.json:
+        with open(args.json, mode='w') as json_file:
+            json.dump({
+                'parameters': vars(args),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'stages': bench.stages,
+            }, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,9 @@ setup(name='vcf_varselect',
     url = '',
     license = 'MIT License',
     packages = ['vcf_varselect'],
+    entry_points = {
+        'console_scripts': ['vcf_varselect = vcf_varselect.cli:main'],
+    },
     keywords = [
         'Variants'
         'VCF',
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from generate_vcf import generate
+
+
+@pytest.fixture(scope='session')
+def single(tmp_path_factory):
+    """
+    Synthetic single-sample data set: {'vcf': [vcf file], 'genefile', 'genderfile', 'innerfreqfile'}
+
+    """
+    return generate(str(tmp_path_factory.mktemp('single')), variants=2000, samples=1, n_genes=200)
+
+
+@pytest.fixture(scope='session')
+def multi(tmp_path_factory):
+    """
+    Synthetic data set with one vcf file of 4 samples
+
+    """
+    return generate(str(tmp_path_factory.mktemp('multi')), variants=1000, samples=4, n_genes=200, seed=3)
+
+
+@pytest.fixture(scope='session')
+def cohort(tmp_path_factory):
+    """
+    Synthetic data set of 3 single-sample vcf files
+
+    """
+    return generate(str(tmp_path_factory.mktemp('cohort')), variants=500, samples=1, files=3, n_genes=200, seed=5)
+
+
+def _missing_values(line, gnomad, n):
+    """
+    Variant line with '.' for some numeric INFO values and '', '.' or nan for some gnomAD_AF values
+
+    """
+    fields = line.split('\t')
+    info = []
+    for i, item in enumerate(fields[7].split(';')):
+        ID, _, value = item.partition('=')
+        if ID in ('DP', 'QD', 'MQ', '1000GAF', 'EXACAF', 'SWEGENAF') and (n + i) % 4 == 0:
+            item = ID + '=.'
+        elif ID == 'CSQ':
+            transcripts = []
+            for j, transcript in enumerate(value.split(',')):
+                columns = transcript.split('|')
+                if (n + j) % 3 == 0:
+                    columns[gnomad] = ['', '.', 'nan'][(n + j) % 9 // 3]
+                transcripts.append('|'.join(columns))
+            item = 'CSQ=' + ','.join(transcripts)
+        info.append(item)
+    fields[7] = ';'.join(info)
+    return '\t'.join(fields)
+
+
+@pytest.fixture(scope='session')
+def missing_values(single, tmp_path_factory):
+    """
+    Copy of the single-sample vcf file with missing INFO values ('.') and missing gnomAD_AF values
+    ('', '.' and nan) on some transcripts
+
+    """
+    vcffile = str(tmp_path_factory.mktemp('missing') / 'missing_values.vcf')
+    gnomad = None
+    n = 0
+    with open(single['vcf'][0], mode='r') as vcf, open(vcffile, mode='w') as out:
+        for line in vcf:
+            if line.startswith('##INFO=<ID=CSQ'):
+                gnomad = line.split('Format: ')[1].split('"')[0].split('|').index('gnomAD_AF')
+            elif not line.startswith('#'):
+                line = _missing_values(line, gnomad, n)
+                n += 1
+            out.write(line)
+    return dict(single, vcf=[vcffile])
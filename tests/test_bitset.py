@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import random
+
+import pytest
+
+from vcf_varselect import bitset
+from vcf_varselect.bitset import to_bitset, bitset_indexes, bitset_count, indexes_to_bitset, at_least
+
+
+def reference(flags):
+    return sum(1 << i for i, flag in enumerate(flags) if flag)
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(bitset, 'np', None)
+        monkeypatch.setattr(bitset, '_BIT_COUNT', False)
+    return request.param
+
+
+@pytest.mark.parametrize('n', [0, 1, 7, 8, 9, 64, 1000, 100003])
+@pytest.mark.parametrize('density', [0.0, 0.001, 0.3, 1.0])
+def test_round_trip(backend, n, density):
+    rng = random.Random(n)
+    flags = [rng.random() < density for i in range(n)]
+    bits = reference(flags)
+    assert to_bitset(flags) == bits
+    assert to_bitset(bytearray(flags)) == bits
+    assert bitset_indexes(bits) == [i for i, flag in enumerate(flags) if flag]
+    assert bitset_count(bits) == sum(flags)
+    assert indexes_to_bitset(bitset_indexes(bits)) == bits
+
+
+def test_flags_of_other_types(backend):
+    assert to_bitset([0, 2, 1, 8, 0]) == 0b1110
+    assert to_bitset([None, 'x', 0.5, 300]) == 0b1110
+    if backend == 'numpy':
+        import numpy as np
+        assert to_bitset(np.array([True, False, True])) == 0b101
+        assert to_bitset(np.array([0, 3, 0, 7])) == 0b1010
+        assert to_bitset(list(np.array([True, False, True]))) == 0b101
+
+
+def test_at_least():
+    bitsets = [0b1011, 0b0110, 0b1100]
+    assert at_least(bitsets, 1) == 0b1111
+    assert at_least(bitsets, 2) == 0b1110
+    assert at_least(bitsets, 3) == 0
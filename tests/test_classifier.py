@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import pytest
+
+from vcf_varselect import VariantSelection, FilterPipeline, comb_spec
+from vcf_varselect import record_selection
+from vcf_varselect.record_selection import Classifier, get_classifier, damaging_check, LOF_TERMS, LOF, MISSENSE, \
+    DELETERIOUS, DAMAGING
+
+# loss-of-function terms of the synthetic data without stop_gained and start_lost, and with a missense term
+CUSTOM_TERMS = ['frameshift_variant', 'splice_donor_variant', 'splice_region_variant']
+
+
+def lof_keys(vcf, lof_terms):
+    """
+    Variants with a Consequence containing one of the terms, from variant callers other than one caller alone
+
+    """
+    return sorted(
+        key for key, variant in vcf.sites.items()
+        if variant['set'] not in (['freebayes'], ['gatk'], ['samtools'])
+        and any(term in value for value in variant['CSQ']['Consequence'] for term in lof_terms)
+    )
+
+
+def test_get_classifier_is_shared_per_terms():
+    assert get_classifier() is get_classifier(LOF_TERMS) is get_classifier(list(LOF_TERMS))
+    custom = get_classifier(CUSTOM_TERMS)
+    assert custom is get_classifier(tuple(CUSTOM_TERMS)) and custom is not get_classifier()
+    assert custom.lof_terms == tuple(CUSTOM_TERMS)
+    assert custom.classify('stop_gained') == 0 and get_classifier().classify('stop_gained') == LOF
+    assert custom.classify('missense_variant&splice_region_variant') == LOF | MISSENSE
+    assert get_classifier().classify('missense_variant&splice_region_variant') == MISSENSE
+
+
+def test_custom_lof_terms_change_lof(single):
+    vcf = VariantSelection(single['vcf'][0])
+    default = vcf.damaging_selection(criteria=['SIFT'])[1][vcf.sample]
+    custom = vcf.damaging_selection(criteria=['SIFT'], lof_terms=CUSTOM_TERMS)[1][vcf.sample]
+    assert sorted(default) == lof_keys(vcf, LOF_TERMS)
+    assert sorted(custom) == lof_keys(vcf, CUSTOM_TERMS)
+    assert set(custom) - set(default) and set(default) - set(custom)
+    # the classifier of the custom terms does not change the default classification
+    assert vcf.damaging_selection(criteria=['SIFT'])[1][vcf.sample] == default
+
+    assert sorted(key for key, variant in vcf.sites.items()
+                  if damaging_check(variant, lof_terms=CUSTOM_TERMS)[0]) == sorted(custom)
+    lof = vcf.comb_selection(DP=10, criteria=['SIFT'], lof_terms=CUSTOM_TERMS)[1][vcf.sample]
+    pipeline = FilterPipeline(comb_spec(DP=10) + ['lof'], lof_terms=CUSTOM_TERMS)
+    assert sorted(key for key, variant in pipeline.filter(vcf.sites)) == sorted(lof)
+    streamed = VariantSelection.stream(single['vcf'][0], DP=10, criteria=['SIFT'], select='lof',
+                                       lof_terms=CUSTOM_TERMS)
+    assert sorted(key for sample, key, variant in streamed) == sorted(lof)
+    assert set(lof) <= set(custom)
+
+
+@pytest.mark.parametrize('max_size', [1, 3, 16])
+def test_memo_stays_within_its_bound(single, max_size, monkeypatch):
+    vcf = VariantSelection(single['vcf'][0])
+    expected = vcf.damaging_selection(criteria=['SIFT', 'POLYPHEN'])
+    classifier = Classifier(max_size=max_size)
+    sizes = []
+    classify = classifier.classify
+
+    def recorded(text):
+        bits = classify(text)
+        sizes.append(len(classifier.memo))
+        return bits
+
+    monkeypatch.setattr(classifier, 'classify', recorded)
+    monkeypatch.setitem(record_selection._classifiers, LOF_TERMS, classifier)
+    assert vcf.damaging_selection(criteria=['SIFT', 'POLYPHEN']) == expected
+    assert sizes and max(sizes) <= max_size
+    # the memo was emptied and refilled, every string is still classified like a fresh classifier does
+    assert len(sizes) > max_size
+    texts = ['stop_gained', 'missense_variant', 'deleterious(0.01)', 'probably_damaging(0.99)',
+             'possibly_damaging(0.5)', 'benign(0.1)', 'tolerated(0.3)', 'intron_variant'] * 3
+    bits = [classifier.classify(text) for text in texts]
+    assert bits == [Classifier().classify(text) for text in texts]
+    assert bits[:5] == [LOF, MISSENSE, DELETERIOUS, DAMAGING, DAMAGING]
+    assert len(classifier.memo) <= max_size
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import gzip
+
+import pandas as pd
+import pytest
+
+from vcf_varselect.cli import main, merge_shards, shard_file, write_shard
+
+
+def corrupt_copies(cohort, tmp_path):
+    """
+    Manifest of the cohort as gzip files, the second file truncated and the third file damaged
+
+    """
+    files = []
+    for i, vcffile in enumerate(cohort['vcf']):
+        with open(vcffile, mode='rb') as vcf:
+            data = bytearray(gzip.compress(vcf.read()))
+        if i == 1:
+            data = data[:len(data) // 2]
+        elif i == 2:
+            # invalid block type of the first deflate block, after the 10 byte gzip header
+            data[10] |= 0b110
+        files.append(str(tmp_path / 'sample{0}.vcf.gz'.format(i + 1)))
+        with open(files[-1], mode='wb') as handle:
+            handle.write(data)
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text('\n'.join(files) + '\n')
+    return str(manifest)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_select_reports_corrupt_files(cohort, tmp_path, capsys, workers):
+    manifest = corrupt_copies(cohort, tmp_path)
+    output = str(tmp_path / 'variants.csv')
+    argv = ['select', manifest, '--shards', str(tmp_path / 'shards'), '--output', output,
+            '--genefile', cohort['genefile'], '--genderfile', cohort['genderfile'], '--DP', '10',
+            '--criteria', 'SIFT,POLYPHEN']
+    if workers:
+        argv += ['--workers', str(workers)]
+    assert main(argv) == 1
+    log = capsys.readouterr().err
+    assert '2 samples failed: sample2, sample3' in log
+    assert 'sample2 failed: EOFError' in log and 'sample3 failed: error' in log
+    df = pd.read_csv(output, index_col=0)
+    assert len(df) > 0
+    assert {index.split('_')[0] for index in df.index} == {'SAMPLE1'}
+
+
+def test_merge_parquet_shards_with_different_columns(cohort, tmp_path):
+    pytest.importorskip('pyarrow.parquet')
+    shards = tmp_path / 'shards'
+    shards.mkdir()
+    samples = [('SAMPLE1', cohort['vcf'][0]), ('SAMPLE2', cohort['vcf'][1])]
+    write_shard(shard_file(str(shards), 'SAMPLE1'), cohort['vcf'][0], {},
+                {'SAMPLE1': {'1:100:.:A:G': {'DP': '12', 'CSQ': {'SYMBOL': ['GENE1']}}}})
+    write_shard(shard_file(str(shards), 'SAMPLE2'), cohort['vcf'][1], {},
+                {'SAMPLE2': {'1:200:.:C:T': {'DP': '20', 'EXTRA': '1', 'CSQ': {'SYMBOL': ['GENE2']}}}})
+    output = str(tmp_path / 'variants.parquet')
+    assert merge_shards(samples, str(shards), output) == (2, [])
+    df = pd.read_parquet(output).set_index('sample_variant')
+    assert list(df.columns) == ['DP', 'CSQ:SYMBOL', 'EXTRA']
+    assert df.loc['SAMPLE2_1:200:.:C:T', 'EXTRA'] == '1'
+    assert df['EXTRA'].isna().sum() == 1
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from vcf_varselect import VariantSelection
+
+QUALITY = [dict(FILTER='PASS'), dict(DP=10), dict(QD=5), dict(MQ=40), dict(FILTER='PASS', DP=20, QD=2, MQ=30)]
+FREQ = [dict(KG=0.01), dict(EXAC=0.01), dict(SWEGEN=0.01), dict(GNOMAD=0.001),
+        dict(KG=0.05, EXAC=0.05, SWEGEN=0.05, GNOMAD=0.01)]
+
+
+@pytest.mark.parametrize('dataset', ['single', 'multi', 'missing_values'])
+def test_numpy_backend_matches_dict_backend(dataset, request):
+    data = request.getfixturevalue(dataset)
+    selections = {backend: VariantSelection(data['vcf'][0], backend=backend) for backend in ('dict', 'numpy')}
+    for options in QUALITY:
+        expected = selections['dict'].quality_selection(**options)
+        assert any(expected.values()) and any(len(i) < len(selections['dict'].sites) for i in expected.values())
+        assert selections['numpy'].quality_selection(**options) == expected, options
+        assert selections['numpy'].quality_selection(bitsets=True, **options) == \
+            selections['dict'].quality_selection(bitsets=True, **options)
+    for options in FREQ + [dict(FREQ[-1], innerfreqfile=data['innerfreqfile'], INNER=0.05)]:
+        expected = selections['dict'].freq_selection(**options)
+        assert any(expected.values()) and any(len(i) < len(selections['dict'].sites) for i in expected.values())
+        assert selections['numpy'].freq_selection(**options) == expected, options
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import pytest
+
+from vcf_varselect import VariantSelection, FilterPipeline, GenePanel, match_gene
+from vcf_varselect.sample_combine import selection_csq_columns
+
+SELECTIONS = [
+    dict(DP=10, GNOMAD=0.01, criteria=['SIFT', 'POLYPHEN']),
+    dict(FILTER='PASS', QD=5, KG=0.05, criteria=['MPC']),
+    dict(GNOMAD=0.001, criteria=[]),
+]
+
+
+def keys(selection):
+    return {sample: sorted(variants) for sample, variants in selection.items()}
+
+
+def streamed(stream):
+    selected = {}
+    for sample, key, variant in stream:
+        selected.setdefault(sample, []).append(key)
+    return selected
+
+
+@pytest.mark.parametrize('options', SELECTIONS)
+@pytest.mark.parametrize('record', ['dict', 'lazy', 'compact'])
+@pytest.mark.parametrize('dataset', ['single', 'multi', 'missing_values'])
+def test_auto_columns_select_like_full_decoding(dataset, record, options, request):
+    data = request.getfixturevalue(dataset)
+    panel = GenePanel(genefile=data['genefile'], genderfile=data['genderfile'])
+    columns = selection_csq_columns(options['criteria'], options.get('GNOMAD'))
+    full = VariantSelection(data['vcf'][0], record=record)
+    auto = VariantSelection(data['vcf'][0], record=record, csq_columns=columns)
+    assert all(set(variant['CSQ']) == set(columns) for variant in auto.sites.values() if 'CSQ' in variant)
+    expected = full.comb_selection(**options)
+    selected = auto.comb_selection(**options)
+    assert any(expected[0].values())
+    assert [keys(selection) for selection in selected] == [keys(selection) for selection in expected]
+    assert keys(match_gene(selected[0], panel=panel)) == keys(match_gene(expected[0], panel=panel))
+
+
+@pytest.mark.parametrize('options', SELECTIONS)
+@pytest.mark.parametrize('select', ['damaging', 'lof', 'mis'])
+@pytest.mark.parametrize('dataset', ['single', 'multi', 'missing_values'])
+def test_auto_columns_stream_like_full_decoding(dataset, select, options, request):
+    data = request.getfixturevalue(dataset)
+    genes = dict(genefile=data['genefile'], genderfile=data['genderfile'])
+    for extra in ({}, genes):
+        expected = streamed(VariantSelection.stream(data['vcf'][0], select=select, **dict(options, **extra)))
+        assert streamed(VariantSelection.stream(data['vcf'][0], select=select, csq_columns='auto',
+                                                **dict(options, **extra))) == expected
+    pipeline = ['DP >= 10', 'CSQ:gnomAD_AF <= 0.01', 'damaging(SIFT,POLYPHEN)']
+    expected = streamed(VariantSelection.stream(data['vcf'][0], pipeline=FilterPipeline(pipeline), select=select))
+    assert streamed(VariantSelection.stream(data['vcf'][0], pipeline=FilterPipeline(pipeline), select=select,
+                                            csq_columns='auto')) == expected
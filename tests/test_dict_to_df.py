@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import re
+
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from vcf_varselect import VariantTable, dict_to_df, sample_combine
+
+
+def test_parquet_unknown_column_is_dropped(tmp_path):
+    outfile = str(tmp_path / 'variants.parquet')
+    table = VariantTable(outfile=outfile, columns=['QUAL', 'FILTER', 'GT', 'DP'])
+    table.add('S1', {'1:100:.:A:G': {'QUAL': '50', 'FILTER': 'PASS', 'GT': '0/1', 'DP': ['12']}})
+    with pytest.warns(UserWarning, match='UNDECLARED'):
+        table.add('S2', {'1:200:.:C:T': {'QUAL': '60', 'FILTER': 'PASS', 'GT': '1/1', 'DP': ['20'],
+                                         'UNDECLARED': ['x']}})
+    table.add('S3', {'1:300:.:G:A': {'QUAL': '70', 'FILTER': 'PASS', 'GT': '0/1', 'UNDECLARED': ['y']}})
+    table.close()
+    assert table.dropped == {'UNDECLARED': 2}
+    df = pq.read_table(outfile).to_pandas().set_index('sample_variant')
+    assert list(df.index) == ['S1_1:100:.:A:G', 'S2_1:200:.:C:T', 'S3_1:300:.:G:A']
+    assert list(df['DP'][:2]) == ['12', '20'] and df['DP'].isna().iloc[2]
+
+
+def test_dataframe_keeps_every_column():
+    df = dict_to_df({'S1': {'1:100:.:A:G': {'QUAL': '50', 'DP': ['12']}},
+                     'S2': {'1:200:.:C:T': {'QUAL': '60', 'EXTRA': ['a', 'b']}}})
+    assert df.loc['S2_1:200:.:C:T', 'EXTRA'] == 'a,b'
+
+
+def test_sample_combine_parquet_with_undeclared_info(cohort, tmp_path):
+    vcf_dir = tmp_path / 'vcf'
+    vcf_dir.mkdir()
+    for i, vcffile in enumerate(cohort['vcf']):
+        with open(vcffile, mode='r') as vcf:
+            text = vcf.read()
+        if i == 2:
+            # INFO ID used by the variants of the last sample but missing from every header
+            text = re.sub(r'([\t;])set=', r'\1UNDECLARED=1;set=', text)
+        (vcf_dir / 'sample{0}.vcf'.format(i + 1)).write_text(text)
+    outfile = str(tmp_path / 'variants.parquet')
+    with pytest.warns(UserWarning, match='UNDECLARED'):
+        sample_combine(str(vcf_dir), genefile=cohort['genefile'], genderfile=cohort['genderfile'], DP=10,
+                       criteria=['SIFT', 'POLYPHEN'], outfile=outfile)
+    df = pq.read_table(outfile).to_pandas()
+    assert {index.split('_')[0] for index in df['sample_variant']} == {'SAMPLE1', 'SAMPLE2', 'SAMPLE3'}
+    assert 'UNDECLARED' not in df.columns
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from vcf_varselect import VariantSelection, FilterPipeline
+from vcf_varselect.filter_pipeline import comb_spec
+
+OPTIONS = dict(FILTER='PASS', DP=10, QD=5, MQ=40, GNOMAD=0.001, criteria=['SIFT', 'POLYPHEN'])
+
+
+def selected(pipeline, sites):
+    return [key for key, variant in pipeline.filter(sites)]
+
+
+def test_reordering_keeps_the_selection(single):
+    vcf = VariantSelection(single['vcf'][0])
+    spec = comb_spec(**OPTIONS)
+    fixed = FilterPipeline(spec, calibrate=0)
+    expected = selected(fixed, vcf.sites)
+    assert expected and fixed.order == spec
+    reversed_order = FilterPipeline(spec, calibrate=0)
+    reversed_order.conditions.reverse()
+    assert selected(reversed_order, vcf.sites) == expected
+    assert selected(FilterPipeline(spec, calibrate=200), vcf.sites) == expected
+    # comb_selection reorders its pipeline after calibrating on the first variants
+    damage = vcf.comb_selection(**OPTIONS)[0]
+    assert vcf.pipeline.seen > vcf.pipeline.calibrate
+    assert sorted(key for sample in damage for key in damage[sample]) == sorted(expected)
+
+
+def test_stats_count_every_failing_condition_while_calibrating(single):
+    sites = VariantSelection(single['vcf'][0]).sites
+    spec = comb_spec(**OPTIONS)
+    everything = FilterPipeline(spec, calibrate=len(sites))
+    first = FilterPipeline(spec, calibrate=0)
+    selected(everything, sites)
+    selected(first, sites)
+    rejected = {stat['condition']: stat['rejected'] for stat in everything.stats()}
+    assert all(stat['evaluated'] == len(sites) for stat in everything.stats())
+    # without calibration each rejected variant is counted once, by its first failing condition
+    assert sum(stat['rejected'] for stat in first.stats()) == len(sites) - first.passed
+    assert sum(rejected.values()) > len(sites) - everything.passed
+    assert first.stats()[0]['rejected'] == rejected[spec[0]]
+    assert all(stat['rejected'] <= rejected[stat['condition']] for stat in first.stats())
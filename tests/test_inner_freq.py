@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import json
+import sqlite3
+
+import pytest
+from generate_vcf import generate
+
+from vcf_varselect import inner_freq, InnerFreqBuilder, build_inner_freq
+from vcf_varselect.inner_freq import load_inner_freq, json_to_sqlite
+
+
+def test_sqlite_path_with_uri_characters(tmp_path):
+    folder = tmp_path / 'freq?mode=rw#1%20'
+    folder.mkdir()
+    jsonfile = str(folder / 'inner.json')
+    with open(jsonfile, mode='w') as freq_file:
+        json.dump({'1:100:.:A:G': 0.25}, freq_file)
+    dbfile = str(folder / 'inner.db')
+    json_to_sqlite(jsonfile, dbfile)
+    store = load_inner_freq(dbfile)
+    assert store.format == 'sqlite'
+    assert store.get('1:100:.:A:G') == 0.25
+    assert store.get('1:200:.:C:T') is None
+
+
+def test_changed_file_replaces_store(tmp_path):
+    jsonfile = str(tmp_path / 'inner.json')
+    for version, freq in enumerate([0.25, 0.5, 0.75]):
+        with open(jsonfile, mode='w') as freq_file:
+            json.dump({'1:100:.:A:G': freq}, freq_file)
+        os.utime(jsonfile, ns=(version * 10 ** 9, version * 10 ** 9))
+        assert load_inner_freq(jsonfile).get('1:100:.:A:G') == freq
+    assert load_inner_freq(jsonfile) is load_inner_freq(jsonfile)
+    assert len([path for path in inner_freq._stores if path == os.path.abspath(jsonfile)]) == 1
+
+
+@pytest.fixture(scope='module')
+def cohort_files(tmp_path_factory):
+    """
+    Five vcf files of two samples each, the last one a copy of the first with other sample IDs so that
+    its variants are already counted
+
+    """
+    outdir = tmp_path_factory.mktemp('builder')
+    files = generate(str(outdir), variants=300, samples=2, files=4, n_genes=50, seed=11)['vcf']
+    copy = str(outdir / 'vcf' / 'sample5.vcf')
+    with open(files[0], mode='r') as vcf, open(copy, mode='w') as out:
+        out.write(vcf.read().replace('\tSAMPLE1\tSAMPLE2\n', '\tSAMPLE9\tSAMPLE10\n'))
+    return files + [copy]
+
+
+def stored(outfile):
+    store = load_inner_freq(outfile)
+    if store.format == 'json':
+        with open(outfile, mode='r') as freq_file:
+            table = json.load(freq_file)
+    else:
+        db = sqlite3.connect(outfile)
+        try:
+            table = dict(db.execute('SELECT variant, freq FROM inner_freq'))
+        finally:
+            db.close()
+    assert all(store.get(key) == freq for key, freq in table.items())
+    return table
+
+
+def carrier_frequencies(files):
+    carriers = {}
+    samples = 0
+    for vcffile in files:
+        with open(vcffile, mode='r') as vcf:
+            for line in vcf:
+                fields = line.rstrip('\n').split('\t')
+                if line.startswith('#CHROM'):
+                    samples += len(fields) - 9
+                elif not line.startswith('#'):
+                    key = ':'.join(fields[:5])
+                    n = sum(1 for column in fields[9:] if column.split(':')[0] not in ('0/0', './.'))
+                    if n:
+                        carriers[key] = carriers.get(key, 0) + n
+    return {key: n / samples for key, n in carriers.items()}
+
+
+@pytest.mark.parametrize('extension', ['.json', '.db'])
+@pytest.mark.parametrize('count', ['sample', 'allele'])
+def test_adding_a_file_matches_a_full_rebuild(tmp_path, cohort_files, extension, count):
+    builder = InnerFreqBuilder(str(tmp_path / 'incremental.state'))
+    try:
+        assert builder.update(cohort_files[:-1]) == len(cohort_files) - 1
+        builder.write(str(tmp_path / ('before' + extension)), count=count)
+        # counted files are skipped, only the new file is read
+        assert builder.update(cohort_files) == 1
+        assert builder.n_samples == 2 * len(cohort_files)
+        builder.write(str(tmp_path / ('incremental' + extension)), count=count)
+    finally:
+        builder.close()
+    assert build_inner_freq(cohort_files, str(tmp_path / ('full' + extension)), workers=2, count=count) == \
+        len(stored(str(tmp_path / ('full' + extension))))
+
+    before = stored(str(tmp_path / ('before' + extension)))
+    incremental = stored(str(tmp_path / ('incremental' + extension)))
+    assert incremental == stored(str(tmp_path / ('full' + extension)))
+    assert set(incremental) == set(before)
+    assert any(incremental[key] != before[key] for key in before)
+    if count == 'sample':
+        assert incremental == pytest.approx(carrier_frequencies(cohort_files))
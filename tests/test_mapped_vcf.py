@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import pathlib
+
+import pytest
+
+from vcf_varselect import VariantSelection
+from vcf_varselect.mapped_vcf import MappedVcf
+
+
+def plain(variants):
+    return [(key, dict(variants[key])) for key in variants]
+
+
+@pytest.mark.parametrize('parts', [1, 2, 3, 7, 64])
+def test_ranges_split_the_file_at_line_ends(single, parts):
+    vcffile = single['vcf'][0]
+    with open(vcffile, mode='rb') as vcf:
+        data = vcf.read()
+    start = data.index(b'\n#CHROM') + 1
+    start = data.index(b'\n', start) + 1
+    mapped = MappedVcf(vcffile)
+    try:
+        ranges = mapped.ranges(start, parts)
+        assert 1 <= len(ranges) <= parts
+        assert ranges[0][0] == start and ranges[-1][1] == len(data)
+        assert all(end == next_start for (begin, end), (next_start, next_end) in zip(ranges, ranges[1:]))
+        assert all(data[begin - 1:begin] == b'\n' for begin, end in ranges)
+        lines = [line for begin, end in ranges for offset, line in mapped.lines(begin, end)]
+        assert ''.join(lines) == data[start:].decode()
+    finally:
+        mapped.close()
+
+
+@pytest.mark.parametrize('dataset', ['single', 'multi'])
+@pytest.mark.parametrize('record', ['dict', 'compact'])
+def test_parse_workers_match_one_process(dataset, record, request):
+    vcffile = request.getfixturevalue(dataset)['vcf'][0]
+    expected = VariantSelection(vcffile, record=record)
+    parsed = VariantSelection(vcffile, record=record, parse_workers=3)
+    assert list(parsed.sites) == list(expected.sites)
+    assert plain(parsed.sites) == plain(expected.sites)
+    assert {sample: plain(parsed.variant[sample]) for sample in parsed.variant} == \
+        {sample: plain(expected.variant[sample]) for sample in expected.variant}
+    assert parsed.comb_selection(DP=10, criteria=['SIFT', 'POLYPHEN']) == \
+        expected.comb_selection(DP=10, criteria=['SIFT', 'POLYPHEN'])
+
+
+def test_parse_workers_without_a_path(single):
+    with pytest.raises(IOError):
+        VariantSelection(parse_workers=2)
+    expected = VariantSelection(single['vcf'][0])
+    assert plain(VariantSelection(pathlib.Path(single['vcf'][0]), parse_workers=2).sites) == plain(expected.sites)
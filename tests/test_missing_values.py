@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from vcf_varselect import VariantSelection
+from vcf_varselect.record_selection import csq_floats
+
+GRID = {'DP': [None, 10], 'QD': [None, 5], 'MQ': [None, 40], 'KG': [None, 0.05], 'EXAC': [None, 0.05],
+        'SWEGEN': [None, 0.05], 'GNOMAD': [None, 0.001, 0.1], 'criteria': [['SIFT', 'POLYPHEN']]}
+
+
+def test_missing_af_passes_sweep_pipeline_and_freq_selection(missing_values):
+    vcf = VariantSelection(missing_values['vcf'][0])
+    missing = [key for key, variant in vcf.sites.items()
+               if any(i in ('', '.', 'nan') for i in variant['CSQ']['gnomAD_AF'])]
+    assert missing and any(csq_floats(vcf.sites[key], 'gnomAD_AF') == [] for key in missing)
+    assert any(vcf.sites[key]['DP'] == ['.'] for key in vcf.sites if 'DP' in vcf.sites[key])
+
+    for params, (damage, lof, mis) in vcf.sweep(GRID):
+        options = {name: value for name, value in params.items() if name != 'criteria'}
+        quality = vcf.quality_selection(**{i: options[i] for i in ('DP', 'QD', 'MQ')}, bitsets=True)
+        freq = vcf.freq_selection(**{i: options[i] for i in ('KG', 'EXAC', 'SWEGEN', 'GNOMAD')}, bitsets=True)
+        expected = vcf.select_bits(quality & freq & vcf.damaging_selection(params['criteria'], bitsets=True)[0])
+        assert damage == expected, params
+        assert vcf.comb_selection(**params)[0] == expected, params
+    streamed = {key for sample, key, variant in VariantSelection.stream(missing_values['vcf'][0], GNOMAD=0.001,
+                                                                        DP=10, criteria=['SIFT', 'POLYPHEN'])}
+    assert streamed == set(vcf.comb_selection(GNOMAD=0.001, DP=10, criteria=['SIFT', 'POLYPHEN'])[0][vcf.sample])
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import gzip
+import zlib
+
+import pytest
+
+from vcf_varselect import VariantSelection
+from vcf_varselect.prefetch import PrefetchReader
+
+# multi-byte characters and a last line without a newline, so that chunks split lines and characters
+TEXT = '##source=vcf_varselect\n#CHROM\tPOS\n' + ''.join(
+    '1\t{0}\tgène_{0}\tß\n'.format(i) for i in range(200)
+) + '1\t200\tlast'
+
+
+def reader_lines(reader):
+    try:
+        return list(iter(reader.readline, ''))
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 1 << 20])
+@pytest.mark.parametrize('queue_depth', [1, 4])
+def test_chunks_splitting_lines(tmp_path, chunk_size, queue_depth):
+    vcffile = tmp_path / 'split.vcf'
+    vcffile.write_bytes(TEXT.encode('utf-8'))
+    assert reader_lines(PrefetchReader(str(vcffile), chunk_size=chunk_size, queue_depth=queue_depth)) == \
+        TEXT.splitlines(True)
+
+
+@pytest.mark.parametrize('chunk_size', [3, 100, 1 << 20])
+def test_gzip_members_are_read_one_after_another(tmp_path, chunk_size):
+    data = TEXT.encode('utf-8')
+    vcffile = tmp_path / 'members.vcf.gz'
+    # members end inside lines and inside multi-byte characters, and one member is empty
+    bounds = [0, 10, 11, 11, 500, len(data) - 3, len(data)]
+    vcffile.write_bytes(b''.join(gzip.compress(data[begin:end]) for begin, end in zip(bounds, bounds[1:])))
+    with gzip.open(str(vcffile), mode='rt', encoding='utf-8') as vcf:
+        assert vcf.read() == TEXT
+    assert reader_lines(PrefetchReader(str(vcffile), chunk_size=chunk_size, queue_depth=2)) == \
+        TEXT.splitlines(True)
+
+
+def test_prefetched_file_gives_the_same_sites(single, tmp_path):
+    vcffile = single['vcf'][0]
+    gzfile = str(tmp_path / 'single.vcf.gz')
+    with open(vcffile, mode='rb') as vcf, gzip.open(gzfile, mode='wb') as out:
+        out.write(vcf.read())
+    expected = VariantSelection(vcffile)
+    for infile in (vcffile, gzfile):
+        prefetched = VariantSelection(infile, prefetch=2, prefetch_chunk_size=4096)
+        assert list(prefetched.sites) == list(expected.sites)
+        assert [dict(variant) for variant in prefetched.sites.values()] == \
+            [dict(variant) for variant in expected.sites.values()]
+
+
+def test_reader_thread_error_is_raised_by_readline(tmp_path, monkeypatch):
+    vcffile = tmp_path / 'error.vcf'
+    vcffile.write_bytes(TEXT.encode('utf-8'))
+
+    def chunks(self):
+        yield b'first\nsecond\nthi'
+        raise OSError('read error')
+
+    monkeypatch.setattr(PrefetchReader, '_chunks', chunks)
+    reader = PrefetchReader(str(vcffile))
+    try:
+        # the complete lines read before the error are returned first
+        assert reader.readline() == 'first\n'
+        assert reader.readline() == 'second\n'
+        with pytest.raises(OSError, match='read error'):
+            reader.readline()
+        assert reader.readline() == ''
+    finally:
+        reader.close()
+    assert not reader.thread.is_alive()
+
+
+def test_corrupt_gzip_error_is_raised_by_readline(tmp_path):
+    vcffile = tmp_path / 'corrupt.vcf.gz'
+    data = bytearray(gzip.compress(TEXT.encode('utf-8') * 20))
+    data[len(data) // 2:len(data) // 2 + 16] = b'\xff' * 16
+    vcffile.write_bytes(bytes(data))
+    reader = PrefetchReader(str(vcffile), chunk_size=64)
+    with pytest.raises(zlib.error):
+        reader_lines(reader)
+    assert not reader.thread.is_alive()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from vcf_varselect import VariantSelection, Profiler
+from vcf_varselect import variant_selection
+
+OPTIONS = dict(FILTER='PASS', DP=10, GNOMAD=0.001, criteria=['SIFT', 'POLYPHEN'])
+
+
+def run_selections(vcf, innerfreqfile):
+    vcf.quality_selection(FILTER='PASS', DP=10, QD=2, MQ=40)
+    vcf.freq_selection(innerfreqfile=innerfreqfile, KG=0.01, EXAC=0.01, GNOMAD=0.001, SWEGEN=0.01)
+    vcf.damaging_selection(criteria=['SIFT', 'POLYPHEN'])
+    vcf.comb_selection(innerfreqfile=innerfreqfile, **OPTIONS)
+
+
+def test_disabled_profiler_skips_rejection_counts(single, monkeypatch):
+    vcf = VariantSelection(single['vcf'][0])
+
+    def fail(bits):
+        raise AssertionError('rejection counts are computed without a profiler')
+
+    monkeypatch.setattr(variant_selection, 'bitset_count', fail)
+    monkeypatch.setattr(variant_selection.FilterPipeline, 'stats', fail)
+    run_selections(vcf, single['innerfreqfile'])
+
+
+def test_profiler_records_rejection_counts(single):
+    profiler = Profiler()
+    run_selections(VariantSelection(single['vcf'][0], profile=profiler), single['innerfreqfile'])
+    summary = profiler.summary()
+    for stage in ('quality_selection', 'freq_selection', 'damaging_selection', 'comb_selection'):
+        assert summary[stage]['rejected'] and sum(summary[stage]['rejected'].values()) > 0, stage
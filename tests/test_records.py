@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from collections.abc import Mapping
+
+import pytest
+
+from vcf_varselect import VariantSelection, match_gene
+
+RECORDS = ['dict', 'lazy', 'compact']
+QUALITY = dict(FILTER='PASS', DP=10, QD=5, MQ=40)
+FREQ = dict(KG=0.01, EXAC=0.01, GNOMAD=0.001, SWEGEN=0.01, INNER=0.05)
+CRITERIA = ['SIFT', 'POLYPHEN', 'MPC']
+
+
+def plain(value):
+    """
+    Variant records of any record type as dictionaries and lists
+
+    """
+    if isinstance(value, Mapping):
+        return {key: plain(value[key]) for key in value}
+    if isinstance(value, (list, tuple)):
+        return [plain(i) for i in value]
+    return value
+
+
+def selections(data, record):
+    vcf = VariantSelection(data['vcf'][0], record=record)
+    innerfreqfile = data['innerfreqfile']
+    damage = vcf.comb_selection(innerfreqfile=innerfreqfile, criteria=CRITERIA, **dict(QUALITY, **FREQ))
+    return {
+        'quality': vcf.quality_selection(**QUALITY),
+        'freq': vcf.freq_selection(innerfreqfile=innerfreqfile, **FREQ),
+        'damaging': vcf.damaging_selection(criteria=CRITERIA),
+        'comb': damage,
+        'comb_bits': vcf.comb_selection(innerfreqfile=innerfreqfile, criteria=CRITERIA, bitsets=True,
+                                        **dict(QUALITY, **FREQ)),
+        'sweep': vcf.sweep({'DP': [5, 20], 'GNOMAD': [0.001, 0.01], 'criteria': [['SIFT'], CRITERIA]},
+                           innerfreqfile=innerfreqfile),
+        'match_gene': match_gene(damage[0], genefile=data['genefile'], genderfile=data['genderfile']),
+        'stream': sorted(
+            (sample, key, plain(variant)) for sample, key, variant in VariantSelection.stream(
+                data['vcf'][0], record=record, innerfreqfile=innerfreqfile, criteria=CRITERIA,
+                genefile=data['genefile'], genderfile=data['genderfile'], **dict(QUALITY, **FREQ))
+        ),
+    }
+
+
+@pytest.mark.parametrize('dataset', ['single', 'multi'])
+def test_record_types_select_the_same_variants(dataset, request):
+    data = request.getfixturevalue(dataset)
+    expected = plain(selections(data, 'dict'))
+    assert any(expected['comb'][0].values())
+    for record in RECORDS[1:]:
+        assert plain(selections(data, record)) == expected, record
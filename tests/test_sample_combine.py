@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+
+import pytest
+
+from vcf_varselect import sample_combine, Profiler
+from vcf_varselect.sample_combine import memory_chunk_size, select_sample, RECORD_BYTES
+from vcf_varselect.gene_panel import GenePanel
+from generate_vcf import generate
+
+
+def test_memory_chunk_size():
+    assert memory_chunk_size(1000) == int(500 * 1048576 / RECORD_BYTES)
+    assert memory_chunk_size(1000, workers=4) == int(125 * 1048576 / RECORD_BYTES)
+    assert memory_chunk_size(1000, workers=4, record_bytes=1024) == 128000
+    assert memory_chunk_size(0.001, workers=8) == 1
+
+
+def test_max_memory_mb_sets_chunks(cohort):
+    options = dict(genefile=cohort['genefile'], genderfile=cohort['genderfile'], DP=10,
+                   criteria=['SIFT', 'POLYPHEN'])
+    whole = sample_combine(os.path.dirname(cohort['vcf'][0]), **options)
+    # about 30 variant lines per chunk
+    chunked = sample_combine(os.path.dirname(cohort['vcf'][0]), max_memory_mb=30 * RECORD_BYTES * 2 / 1048576.0,
+                             **options)
+    assert len(whole) > 0
+    assert sorted(chunked.index) == sorted(whole.index)
+
+
+def test_chunks_warn_about_cache_dir(cohort, tmp_path):
+    panel = GenePanel(genefile=cohort['genefile'], genderfile=cohort['genderfile'])
+    with pytest.warns(UserWarning, match='cache_dir'):
+        chunked = select_sample(cohort['vcf'][0], panel=panel, cache_dir=str(tmp_path), chunk_size=100, DP=10)
+    assert os.listdir(str(tmp_path)) == []
+    assert chunked == select_sample(cohort['vcf'][0], panel=panel, DP=10)
+
+
+def test_profile_is_a_profiler(cohort):
+    options = dict(genefile=cohort['genefile'], genderfile=cohort['genderfile'], DP=10)
+    with pytest.raises(ValueError, match='Profiler'):
+        sample_combine(os.path.dirname(cohort['vcf'][0]), profile=True, **options)
+    profiler = Profiler()
+    sample_combine(os.path.dirname(cohort['vcf'][0]), profile=profiler, **options)
+    assert profiler.summary()['sample_combine']['records'] == len(cohort['vcf'])
+
+
+@pytest.fixture(scope='module')
+def large(tmp_path_factory):
+    """
+    Multi-sample vcf file taking longer to select than the cohort files
+
+    """
+    return generate(str(tmp_path_factory.mktemp('large')), variants=6000, samples=3, n_genes=200, seed=7)
+
+
+@pytest.mark.parametrize('max_pending, max_memory_mb', [(1, None), (4, None), (4, 1e-6)])
+def test_workers_give_the_serial_table(large, cohort, tmp_path, max_pending, max_memory_mb):
+    vcf_dir = tmp_path / 'vcf'
+    vcf_dir.mkdir()
+    # with max_pending above 1 the files finish in another order than they are submitted
+    os.symlink(large['vcf'][0], str(vcf_dir / 'a_large.vcf'))
+    for i, vcffile in enumerate(cohort['vcf']):
+        os.symlink(vcffile, str(vcf_dir / 'b_sample{0}.vcf'.format(i + 1)))
+    options = dict(genefile=cohort['genefile'], genderfile=cohort['genderfile'], DP=10,
+                   criteria=['SIFT', 'POLYPHEN'], max_memory_mb=max_memory_mb)
+    serial = sample_combine(str(vcf_dir), **options)
+    parallel = sample_combine(str(vcf_dir), workers=2, max_pending=max_pending, **options)
+    assert len(serial) > 0
+    assert list(parallel.index) == list(serial.index)
+    assert list(parallel.columns) == list(serial.columns)
+    assert parallel.equals(serial)
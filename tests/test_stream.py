@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import pytest
+
+from vcf_varselect import VariantSelection, FilterPipeline, comb_spec
+
+
+def streamed(stream):
+    selected = {}
+    for sample, key, variant in stream:
+        selected.setdefault(sample, {})[key] = variant
+    return selected
+
+
+@pytest.mark.parametrize('select, index', [('damaging', 0), ('lof', 1), ('mis', 2)])
+def test_stream_matches_comb_selection(multi, select, index):
+    vcffile = multi['vcf'][0]
+    expected = VariantSelection(infile=vcffile).comb_selection(DP=10, GNOMAD=0.01, criteria=['SIFT', 'POLYPHEN'])
+    selected = streamed(VariantSelection.stream(vcffile, DP=10, GNOMAD=0.01, criteria=['SIFT', 'POLYPHEN'],
+                                                select=select, record='dict'))
+    assert {sample: set(selected.get(sample, {})) for sample in expected[index]} == \
+        {sample: set(variants) for sample, variants in expected[index].items()}
+
+
+@pytest.mark.parametrize('select, index', [('damaging', 0), ('lof', 1), ('mis', 2)])
+def test_stream_pipeline_matches_comb_selection(single, select, index):
+    vcffile = single['vcf'][0]
+    vcf = VariantSelection(infile=vcffile)
+    expected = vcf.comb_selection(DP=10, criteria=['SIFT', 'POLYPHEN'])[index][vcf.sample]
+    assert any(expected)
+    pipeline = FilterPipeline(comb_spec(DP=10, criteria=['SIFT', 'POLYPHEN']))
+    selected = streamed(VariantSelection.stream(vcffile, pipeline=pipeline, select=select))
+    assert set(selected.get(vcf.sample, {})) == set(expected)
+    assert pipeline.passed == len(vcf.comb_selection(DP=10, criteria=['SIFT', 'POLYPHEN'])[0][vcf.sample])
+
+
+def test_missense_criteria():
+    assert FilterPipeline(comb_spec(DP=10, criteria=['SIFT', 'CADD'])).missense_criteria() == ['SIFT', 'CADD']
+    assert FilterPipeline(['damaging_missense( SIFT , MPC )']).missense_criteria() == ['SIFT', 'MPC']
+    assert FilterPipeline(['DP >= 10', 'lof']).missense_criteria() is None
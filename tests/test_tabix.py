@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import gzip
+
+import pytest
+
+pysam = pytest.importorskip('pysam')
+
+from vcf_varselect import VariantSelection
+from vcf_varselect.tabix import RegionReader, ThreadedBgzfReader, parse_regions, read_raw_block
+from vcf_varselect.variant_selection import open_vcf
+
+HEADER = '##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+
+
+def indexed_vcf(tmp_path, records):
+    vcffile = str(tmp_path / 'regions.vcf')
+    with open(vcffile, mode='w') as vcf:
+        vcf.write(HEADER + ''.join('\t'.join(record) + '\n' for record in records))
+    return pysam.tabix_index(vcffile, preset='vcf', force=True)
+
+
+def region_lines(infile, regions):
+    reader = RegionReader(infile, regions=regions)
+    try:
+        lines = iter(reader.readline, '')
+        return [line.split('\t')[:3] for line in lines if not line.startswith('#')]
+    finally:
+        reader.close()
+
+
+def test_records_at_the_same_position_are_all_read(tmp_path):
+    infile = indexed_vcf(tmp_path, [
+        ('1', '100', 'rs1', 'A', 'G', '50', 'PASS', 'DP=10'),
+        ('1', '100', 'rs2', 'A', 'G', '60', 'PASS', 'DP=20'),
+        ('1', '300', 'rs3', 'C', 'T', '70', 'PASS', 'DP=30'),
+    ])
+    # overlapping regions are merged, regions sharing a record read it once
+    assert region_lines(infile, ['1:50-150', '1:90-120', '1:250-400']) == \
+        [['1', '100', 'rs1'], ['1', '100', 'rs2'], ['1', '300', 'rs3']]
+    assert region_lines(infile, [('1', 99, 100), ('1', 99, 101)]) == [['1', '100', 'rs1'], ['1', '100', 'rs2']]
+
+
+def test_regions_are_read_in_file_order(tmp_path):
+    infile = indexed_vcf(tmp_path, [
+        ('2', '100', 'rs1', 'A', 'G', '50', 'PASS', 'DP=10'),
+        ('10', '100', 'rs2', 'C', 'T', '60', 'PASS', 'DP=20'),
+    ])
+    assert region_lines(infile, ['10', '2', 'X']) == [['2', '100', 'rs1'], ['10', '100', 'rs2']]
+    assert parse_regions(['10', 'X', '2:5-9'], names=['2', '10']) == \
+        [('2', 4, 9), ('10', 0, 1 << 62), ('X', 0, 1 << 62)]
+
+
+def bgzf_blocks(infile):
+    with open(infile, mode='rb') as handle:
+        return list(iter(lambda: read_raw_block(handle), (b'', 0)))
+
+
+def reader_lines(reader):
+    try:
+        return list(iter(reader.readline, ''))
+    finally:
+        reader.close()
+
+
+@pytest.fixture(scope='module')
+def bgzipped(multi, tmp_path_factory):
+    infile = str(tmp_path_factory.mktemp('bgzf') / 'multi.vcf.gz')
+    pysam.tabix_compress(multi['vcf'][0], infile)
+    blocks = bgzf_blocks(infile)
+    # several data blocks and the empty end-of-file block written by bgzip
+    assert len(blocks) > 3 and blocks[-1][1] == 28
+    return infile
+
+
+@pytest.mark.parametrize('batch_blocks', [1, 2, 16])
+def test_threaded_reader_reads_the_lines_of_gzip(bgzipped, batch_blocks):
+    with gzip.open(bgzipped, mode='rt') as vcf:
+        expected = vcf.readlines()
+    assert reader_lines(ThreadedBgzfReader(bgzipped, threads=2, batch_blocks=batch_blocks)) == expected
+    assert reader_lines(open_vcf(bgzipped, threads=2)) == expected
+    vcf = open_vcf(bgzipped, threads=0)
+    assert not isinstance(vcf, ThreadedBgzfReader)
+    assert reader_lines(vcf) == expected
+
+
+def test_threaded_reader_gives_the_sites_of_gzip(bgzipped):
+    expected = VariantSelection(bgzipped, threads=0)
+    threaded = VariantSelection(bgzipped, threads=2)
+    assert list(threaded.sites) == list(expected.sites)
+    assert [dict(variant) for variant in threaded.sites.values()] == \
+        [dict(variant) for variant in expected.sites.values()]
+    assert {sample: list(threaded.variant[sample]) for sample in threaded.variant} == \
+        {sample: list(expected.variant[sample]) for sample in expected.variant}
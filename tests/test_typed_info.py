@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import re
+
+import pytest
+
+from vcf_varselect import VariantSelection
+
+
+@pytest.fixture(scope='module')
+def missing_dp(single, tmp_path_factory):
+    """
+    Single-sample vcf file with DP=. on 400 variant lines
+
+    """
+    vcffile = str(tmp_path_factory.mktemp('typed') / 'missing_dp.vcf')
+    n = 0
+    with open(single['vcf'][0], mode='r') as vcf, open(vcffile, mode='w') as out:
+        for line in vcf:
+            if not line.startswith('#') and n < 400 and re.search(r'[\t;]DP=\d+', line):
+                line = re.sub(r'([\t;])DP=\d+', r'\1DP=.', line, count=1)
+                n += 1
+            out.write(line)
+    assert n == 400
+    return vcffile
+
+
+def test_typed_missing_passes_every_path(missing_dp):
+    vcf = VariantSelection(infile=missing_dp, typed_info=True)
+    criteria = ['SIFT', 'POLYPHEN', 'CADD']
+    quality = vcf.quality_selection(DP=10, QD=2.0, bitsets=True)
+    damaging = vcf.damaging_selection(criteria=criteria, bitsets=True)[0]
+    expected = set(vcf.select_bits(quality & damaging)[vcf.sample])
+    missing = {key for key, variant in vcf.sites.items() if 'DP' in variant and variant['DP'] is None}
+    assert len(missing) == 400 and missing & expected
+
+    assert set(vcf.comb_selection(DP=10, QD=2.0, criteria=criteria)[0][vcf.sample]) == expected
+    [(params, result)] = vcf.sweep([dict(DP=10, QD=2.0, criteria=criteria)])
+    assert set(result[0][vcf.sample]) == expected
+    streamed = {key for sample, key, variant in VariantSelection.stream(missing_dp, DP=10, QD=2.0, criteria=criteria,
+                                                                        typed_info=True)}
+    assert streamed == expected
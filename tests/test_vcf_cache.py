@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+
+import pytest
+
+from vcf_varselect import vcf_cache
+from vcf_varselect.vcf_cache import VcfCache
+
+
+@pytest.fixture
+def cached_vcf(tmp_path):
+    vcffile = str(tmp_path / 'sample.vcf')
+    with open(vcffile, mode='w') as vcf:
+        vcf.write('1\t100\t.\tA\tG\n')
+    cache = VcfCache(str(tmp_path / 'cache'))
+    cache.save(vcffile, {'1:100:.:A:G': {}})
+    return vcffile, cache
+
+
+def rewrite(vcffile, text, mtime_ns):
+    stat = os.stat(vcffile)
+    with open(vcffile, mode='w') as vcf:
+        vcf.write(text)
+    os.utime(vcffile, ns=(stat.st_atime_ns, mtime_ns))
+
+
+def test_unchanged_file_is_not_hashed(cached_vcf, monkeypatch):
+    vcffile, cache = cached_vcf
+
+    def fail(infile):
+        raise AssertionError('the vcf file is hashed although size and mtime match')
+
+    monkeypatch.setattr(vcf_cache, 'file_digest', fail)
+    assert cache.load(vcffile) == {'1:100:.:A:G': {}}
+
+
+def test_new_mtime_with_the_same_content_keeps_the_cache(cached_vcf, monkeypatch):
+    vcffile, cache = cached_vcf
+    stat = os.stat(vcffile)
+    rewrite(vcffile, '1\t100\t.\tA\tG\n', stat.st_mtime_ns + 10 ** 9)
+    assert cache.load(vcffile) == {'1:100:.:A:G': {}}
+    # the new mtime is stored, the next load does not hash again
+    monkeypatch.setattr(vcf_cache, 'file_digest', None)
+    assert cache.load(vcffile) == {'1:100:.:A:G': {}}
+
+    rewrite(vcffile, '1\t100\t.\tA\tT\n', stat.st_mtime_ns + 2 * 10 ** 9)
+    monkeypatch.undo()
+    assert cache.load(vcffile) is None
+
+
+def test_verify_detects_a_rewrite_with_the_same_size_and_mtime(cached_vcf):
+    vcffile, cache = cached_vcf
+    stat = os.stat(vcffile)
+    rewrite(vcffile, '1\t100\t.\tA\tT\n', stat.st_mtime_ns)
+    assert os.stat(vcffile).st_size == stat.st_size
+    assert VcfCache(cache.cache_dir, verify=True).load(vcffile) is None
+    # without verify only size and mtime are compared
+    assert cache.load(vcffile) == {'1:100:.:A:G': {}}
@@ -2,6 +2,15 @@
 from .variant_selection import VariantSelection
 from .metadata_parser import MetadataParser
 from .read_variant import read_variant
+from .variant_record import LazyVariant
+from .compact_variant import CompactVariant
 from .match_gene import match_gene
-from .dict_to_df import dict_to_df
+from .gene_panel import GenePanel
+from .dict_to_df import dict_to_df, VariantTable, vcf_columns, dict_columns
 from .sample_combine import sample_combine
+from .inner_freq import InnerFreqStore, load_inner_freq, json_to_sqlite
+from .inner_freq_builder import InnerFreqBuilder, build_inner_freq
+from .filter_pipeline import FilterPipeline, comb_spec
+from .sweep import ThresholdSweep
+from .vcf_cache import VcfCache
+from .profiler import Profiler
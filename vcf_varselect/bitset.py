@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+"""
+Sets of variants as Python integers, bit i standing for the variant with index i; selections are combined
+with & (and), | (or) and & ~ (and not), which run in C over machine words. Bitsets are built from and decoded to
+packed bytes with NumPy (packbits, unpackbits) when it is installed, and counted with int.bit_count.
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_BIT_COUNT = hasattr(int, 'bit_count')
+
+
+def to_bitset(flags):
+    """
+    Bitset of the indexes of the true flags
+    Argument:
+        flags: sequence of booleans, one per variant index
+    Return:
+        int with bit i set when flags[i] is true
+
+    """
+    if not len(flags):
+        return 0
+    if np is None:
+        return int(''.join(['1' if flag else '0' for flag in reversed(flags)]), 2)
+    if isinstance(flags, np.ndarray):
+        data = flags.astype(bool)
+    else:
+        try:
+            # one byte per flag, packbits sets the bits of the non-zero bytes
+            data = np.frombuffer(flags if isinstance(flags, (bytes, bytearray)) else bytearray(flags), dtype=np.uint8)
+        except (TypeError, ValueError):
+            # flags which are not 0-255 integers or booleans, e.g. NumPy booleans
+            data = np.frombuffer(bytearray(map(bool, flags)), dtype=np.uint8)
+    return int.from_bytes(np.packbits(data, bitorder='little').tobytes(), 'little')
+
+
+def bitset_indexes(bits):
+    """
+    Indexes of the set bits, in increasing order
+
+    """
+    if not bits:
+        return []
+    if np is None:
+        text = format(bits, 'b')[::-1]
+        return [i for i, bit in enumerate(text) if bit == '1']
+    data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder='little')).tolist()
+
+
+def bitset_count(bits):
+    """
+    Number of set bits
+
+    """
+    # int.bit_count is new in Python 3.10
+    return bits.bit_count() if _BIT_COUNT else bin(bits).count('1')
+
+
+def indexes_to_bitset(indexes):
+    """
+    Bitset of a sequence of indexes
+
+    """
+    flags = bytearray(max(indexes) + 1) if indexes else bytearray()
+    for i in indexes:
+        flags[i] = 1
+    return to_bitset(flags)
+
+
+def at_least(bitsets, n):
+    """
+    Bitset of the indexes set in at least n of the bitsets
+    Arguments:
+        bitsets: list of bitsets;
+        n: number of bitsets, at least 1
+    Return:
+        bitset, 0 when there are fewer than n bitsets
+
+    """
+    # counts[j] holds the indexes set in at least j + 1 of the bitsets seen so far
+    counts = [0] * n
+    for bits in bitsets:
+        for j in range(n - 1, 0, -1):
+            counts[j] |= counts[j - 1] & bits
+        counts[0] |= bits
+    return counts[-1]
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+"""
+Command line batch selection of disorder related rare damaging variants
+
+usage:
+    vcf_varselect select manifest.txt --shards shards/ --output variants.csv --innerfreq inner_freq.db
+                  --genefile gene_list.csv --genderfile male_list.txt --FILTER PASS --DP 10 --criteria SIFT,POLYPHEN
+    vcf_varselect merge manifest.txt --shards shards/ --output variants.parquet
+
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from vcf_varselect.sample_combine import select_sample, selection_csq_columns
+from vcf_varselect.gene_panel import GenePanel
+from vcf_varselect.dict_to_df import VariantTable, dict_columns
+from vcf_varselect.profiler import peak_rss_mb
+
+SHARD_VERSION = 2
+
+
+def read_manifest(manifest):
+    """
+    Read a sample manifest, one vcf file per line as 'path' or 'sample<TAB>path'; relative paths are relative
+    to the manifest, empty lines and lines starting with '#' are skipped
+    Argument:
+        manifest: manifest file
+    Return:
+        list of (sample, vcf file); the sample is the file name without .vcf or .vcf.gz when not given
+
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    samples = []
+    with open(manifest, mode='r') as manifest_file:
+        for line in manifest_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            path = os.path.join(base, fields[-1])
+            if len(fields) > 1:
+                sample = fields[0]
+            else:
+                sample = os.path.basename(path)
+                for extension in ('.gz', '.vcf'):
+                    if sample.endswith(extension):
+                        sample = sample[:-len(extension)]
+            samples.append((sample, path))
+    names = [sample for sample, path in samples]
+    duplicated = sorted(set(sample for sample in names if names.count(sample) > 1))
+    if duplicated:
+        raise IOError("Samples listed more than once in the manifest: {0}".format(', '.join(duplicated)))
+    return samples
+
+
+def shard_file(shards, sample):
+    return os.path.join(shards, sample + '.shard')
+
+
+def _shard_header(vcffile, options):
+    stat = os.stat(vcffile)
+    return {'version': SHARD_VERSION, 'vcf': os.path.abspath(vcffile), 'size': stat.st_size,
+            'mtime': stat.st_mtime_ns, 'options': json.dumps(options, sort_keys=True)}
+
+
+def read_shard(shardfile, vcffile=None, options=None):
+    """
+    Read the selected variants of a shard file. Shards are pickles, loading one can run arbitrary code,
+    so the shard directory must only be writable by trusted users
+    Arguments:
+        shardfile: shard file;
+        vcffile, options: when given, the shard is only valid for this unchanged vcf file and these options
+    Return:
+        nested dictionary of selected variants, None if the shard is missing, incomplete or out of date
+
+    """
+    return _load_shard(shardfile, vcffile, options, variants=True)
+
+
+def shard_columns(shardfile):
+    """
+    Columns of the dataframe of the selected variants of a shard file (see dict_columns), without reading
+    the variants
+    Return:
+        list of columns, None if the shard is missing or incomplete
+
+    """
+    return _load_shard(shardfile, variants=False)
+
+
+def _load_shard(shardfile, vcffile=None, options=None, variants=True):
+    if not os.path.exists(shardfile):
+        return None
+    try:
+        with open(shardfile, mode='rb') as shard:
+            header = pickle.load(shard)
+            if header.get('version') != SHARD_VERSION:
+                return None
+            if vcffile is not None and header != _shard_header(vcffile, options):
+                return None
+            columns = pickle.load(shard)
+            return pickle.load(shard) if variants else columns
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError):
+        return None
+
+
+def write_shard(shardfile, vcffile, options, var_dict):
+    """
+    Write the selected variants of one sample to a shard file, the file only appears once it is complete
+
+    """
+    plain = {
+        sample: {key: {ID: (dict(variant[ID]) if ID == 'CSQ' else variant[ID]) for ID in variant}
+                 for key, variant in var_dict[sample].items()}
+        for sample in var_dict
+    }
+    handle, tmp_file = tempfile.mkstemp(dir=os.path.dirname(shardfile), suffix='.tmp')
+    try:
+        with os.fdopen(handle, mode='wb') as shard:
+            pickle.dump(_shard_header(vcffile, options), shard, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(dict_columns(plain), shard, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(plain, shard, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, shardfile)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def run_sample(sample, vcffile, shardfile, selection, options, panel):
+    """
+    Select the variants of one vcf file and write its shard
+    Arguments:
+        sample, vcffile, shardfile: sample of the manifest, its vcf file and shard file;
+        selection: options of select_sample;
+        options: options the shard is valid for;
+        panel: GenePanel object
+    Return:
+        (sample, number of selected variants, error message or None)
+
+    """
+    try:
+        var_dict = select_sample(vcffile, panel=panel, **selection)
+        write_shard(shardfile, vcffile, options, var_dict)
+    except Exception as error:
+        # any failure of one sample (e.g. zlib.error or EOFError of a truncated gzip file) is reported
+        # without stopping the other samples; an out of date shard must not end up in the merged table
+        if os.path.exists(shardfile):
+            os.remove(shardfile)
+        return sample, 0, '{0}: {1}'.format(type(error).__name__, error)
+    return sample, sum(len(i) for i in var_dict.values()), None
+
+
+def merge_shards(samples, shards, output):
+    """
+    Merge the shards of the samples of a manifest into one table, in manifest order
+    Arguments:
+        samples: list of (sample, vcf file) from read_manifest;
+        shards: shard directory;
+        output: .parquet, .csv or tab-separated (any other extension) output file
+    Return:
+        (number of merged samples, list of samples without a shard)
+
+    """
+    columns = None
+    if output.endswith('.parquet'):
+        # the parquet schema is fixed by the first row group, so it has the columns of every shard
+        columns = []
+        for sample, vcffile in samples:
+            shard = shard_columns(shard_file(shards, sample))
+            columns.extend(i for i in shard or [] if i not in columns)
+    table = VariantTable(outfile=output if output.endswith('.parquet') else None, columns=columns)
+    missing = []
+    for sample, vcffile in samples:
+        var_dict = read_shard(shard_file(shards, sample))
+        if var_dict is None:
+            missing.append(sample)
+            continue
+        table.add_samples(var_dict)
+    if output.endswith('.parquet'):
+        table.close()
+    else:
+        table.to_df().to_csv(output, sep=',' if output.endswith('.csv') else '\t')
+    return len(samples) - len(missing), missing
+
+
+def select(args):
+    samples = read_manifest(args.manifest)
+    os.makedirs(args.shards, exist_ok=True)
+    criteria = [i for i in args.criteria.split(',') if i]
+    selection = dict(FILTER=args.FILTER, DP=args.DP, QD=args.QD, MQ=args.MQ,
+                     innerfreqfile=args.innerfreq and os.path.abspath(args.innerfreq),
+                     KG=args.KG, EXAC=args.EXAC, GNOMAD=args.GNOMAD, SWEGEN=args.SWEGEN, INNER=args.INNER,
+                     criteria=criteria, cache_dir=args.cache_dir, chunk_size=args.chunk_size,
+                     csq_columns=selection_csq_columns(criteria, args.GNOMAD) if args.csq_columns else None)
+    # a shard is redone when the options, the inner-freq file or the gene and male lists change
+    options = dict(selection, cache_dir=None, chunk_size=None)
+    for name, path in (('innerfreqfile', args.innerfreq), ('genefile', args.genefile), ('genderfile', args.genderfile)):
+        options[name] = [os.path.abspath(path), os.stat(path).st_mtime_ns] if path else None
+    panel = GenePanel(genefile=args.genefile, genderfile=args.genderfile)
+
+    todo = []
+    for sample, vcffile in samples:
+        if read_shard(shard_file(args.shards, sample), vcffile, options) is None:
+            todo.append((sample, vcffile))
+    log('{0} samples, {1} already done, {2} to select'.format(len(samples), len(samples) - len(todo), len(todo)))
+
+    start = time.perf_counter()
+    done_bytes = 0
+    failed = []
+    sizes = {sample: os.path.getsize(vcffile) for sample, vcffile in todo if os.path.exists(vcffile)}
+
+    def progress(n, result):
+        nonlocal done_bytes
+        sample, selected, error = result
+        done_bytes += sizes.get(sample, 0)
+        seconds = time.perf_counter() - start
+        if error:
+            failed.append(sample)
+            log('[{0}/{1}] {2} failed: {3}'.format(n, len(todo), sample, error))
+        else:
+            log('[{0}/{1}] {2}: {3} variants, {4:.1f} samples/min, {5:.1f} MB/s'.format(
+                n, len(todo), sample, selected, 60.0 * n / seconds, done_bytes / 1048576.0 / seconds))
+
+    if not args.workers:
+        for n, (sample, vcffile) in enumerate(todo, 1):
+            progress(n, run_sample(sample, vcffile, shard_file(args.shards, sample), selection, options, panel))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [
+                executor.submit(run_sample, sample, vcffile, shard_file(args.shards, sample),
+                                selection, options, panel)
+                for sample, vcffile in todo
+            ]
+            for n, future in enumerate(as_completed(futures), 1):
+                progress(n, future.result())
+
+    if args.output:
+        merged, missing = merge_shards(samples, args.shards, args.output)
+        log('merged {0} samples into {1}'.format(merged, args.output))
+        if missing:
+            log('{0} samples without a shard: {1}'.format(len(missing), ', '.join(missing)))
+    if peak_rss_mb() is not None:
+        log('peak memory {0:.0f} MB, {1:.0f} MB in worker processes'.format(peak_rss_mb(), peak_rss_mb(children=True)))
+    if failed:
+        log('{0} samples failed: {1}'.format(len(failed), ', '.join(failed)))
+        return 1
+    return 0
+
+
+def merge(args):
+    merged, missing = merge_shards(read_manifest(args.manifest), args.shards, args.output)
+    log('merged {0} samples into {1}'.format(merged, args.output))
+    if missing:
+        log('{0} samples without a shard: {1}'.format(len(missing), ', '.join(missing)))
+        return 1
+    return 0
+
+
+def log(message):
+    sys.stderr.write(message + '\n')
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vcf_varselect',
+                                     description='Select disorder related rare damaging variants from vcf files')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    select_parser = commands.add_parser('select', help='select the variants of every sample of a manifest')
+    select_parser.add_argument('manifest', help="one vcf file per line, as 'path' or 'sample<TAB>path'")
+    select_parser.add_argument('--shards', required=True, help='directory of the per-sample result shards (pickles), '
+                               'only writable by trusted users')
+    select_parser.add_argument('--output', help='merged table, .parquet, .csv or tab-separated')
+    select_parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    select_parser.add_argument('--innerfreq', help='json or SQLite inner-freq file')
+    select_parser.add_argument('--genefile', required=True, help='disorder related gene list')
+    select_parser.add_argument('--genderfile', required=True, help='male sample list')
+    select_parser.add_argument('--FILTER')
+    for name in ('DP', 'QD', 'MQ', 'KG', 'EXAC', 'GNOMAD', 'SWEGEN'):
+        select_parser.add_argument('--' + name, type=float)
+    select_parser.add_argument('--INNER', type=float, default=0.01)
+    select_parser.add_argument('--criteria', default='', help='missense algorithms, e.g. SIFT,POLYPHEN,MPC,CADD')
+    select_parser.add_argument('--cache-dir', dest='cache_dir', help='on-disk cache of parsed vcf files')
+    select_parser.add_argument('--chunk-size', dest='chunk_size', type=int,
+                               help='read each vcf file this many variant lines at a time to bound memory')
+    select_parser.add_argument('--csq-columns', dest='csq_columns', choices=['auto'],
+                               help="'auto' to decode only the VEP columns used by the selection")
+    select_parser.set_defaults(func=select)
+
+    merge_parser = commands.add_parser('merge', help='merge the shards of a manifest into one table')
+    merge_parser.add_argument('manifest')
+    merge_parser.add_argument('--shards', required=True)
+    merge_parser.add_argument('--output', required=True, help='merged table, .parquet, .csv or tab-separated')
+    merge_parser.set_defaults(func=merge)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
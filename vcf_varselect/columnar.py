@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from vcf_varselect.record_selection import info_float, csq_floats
+
+
+class VariantColumns(object):
+    """
+    Columnar view of the variants of one sample for vectorized quality and frequency selection.
+    Numeric INFO fields (DP, QD, MQ, 1000GAF, EXACAF, SWEGENAF) and the highest VEP gnomAD_AF of each variant
+    are parsed once into NumPy arrays, with NaN for missing values, the first time they are needed.
+    Argument:
+        variants: variant dictionary of one sample {variant1: {...}, variant2: {...}}
+
+    """
+
+    def __init__(self, variants):
+        if np is None:
+            raise ImportError("numpy is required for the numpy backend, please install numpy.")
+        self.variants = variants
+        self.keys = np.array(list(variants), dtype=object)
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def column(self, name):
+        """
+        Return the column of one field, parsed on first use
+        Argument:
+            name: 'FILTER', 'gnomAD_AF' or a numeric INFO ID
+        Return:
+            NumPy array with one value per variant
+
+        """
+        if name not in self.columns:
+            variants = [self.variants[key] for key in self.keys]
+            if name == 'FILTER':
+                self.columns[name] = np.array([variant['FILTER'] for variant in variants], dtype=object)
+            elif name == 'gnomAD_AF':
+                self.columns[name] = np.array([
+                    max(csq_floats(variant, 'gnomAD_AF'), default=np.nan)
+                    for variant in variants
+                ], dtype=float)
+            else:
+                self.columns[name] = np.array([
+                    info_float(variant, name) if name in variant else np.nan
+                    for variant in variants
+                ], dtype=float)
+        return self.columns[name]
+
+    def quality_mask(self, FILTER=None, DP=None, QD=None, MQ=None):
+        """
+        Boolean mask of good quality variants, same criteria as VariantSelection.quality_selection
+        Arguments:
+            FILTER, DP, QD, MQ: variants quality threshold
+
+        """
+        mask = np.ones(len(self.keys), dtype=bool)
+        if FILTER:
+            mask &= self.column('FILTER') == FILTER
+        for name, threshold in (('DP', DP), ('QD', QD), ('MQ', MQ)):
+            if threshold:
+                mask &= ~(self.column(name) < float(threshold))
+        return mask
+
+    def freq_mask(self, innerfreq=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None, INNER=0.01):
+        """
+        Boolean mask of rare variants, same criteria as VariantSelection.freq_selection
+        Arguments:
+            innerfreq: InnerFreqStore or dictionary of variant inner-freq from all samples;
+            KG, EXAC, GNOMAD, SWEGEN, INNER: rare variants frequency threshold
+
+        """
+        mask = np.ones(len(self.keys), dtype=bool)
+        for name, threshold in (('1000GAF', KG), ('EXACAF', EXAC), ('gnomAD_AF', GNOMAD), ('SWEGENAF', SWEGEN)):
+            if threshold:
+                mask &= ~(self.column(name) > float(threshold))
+        if innerfreq is not None:
+            inner = np.array([innerfreq.get(key, np.nan) for key in self.keys], dtype=float)
+            mask &= ~(inner > float(INNER))
+        return mask
+
+    def select(self, mask):
+        """
+        Return the variant dictionary of the variants in a boolean mask
+
+        """
+        return {key: self.variants[key] for key in self.keys[mask]}
+
+    def bitset(self, mask):
+        """
+        Return the bitset (see bitset) of the variant indexes in a boolean mask
+
+        """
+        return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
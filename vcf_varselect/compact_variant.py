@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import sys
+from array import array
+from collections.abc import Mapping
+
+# numeric fields kept in packed storage
+PACKED_FIELDS = ('QUAL', 'DP', 'QD', 'MQ', '1000GAF', 'EXACAF', 'SWEGENAF')
+PACKED_INDEX = {field: i for i, field in enumerate(PACKED_FIELDS)}
+
+# text of a missing INFO or VEP value
+MISSING_TEXT = ('', '.')
+
+class _Stored(object):
+    """
+    Placeholder in the value tuple for fields stored elsewhere (packed numbers, VEP annotation),
+    unpickled as the same module-level object
+
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_STORED'
+
+
+_STORED = _Stored()
+
+_layouts = {}
+
+
+class _Layout(object):
+    """
+    Shared, interned tuple of field names with their positions
+
+    """
+
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+    def __reduce__(self):
+        # unpickled variants share the interned layout again
+        return _layout, (self.keys,)
+
+
+def _layout(keys):
+    """
+    Return the shared layout of a tuple of field names, so that variants with the same
+    fields store one reference instead of their own copy of the names
+
+    """
+    layout = _layouts.get(keys)
+    if layout is None:
+        layout = _layouts[keys] = _Layout(tuple(sys.intern(key) for key in keys))
+    return layout
+
+
+def text_float(text):
+    """
+    Number of an INFO or VEP value, nan for a missing value ('' or '.')
+
+    """
+    return float('nan') if text in MISSING_TEXT else float(text)
+
+
+def _pack(text):
+    """
+    Convert a numeric string to (number, is_integer) if the string can be rebuilt exactly from the number,
+    otherwise return None and the string is kept as it is
+
+    """
+    try:
+        number = int(text)
+        if str(number) == text and abs(number) < 2 ** 53:
+            return float(number), True
+        return None
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    if repr(number) == text:
+        return number, False
+    return None
+
+
+class CsqTable(Mapping):
+    """
+    Read-only view of the VEP annotation of one variant, {column: [value of each transcript]}.
+    Transcripts are stored once as tuples, column lists are built when a column is read.
+
+    """
+
+    __slots__ = ('_layout', '_rows')
+
+    def __init__(self, layout, rows):
+        self._layout = layout
+        self._rows = rows
+
+    def __getitem__(self, item):
+        i = self._layout.index[item]
+        return [row[i] for row in self._rows]
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._layout.keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class CompactVariant(Mapping):
+    """
+    Memory compact variant information. Field names are interned and shared between variants,
+    QUAL, DP, QD, MQ, 1000GAF, EXACAF and SWEGENAF are packed into one array of doubles, and VEP annotation
+    is stored once as a tuple of transcripts instead of a dictionary of per-column lists.
+    Reads like the dictionary built by read_variant:
+    {'QUAL': "", 'FILTER': "", 'GT': "", 'info_ID1': [], 'info_ID2': [], ..., 'CSQ': {'Gene': [], ...}}
+
+    Memory per variant, measured by benchmarks/record_memory.py (tracemalloc, Python 3.11, 5000 synthetic
+    variants with 56 VEP columns, 1-4 transcripts (2.5 on average) and 7.8 INFO fields on average):
+        dict from read_variant:  about 10.3 kB
+        LazyVariant:  about 1.3 kB before any field is read, 12.3 kB once all are read
+        CompactVariant:  about 3.2 kB
+    Arguments:
+        variant_line: tab-split variant line
+        parser: A MetadataParser object
+        csq_columns: VEP columns kept from CSQ, all columns when None
+
+    """
+
+    __slots__ = ('_layout', '_values', '_numbers', '_integers', '_csq_layout', '_csq')
+
+    def __init__(self, variant_line, parser, csq_columns=None):
+        fields = {'QUAL': variant_line[5], 'FILTER': variant_line[6]}
+        format_keys = variant_line[8].split(':')
+        for i in range(len(format_keys)):
+            if format_keys[i] == 'GT':
+                fields['GT'] = variant_line[9].split(':')[i]
+        for info in variant_line[7].split(';'):
+            info = info.split('=')
+            fields[info[0]] = info[1] if len(info) > 1 else None
+
+        self._numbers = None
+        self._integers = 0
+        self._csq = None
+        self._csq_layout = None
+        values = []
+        for key, value in fields.items():
+            if key in PACKED_INDEX and value is not None and ',' not in value:
+                packed = _pack(value)
+                if packed is not None:
+                    if self._numbers is None:
+                        self._numbers = array('d', [float('nan')] * len(PACKED_FIELDS))
+                    self._numbers[PACKED_INDEX[key]] = packed[0]
+                    if packed[1]:
+                        self._integers |= 1 << PACKED_INDEX[key]
+                    values.append(_STORED)
+                    continue
+            if key == 'CSQ':
+                self._set_csq(value, parser, csq_columns)
+                values.append(_STORED)
+                continue
+            if (key == 'FILTER' or key == 'GT') and value is not None:
+                value = sys.intern(value)
+            values.append(value)
+
+        self._layout = _layout(tuple(fields))
+        self._values = tuple(values)
+
+    def _set_csq(self, value, parser, csq_columns=None):
+        """
+        Store VEP annotation as a tuple of transcripts with interned values, only the columns
+        in csq_columns when given
+
+        """
+        transcripts = [vep.split('|') for vep in value.split(',')] if value is not None else []
+        width = min([len(row) for row in transcripts] + [len(parser.vep_columns)])
+        # columns missing from a short annotation are dropped, as in read_variant
+        projection = [(column, i) for column, i in parser.csq_projection(csq_columns) if i < width]
+        self._csq_layout = _layout(tuple(column for column, i in projection))
+        if csq_columns is None:
+            self._csq = tuple(tuple(sys.intern(i) for i in row[:width]) for row in transcripts)
+        else:
+            self._csq = tuple(tuple(sys.intern(row[i]) for column, i in projection) for row in transcripts)
+
+    def _number_text(self, key):
+        number = self._numbers[PACKED_INDEX[key]]
+        if self._integers >> PACKED_INDEX[key] & 1:
+            return '%d' % number
+        return repr(number)
+
+    def __getitem__(self, item):
+        value = self._values[self._layout.index[item]]
+        if value is _STORED:
+            if item == 'CSQ':
+                return CsqTable(self._csq_layout, self._csq)
+            value = self._number_text(item)
+        if item == 'QUAL' or item == 'FILTER' or item == 'GT':
+            return value
+        if value is None:
+            return []
+        elif ',' in value:
+            return value.split(',')
+        return [value]
+
+    def __contains__(self, item):
+        return item in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._layout.keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def info_float(self, item):
+        """
+        Numeric value of a field, same as text_float(''.join(variant[item])) but read from packed storage when
+        possible
+
+        """
+        if self._values[self._layout.index[item]] is _STORED and item in PACKED_INDEX:
+            return self._numbers[PACKED_INDEX[item]]
+        return text_float(''.join(self[item]))
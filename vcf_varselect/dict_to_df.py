@@ -3,35 +3,243 @@
 # __author__ = 'Danyang Li'
 # __date__ = 2020-04-02
 
+import os
+import shutil
+import tempfile
+import warnings
 import pandas as pd
 
-def dict_to_df(var_dict):
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# column of the parquet file holding the row names of the dataframe (sample_variant)
+INDEX_COLUMN = 'sample_variant'
+
+# approximate bytes of a buffered value: a list slot and a str or float object
+_VALUE_BYTES = 57
+
+
+def vcf_columns(metadata, csq_columns=None):
     """
-    Change variant dictionary from all samples to a dataframe
+    Columns of the dataframe of the variants of a vcf file
+    Argument:
+        metadata: MetadataParser object of the vcf file;
+        csq_columns: VEP columns decoded from CSQ, all columns when None
+    Return:
+        list of columns, QUAL, FILTER, GT, INFO IDs and CSQ:<VEP column>
+
+    """
+    columns = ['QUAL', 'FILTER', 'GT']
+    columns.extend(i for i in metadata.id_dict['INFO'] if i != 'CSQ' and i not in columns)
+    columns.extend('CSQ:' + i for i, index in metadata.csq_projection(csq_columns) if 'CSQ:' + i not in columns)
+    return columns
+
+
+def dict_columns(var_dict):
+    """
+    Columns of the dataframe of a nested variant dictionary {sample: {variant: {...}}}, in the order
+    VariantTable adds them
     Argument:
         var_dict: variant dictionary
     Return:
-        df with sample ID as row and annotation information as columns
+        list of columns, variant fields and CSQ:<VEP column>
 
     """
-    new_dict = {}
-    for key in var_dict:
-        for var in var_dict[key]:
-            key_var = '_'.join([key, var])
-            new_dict[key_var] = {}
-            for ID in var_dict[key][var]:
+    columns = {}
+    for sample in var_dict:
+        for variant in var_dict[sample].values():
+            for ID in variant:
                 if ID != 'CSQ':
-                    new_dict[key_var][ID] = var_dict[key][var][ID]
-                    if type(new_dict[key_var][ID]) == list:
-                        new_dict[key_var][ID] = ','.join(new_dict[key_var][ID])
+                    columns[ID] = None
+                else:
+                    for i in variant[ID]:
+                        columns[':'.join([ID, i])] = None
+    return list(columns)
+
+
+def _parquet_value(value):
+    # nan marks a missing value, numbers and flags decoded with typed_info are written as text
+    if type(value) == str or value is None:
+        return value
+    if value != value:
+        return None
+    return str(value)
+
+
+class VariantTable(object):
+    """
+    Columnar builder of the dataframe of variants from all samples. Variants of each sample are appended
+    straight into column buffers, lists are joined with ',' and every VEP column becomes a 'CSQ:<column>'
+    column, the same layout as dict_to_df. The result is a dataframe, or a parquet file written incrementally
+    with one row group per sample so that buffers only hold one sample at a time.
+    Arguments:
+        outfile: parquet file to write, needs pyarrow; the dataframe is built in memory when None;
+        columns: columns of the parquet file (see vcf_columns), the columns of the first sample when None;
+                 once the first row group is written, values of other columns (e.g. INFO IDs missing from the
+                 vcf header) are left out with a warning and counted in self.dropped {column: values};
+        max_buffer_mb: when building the dataframe, buffered samples are spilled to temporary files once the
+                       buffers hold about this many MB, and read back by to_df; no spilling when None;
+        spill_dir: directory of the temporary files, the system temporary directory when None
+
+    """
+
+    def __init__(self, outfile=None, columns=None, max_buffer_mb=None, spill_dir=None):
+        if outfile and pq is None:
+            raise ImportError("pyarrow is required to write parquet files, please install pyarrow.")
+        self.outfile = outfile
+        self.schema = None
+        self.writer = None
+        self.index = []
+        self.columns = {}
+        self.rows = 0
+        self.buffer_bytes = 0
+        self.max_buffer_mb = max_buffer_mb
+        self.spill_dir = spill_dir
+        self.spill_files = []
+        self._spill_tmp = None
+        self.dropped = {}
+        if columns is not None:
+            for column in columns:
+                self.columns[column] = []
 
+    def _append(self, column, value):
+        if column not in self.columns:
+            if self.schema is not None:
+                # the schema of a parquet file is fixed by its first row group
+                if column not in self.dropped:
+                    warnings.warn("Column is not in the parquet file, its values are left out: {0}".format(column))
+                    self.dropped[column] = 0
+                self.dropped[column] += 1
+                return
+            self.columns[column] = [float('nan')] * self.rows
+        if type(value) == list:
+            try:
+                value = ','.join(value)
+            except TypeError:
+                # INFO values decoded with typed_info
+                value = ','.join(['.' if i is None else str(i) for i in value])
+        self.columns[column].append(value)
+        self.buffer_bytes += _VALUE_BYTES + (len(value) if type(value) == str else 0)
+
+    def add(self, sample, variants):
+        """
+        Append the variants of one sample
+        Arguments:
+            sample: sample ID;
+            variants: variant dictionary of the sample {variant1: {...}, variant2: {...}}
+
+        """
+        for var in variants:
+            variant = variants[var]
+            self.index.append('_'.join([sample, var]))
+            for ID in variant:
+                if ID != 'CSQ':
+                    self._append(ID, variant[ID])
                 else:
-                    for i in var_dict[key][var][ID]:
-                        csq_id = ':'.join([ID, i])
-                        new_dict[key_var][csq_id] = var_dict[key][var][ID][i]
-                        if type(new_dict[key_var][csq_id]) == list:
-                            new_dict[key_var][csq_id] = ','.join(new_dict[key_var][csq_id])
+                    csq = variant[ID]
+                    for i in csq:
+                        self._append(':'.join([ID, i]), csq[i])
+            self.rows += 1
+            for values in self.columns.values():
+                if len(values) < self.rows:
+                    values.append(float('nan'))
+                    self.buffer_bytes += _VALUE_BYTES
+        if self.outfile:
+            self._write_row_group()
+        elif self.max_buffer_mb is not None and self.buffer_bytes > self.max_buffer_mb * 1048576:
+            self.spill()
+
+    def add_samples(self, var_dict):
+        """
+        Append the variants of every sample of a nested variant dictionary {sample: {variant: {...}}}
+
+        """
+        for sample in var_dict:
+            self.add(sample, var_dict[sample])
+
+    def _clear(self):
+        self.index = []
+        self.columns = {i: [] for i in self.columns}
+        self.rows = 0
+        self.buffer_bytes = 0
+
+    def spill(self):
+        """
+        Move the buffered rows to a temporary file, read back by to_df
+
+        """
+        if not self.rows:
+            return
+        if self._spill_tmp is None:
+            self._spill_tmp = tempfile.mkdtemp(prefix='vcf_varselect_', dir=self.spill_dir)
+        spill_file = os.path.join(self._spill_tmp, '{0}.pkl'.format(len(self.spill_files)))
+        pd.DataFrame(self.columns, index=self.index).to_pickle(spill_file)
+        self.spill_files.append(spill_file)
+        self._clear()
+
+    def _remove_spill(self):
+        if self._spill_tmp is not None:
+            shutil.rmtree(self._spill_tmp, ignore_errors=True)
+            self._spill_tmp = None
+            self.spill_files = []
+
+    def _write_row_group(self):
+        if not self.rows:
+            return
+        if self.schema is None:
+            self.schema = pa.schema([(INDEX_COLUMN, pa.string())] + [(i, pa.string()) for i in self.columns])
+            self.writer = pq.ParquetWriter(self.outfile, self.schema)
+        arrays = [pa.array(self.index, type=pa.string())] + [
+            pa.array([_parquet_value(value) for value in self.columns[i]], type=pa.string())
+            for i in self.schema.names[1:]
+        ]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self._clear()
+
+    def close(self):
+        """
+        Finish the parquet file, or remove the temporary files of spilled rows
+
+        """
+        self._remove_spill()
+        if self.outfile:
+            self._write_row_group()
+            if self.writer is None:
+                self.schema = pa.schema([(INDEX_COLUMN, pa.string())] + [(i, pa.string()) for i in self.columns])
+                self.writer = pq.ParquetWriter(self.outfile, self.schema)
+            self.writer.close()
 
-    df = pd.DataFrame.from_dict({i: new_dict[i] for i in new_dict.keys()}, orient='index')
-    return df
+    def to_df(self):
+        """
+        Dataframe with sample_variant as rows and annotation information as columns; spilled rows are
+        read back once and their temporary files removed
 
+        """
+        if self.spill_files:
+            frames = [pd.read_pickle(spill_file) for spill_file in self.spill_files]
+            if self.index:
+                frames.append(pd.DataFrame(self.columns, index=self.index))
+            self._remove_spill()
+            self._clear()
+            return pd.concat(frames, sort=False)
+        if not self.index:
+            return pd.DataFrame.from_dict({}, orient='index')
+        return pd.DataFrame(self.columns, index=self.index)
+
+
+def dict_to_df(var_dict):
+    """
+    Change variant dictionary from all samples to a dataframe
+    Argument:
+        var_dict: variant dictionary
+    Return:
+        df with sample ID as row and annotation information as columns
+
+    """
+    table = VariantTable()
+    table.add_samples(var_dict)
+    return table.to_df()
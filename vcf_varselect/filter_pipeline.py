@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import re
+import time
+import operator
+
+from vcf_varselect.record_selection import info_float, info_values, csq_floats, damaging_check, \
+    CRITERIA_VEP_COLUMNS
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+condition_pattern = re.compile(r'^\s*(?P<field>[^\s<>=!]+)\s*(?P<op>==|!=|<=|>=|<|>)\s*(?P<value>.+?)\s*$')
+function_pattern = re.compile(r'^\s*(?P<name>lof|damaging_missense|damaging)\s*(\((?P<args>[^)]*)\))?\s*$')
+
+
+def comb_spec(FILTER=None, DP=None, QD=None, MQ=None,
+              innerfreqfile=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None,
+              criteria=[], INNER=0.01):
+    """
+    Filter spec of the criteria of VariantSelection.comb_selection
+    Arguments:
+        FILTER, DP, QD, MQ: variants quality threshold;
+        innerfreqfile, KG, EXAC, GNOMAD, SWEGEN, INNER: rare variants frequency threshold;
+        criteria: selected missense algorithm list
+    Return:
+        list of filter conditions, e.g. ['FILTER == PASS', 'DP >= 10.0', ..., 'damaging(SIFT,POLYPHEN)']
+
+    """
+    spec = []
+    if FILTER:
+        spec.append('FILTER == {0}'.format(FILTER))
+    for field, threshold in (('DP', DP), ('QD', QD), ('MQ', MQ)):
+        if threshold:
+            spec.append('{0} >= {1!r}'.format(field, float(threshold)))
+    for field, threshold in (('1000GAF', KG), ('EXACAF', EXAC), ('CSQ:gnomAD_AF', GNOMAD), ('SWEGENAF', SWEGEN)):
+        if threshold:
+            spec.append('{0} <= {1!r}'.format(field, float(threshold)))
+    if innerfreqfile:
+        spec.append('INNER <= {0!r}'.format(float(INNER)))
+    spec.append('damaging({0})'.format(','.join(criteria)))
+    return spec
+
+
+class Condition(object):
+    """
+    One compiled filter condition with its counters
+    Arguments:
+        name: condition text;
+        func: function(key, variant) returning True if the variant passes
+
+    """
+
+    __slots__ = ('name', 'func', 'evaluated', 'rejected', 'seconds')
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.evaluated = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    def rank(self):
+        """
+        Expected cost per rejected variant, conditions with the lowest rank are evaluated first
+
+        """
+        if not self.evaluated:
+            return 0.0
+        if not self.rejected:
+            return float('inf')
+        return (self.seconds / self.evaluated) / (self.rejected / self.evaluated)
+
+
+class FilterPipeline(object):
+    """
+    Declarative variant filter compiled into a single predicate with short-circuit evaluation.
+    A spec is a list of conditions a variant has to fulfil:
+        'FIELD OP VALUE' with OP one of == != < <= > >=, FIELD one of
+            FILTER, QUAL, GT, an INFO ID (e.g. DP, 1000GAF), CSQ:<VEP column> (every transcript has to fulfil it)
+            or INNER (inner-freq of the variant); variants without the field, or with a missing value
+            ('', '.' or nan, see csq_floats), pass the condition;
+        'lof': loss-of-function variant;
+        'damaging_missense(SIFT,POLYPHEN,...)': damaging missense variant by the listed missense algorithms;
+        'damaging(SIFT,POLYPHEN,...)': loss-of-function or damaging missense variant.
+    For the first calibrate variants every condition is evaluated and timed, then the conditions are reordered
+    so that the cheapest and most rejecting ones run first. Counts of evaluated and rejected variants and
+    evaluation time are kept per condition.
+    Arguments:
+        spec: list of conditions, see comb_spec for the criteria of comb_selection;
+        innerfreq: InnerFreqStore or dictionary of variant inner-freq, needed by INNER conditions;
+        calibrate: number of variants used to measure selectivity and cost, 0 keeps the order of the spec;
+        lof_terms: Consequence terms of loss-of-function variants of lof and damaging, LOF_TERMS when None
+
+    """
+
+    def __init__(self, spec, innerfreq=None, calibrate=1000, lof_terms=None):
+        self.spec = list(spec)
+        self.innerfreq = innerfreq
+        self.calibrate = calibrate
+        self.lof_terms = lof_terms
+        self.conditions = [Condition(text, self._compile(text)) for text in self.spec]
+        self.seen = 0
+        self.passed = 0
+
+    def _compile(self, text):
+        match = function_pattern.match(text)
+        if match:
+            name = match.group('name')
+            criteria = [i.strip() for i in (match.group('args') or '').split(',') if i.strip()]
+            lof_terms = self.lof_terms
+            if name == 'lof':
+                return lambda key, variant: damaging_check(variant, criteria=[], lof_terms=lof_terms)[0]
+            if name == 'damaging_missense':
+                return lambda key, variant: damaging_check(variant, criteria=criteria, lof_terms=lof_terms)[1]
+            return lambda key, variant: any(damaging_check(variant, criteria=criteria, lof_terms=lof_terms))
+
+        match = condition_pattern.match(text)
+        if not match:
+            raise SyntaxError("Filter condition is malformed: {0}".format(text))
+        field, compare, value = match.group('field'), OPERATORS[match.group('op')], match.group('value')
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        numeric = match.group('op') not in ('==', '!=') or number is not None and field != 'FILTER'
+
+        if field == 'INNER':
+            if number is None:
+                raise SyntaxError("INNER needs a numeric threshold: {0}".format(text))
+
+            def condition(key, variant):
+                inner = self.innerfreq.get(key) if self.innerfreq is not None else None
+                return inner is None or compare(inner, number)
+
+        elif field.startswith('CSQ:'):
+            column = field[4:]
+
+            def condition(key, variant):
+                if numeric:
+                    # missing values ('', '.' or nan) pass, like freq_selection
+                    return all(compare(i, number) for i in csq_floats(variant, column))
+                if 'CSQ' not in variant:
+                    return True
+                return all(i == "" or compare(i, value) for i in variant['CSQ'][column])
+
+        elif field in ('FILTER', 'QUAL', 'GT'):
+            def condition(key, variant):
+                if field not in variant:
+                    return True
+                if numeric:
+                    return compare(float(variant[field]), number)
+                return compare(variant[field], value)
+
+        else:
+            def condition(key, variant):
+                if field not in variant:
+                    return True
+                if numeric:
+                    number_value = info_float(variant, field)
+                    # a missing value (e.g. DP=. read with typed_info) passes like a missing field
+                    return number_value != number_value or compare(number_value, number)
+                return compare(','.join(['.' if i is None else str(i) for i in info_values(variant, field)]), value)
+
+        return condition
+
+    def csq_columns(self):
+        """
+        VEP columns read by the conditions, e.g. to decode only these columns with read_variant(csq_columns=...)
+
+        """
+        columns = []
+        for text in self.spec:
+            match = function_pattern.match(text)
+            if match:
+                columns.append('Consequence')
+                for criterion in (match.group('args') or '').split(','):
+                    if criterion.strip() in CRITERIA_VEP_COLUMNS and match.group('name') != 'lof':
+                        columns.append(CRITERIA_VEP_COLUMNS[criterion.strip()])
+            else:
+                field = condition_pattern.match(text).group('field')
+                if field.startswith('CSQ:'):
+                    columns.append(field[4:])
+        return [column for i, column in enumerate(columns) if column not in columns[:i]]
+
+    def missense_criteria(self):
+        """
+        Missense algorithms of the first damaging or damaging_missense condition, e.g. ['SIFT', 'POLYPHEN'],
+        None when the spec has no such condition
+
+        """
+        for text in self.spec:
+            match = function_pattern.match(text)
+            if match and match.group('name') in ('damaging', 'damaging_missense'):
+                return [i.strip() for i in (match.group('args') or '').split(',') if i.strip()]
+        return None
+
+    @property
+    def order(self):
+        """
+        Conditions in the order they are evaluated
+
+        """
+        return [condition.name for condition in self.conditions]
+
+    def reorder(self):
+        """
+        Sort the conditions by measured cost per rejected variant
+
+        """
+        self.conditions.sort(key=Condition.rank)
+
+    def __call__(self, key, variant):
+        """
+        Return True if the variant fulfils every condition
+
+        """
+        self.seen += 1
+        if self.seen <= self.calibrate:
+            passed = True
+            for condition in self.conditions:
+                start = time.perf_counter()
+                result = condition.func(key, variant)
+                condition.seconds += time.perf_counter() - start
+                condition.evaluated += 1
+                if not result:
+                    condition.rejected += 1
+                    passed = False
+            if self.seen == self.calibrate:
+                self.reorder()
+        else:
+            for condition in self.conditions:
+                condition.evaluated += 1
+                if not condition.func(key, variant):
+                    condition.rejected += 1
+                    return False
+            passed = True
+        if passed:
+            self.passed += 1
+        return passed
+
+    def filter(self, variants):
+        """
+        Yield (key, variant) of the variants of a dictionary fulfilling every condition
+
+        """
+        for key in variants:
+            if self(key, variants[key]):
+                yield key, variants[key]
+
+    def stats(self):
+        """
+        Counters of each condition in evaluation order. While calibrating, every condition is evaluated and
+        rejected counts every condition a variant fails; afterwards evaluation stops at the first failing
+        condition, so rejected only counts that one and evaluated the variants reaching the condition
+        Return:
+            list of {'condition', 'evaluated', 'rejected', 'seconds'}; seconds are measured while calibrating
+
+        """
+        return [
+            {'condition': condition.name, 'evaluated': condition.evaluated,
+             'rejected': condition.rejected, 'seconds': condition.seconds}
+            for condition in self.conditions
+        ]
+
+    def merge_stats(self, stats):
+        """
+        Add the counters of another pipeline with the same spec, e.g. from a worker process
+
+        """
+        conditions = {condition.name: condition for condition in self.conditions}
+        for stat in stats:
+            condition = conditions[stat['condition']]
+            condition.evaluated += stat['evaluated']
+            condition.rejected += stat['rejected']
+            condition.seconds += stat['seconds']
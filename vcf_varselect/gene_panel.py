@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+# genes in both x and y chromosome
+PSUDOLIST = [
+    'ENSG00000197976', 'ENSG00000196433', 'ENSG00000169093', 'ENSG00000002586', 'ENSG00000205755',
+    'ENSG00000198223', 'ENSG00000169084', 'ENSG00000178605', 'ENSG00000185291', 'ENSG00000182162',
+    'ENSG00000182378', 'ENSG00000167393', 'ENSG00000185960', 'ENSG00000169100', 'ENSG00000124343',
+    'ENSG00000214717', 'ENSG00000124334', 'ENSG00000168939', 'ENSG00000124333', 'ENSG00000182484'
+]
+
+
+class GenePanel(object):
+    """
+    Disorder related genes and male samples for match_gene, built once from the gene and gender files.
+    Genes of each inheritance group (AR, AD, XR, XD), the genes in both x and y chromosome and the male
+    samples are kept in sets, and the genes matching each genotype are combined in advance.
+    Arguments:
+        genefile: disorder related gene list;
+        genderfile: male sample ID
+
+    """
+
+    def __init__(self, genefile=None, genderfile=None):
+        if not genefile:
+            raise IOError("Please input disorders gene list.")
+        if not genderfile:
+            raise IOError("Please input individual gender information")
+
+        gene_group = read_gene_group(genefile)
+        self.gene_ar = frozenset(gene_group['gene_ar'])
+        self.gene_xr = frozenset(gene_group['gene_xr'])
+        self.gene_ad = frozenset(gene_group['gene_ad'])
+        self.gene_xd = frozenset(gene_group['gene_xd'])
+        self.psudo = frozenset(PSUDOLIST)
+        self.males = frozenset(read_male_list(genderfile))
+
+        # genes selected for each chromosome type and genotype
+        self.autosome_het = self.gene_ad
+        self.autosome_hom = self.gene_ad | self.gene_ar
+        self.x_het = self.gene_xd
+        self.x_hom = self.gene_xd | self.gene_xr
+        self.male_het = self.gene_xd & self.psudo
+        self.male_hom = (self.gene_xd | self.gene_xr) & self.psudo
+        self.male_hemi = (self.gene_xd | self.gene_xr) - self.psudo
+
+    def match(self, sample, key, variant):
+        """
+        Check whether one variant of one sample falls in a disorder related gene
+        with a matching inheritance model
+        Arguments:
+            sample: sample ID;
+            key: variant key, format: chromosome:position:rsID:reference:alternative;
+            variant: variant information dictionary
+        Return:
+            True if the variant is a disorder related variant
+
+        """
+        chrom = key.split(':', 1)[0]
+        gt = variant['GT']
+
+        #####autosome variant#####
+        if chrom != 'X' and chrom != 'Y':
+            if gt == '0/1' or gt == '1/0':
+                genes = self.autosome_het
+            elif gt == '1/1':
+                genes = self.autosome_hom
+            else:
+                return False
+
+        #####x chromosome variant, female individual#####
+        elif sample not in self.males:
+            if chrom != 'X':
+                return False
+            if gt == '0/1' or gt == '1/0':
+                genes = self.x_het
+            elif gt == '1/1':
+                genes = self.x_hom
+            else:
+                return False
+
+        #####x and y chromosome variant, male individual#####
+        else:
+            # dominant and recessive psudogenes variant
+            if gt == '0/1' or gt == '1/0':
+                genes = self.male_het
+            elif gt == '1/1':
+                genes = self.male_hom
+            # non-psudogene variant
+            elif gt == './1' or gt == '1/.':
+                genes = self.male_hemi
+            else:
+                return False
+
+        return not genes.isdisjoint(variant['CSQ']['Gene'])
+
+
+def read_gene_group(genefile):
+    """
+    Divide candidate disorder genes into different groups based on inheritance
+    Argument:
+        genefile: disorder related gene list
+    Return:
+        dictionary of gene lists: {'gene_ar': [], 'gene_xr': [], 'gene_ad': [], 'gene_xd': []}
+
+    """
+    #####generate genefile dictionary######
+    gene_file = open(genefile, mode='r')
+    gene_dict = {}
+    for line in gene_file:
+        gene_dict[line.split(',')[1]] = [
+            line.strip().split(',')[0], line.strip().split(',')[2]
+        ]
+    gene_file.close()
+
+    gene_group = {'gene_ar': [], 'gene_xr': [], 'gene_ad': [], 'gene_xd': []}
+    for key in gene_dict:
+        if 'AR' in gene_dict[key][1] and 'AD' not in gene_dict[key][1]:
+            gene_group['gene_ar'].append(key)
+        if 'XR' in gene_dict[key][1] and 'XD' not in gene_dict[key][1]:
+            gene_group['gene_xr'].append(key)
+        if 'AD' in gene_dict[key][1]:
+            gene_group['gene_ad'].append(key)
+        if 'XD' in gene_dict[key][1]:
+            gene_group['gene_xd'].append(key)
+
+    return gene_group
+
+
+def read_male_list(genderfile):
+    """
+    Read male sample IDs
+    Argument:
+        genderfile: male sample ID
+    Return:
+        list of male sample IDs
+
+    """
+    malefile = open(genderfile, mode='r')
+    male_list = [line.strip() for line in malefile]
+    malefile.close()
+    return male_list
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import json
+import sqlite3
+import pathlib
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+# stores loaded in this process, {file path: (size, modification time, store)}, one store per file
+_stores = {}
+
+
+class InnerFreqStore(object):
+    """
+    Variant inner-freq table from all samples, {variant: freq}. A json file is loaded into a dictionary,
+    a SQLite index (see json_to_sqlite) is queried by its primary key without loading the table.
+    Use load_inner_freq to load each file once per process and share it between VariantSelection instances.
+    Argument:
+        innerfreqfile: json or SQLite file of variant inner-freq
+
+    """
+
+    def __init__(self, innerfreqfile):
+        if not innerfreqfile or not os.path.isfile(innerfreqfile):
+            raise IOError("Inner-freq file not found: {0}".format(innerfreqfile))
+        self.path = innerfreqfile
+        self._freq = None
+        self._db = None
+        self._pid = None
+
+        with open(innerfreqfile, mode='rb') as freq_file:
+            self.format = 'sqlite' if freq_file.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC else 'json'
+        if self.format == 'json':
+            with open(innerfreqfile, mode='r') as freq_file:
+                self._freq = json.load(freq_file)
+
+    def _connection(self):
+        # a SQLite connection must not be shared with forked worker processes
+        if self._db is None or self._pid != os.getpid():
+            # as_uri escapes characters of the path with a meaning in URIs, e.g. '?', '#' and '%'
+            uri = pathlib.Path(self.path).resolve().as_uri() + '?mode=ro'
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key, default=None):
+        """
+        Inner-freq of one variant, default if the variant is not in the table
+
+        """
+        if self._freq is not None:
+            return self._freq.get(key, default)
+        row = self._connection().execute(
+            'SELECT freq FROM inner_freq WHERE variant = ?', (key,)
+        ).fetchone()
+        return default if row is None else row[0]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        freq = self.get(key)
+        if freq is None:
+            raise KeyError(key)
+        return freq
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_db'] = None
+        state['_pid'] = None
+        return state
+
+
+def load_inner_freq(innerfreqfile):
+    """
+    Return the InnerFreqStore of a json or SQLite inner-freq file, loaded once per process
+    and reloaded, replacing the previous store, when the file changes
+    Argument:
+        innerfreqfile: json or SQLite file of variant inner-freq, or an InnerFreqStore
+    Return:
+        InnerFreqStore object
+
+    """
+    if isinstance(innerfreqfile, InnerFreqStore):
+        return innerfreqfile
+    stat = os.stat(innerfreqfile)
+    path = os.path.abspath(innerfreqfile)
+    if path not in _stores or _stores[path][:2] != (stat.st_size, stat.st_mtime_ns):
+        _stores[path] = (stat.st_size, stat.st_mtime_ns, InnerFreqStore(innerfreqfile))
+    return _stores[path][2]
+
+
+def json_to_sqlite(jsonfile, dbfile):
+    """
+    Convert a json inner-freq file to an indexed SQLite file
+    Arguments:
+        jsonfile: json file of variant inner-freq, {variant: freq}
+        dbfile: output SQLite file, replaced if it exists
+    Return:
+        number of variants written
+
+    """
+    with open(jsonfile, mode='r') as freq_file:
+        innerfreq = json.load(freq_file)
+    if os.path.exists(dbfile):
+        os.remove(dbfile)
+    db = sqlite3.connect(dbfile)
+    try:
+        db.execute('CREATE TABLE inner_freq (variant TEXT PRIMARY KEY, freq REAL NOT NULL) WITHOUT ROWID')
+        db.executemany('INSERT INTO inner_freq VALUES (?, ?)', sorted(innerfreq.items()))
+        db.commit()
+    finally:
+        db.close()
+    return len(innerfreq)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import json
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from vcf_varselect.variant_selection import open_vcf, read_vcf_header, read_genotypes, is_carrier
+
+
+def count_variants(vcffile):
+    """
+    Count the carriers and alternative alleles of each variant in one vcf file (map step)
+    Argument:
+        vcffile: vcf file of one or more samples
+    Return:
+        (vcffile, sample IDs, {variant: carriers}, {variant: alternative alleles})
+
+    """
+    carriers = Counter()
+    alleles = Counter()
+    vcf = open_vcf(vcffile)
+    try:
+        metadata, sample, next_line = read_vcf_header(vcf)
+        while next_line and not next_line.startswith('#'):
+            variant_line = next_line.split('\t')
+            if len(variant_line) != len(metadata.header):
+                break
+            key = ':'.join(variant_line[:5])
+            for gt in read_genotypes(variant_line):
+                if is_carrier(gt):
+                    carriers[key] += 1
+                    alleles[key] += sum(
+                        1 for allele in gt.replace('|', '/').split('/') if allele not in ('0', '.', '')
+                    )
+            next_line = vcf.readline().rstrip()
+    finally:
+        vcf.close()
+    return vcffile, metadata.header[9:], carriers, alleles
+
+
+class InnerFreqBuilder(object):
+    """
+    Build the inner-freq table of a cohort from the sample vcf files. The vcf files are counted in a process
+    pool (map) and the counts are added to a persisted count state (reduce), a SQLite file holding the counted
+    files and samples and the carriers and alternative alleles of every variant. Adding new samples to an
+    existing state only reads the new vcf files.
+    Argument:
+        statefile: SQLite file of the count state, created if it does not exist
+
+    """
+
+    def __init__(self, statefile):
+        self.statefile = statefile
+        self.db = sqlite3.connect(statefile)
+        self.db.execute('CREATE TABLE IF NOT EXISTS files '
+                        '(path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS samples (sample TEXT PRIMARY KEY, path TEXT NOT NULL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS counts (variant TEXT PRIMARY KEY, '
+                        'carriers INTEGER NOT NULL, alleles INTEGER NOT NULL) WITHOUT ROWID')
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    @property
+    def n_samples(self):
+        return self.db.execute('SELECT COUNT(*) FROM samples').fetchone()[0]
+
+    def _new_files(self, files):
+        new_files = []
+        for vcffile in files:
+            path = os.path.abspath(vcffile)
+            stat = os.stat(path)
+            row = self.db.execute('SELECT size, mtime FROM files WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                new_files.append(path)
+            elif row != (stat.st_size, stat.st_mtime_ns):
+                raise IOError("File changed after it was counted, please rebuild the inner-freq state: "
+                              "{0}".format(vcffile))
+        return new_files
+
+    def update(self, files, workers=None):
+        """
+        Count the vcf files which are not in the state yet
+        Arguments:
+            files: vcf files, or a directory of vcf files (.vcf and .vcf.gz);
+            workers: number of worker processes, files are counted one after another when None
+        Return:
+            number of files counted
+
+        """
+        if isinstance(files, str):
+            files = [
+                os.path.join(files, filename) for filename in sorted(os.listdir(files))
+                if filename.endswith('.vcf.gz') or filename.endswith('.vcf')
+            ]
+        new_files = self._new_files(files)
+        if not workers:
+            for counts in map(count_variants, new_files):
+                self._reduce(*counts)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for counts in executor.map(count_variants, new_files):
+                    self._reduce(*counts)
+        return len(new_files)
+
+    def _reduce(self, vcffile, samples, carriers, alleles):
+        # one transaction per file, so an interrupted update keeps every file counted so far
+        stat = os.stat(vcffile)
+        with self.db:
+            for sample in samples:
+                row = self.db.execute('SELECT path FROM samples WHERE sample = ?', (sample,)).fetchone()
+                if row is not None:
+                    raise IOError("Sample {0} of {1} is already counted from {2}".format(sample, vcffile, row[0]))
+            self.db.executemany('INSERT INTO samples VALUES (?, ?)', [(sample, vcffile) for sample in samples])
+            self.db.execute('INSERT INTO files VALUES (?, ?, ?)', (vcffile, stat.st_size, stat.st_mtime_ns))
+            self.db.executemany(
+                'INSERT INTO counts VALUES (?, ?, ?) ON CONFLICT(variant) DO UPDATE SET '
+                'carriers = carriers + excluded.carriers, alleles = alleles + excluded.alleles',
+                ((key, carriers[key], alleles[key]) for key in carriers)
+            )
+
+    def frequencies(self, count='sample'):
+        """
+        Yield (variant, inner-freq) of every counted variant
+        Argument:
+            count: 'sample' for the fraction of samples carrying the variant, 'allele' for the
+                   alternative allele frequency (two alleles per sample)
+
+        """
+        if count not in ('sample', 'allele'):
+            raise ValueError("count must be 'sample' or 'allele'")
+        total = self.n_samples * (2 if count == 'allele' else 1)
+        column = 'carriers' if count == 'sample' else 'alleles'
+        for key, n in self.db.execute('SELECT variant, {0} FROM counts ORDER BY variant'.format(column)):
+            yield key, n / total
+
+    def write(self, outfile, count='sample'):
+        """
+        Write the inner-freq table for freq_selection, a json file when outfile ends with .json and otherwise
+        an indexed SQLite file (see json_to_sqlite)
+        Arguments:
+            outfile: output file, replaced if it exists;
+            count: 'sample' or 'allele', see frequencies
+        Return:
+            number of variants written
+
+        """
+        if os.path.exists(outfile):
+            os.remove(outfile)
+        if outfile.endswith('.json'):
+            innerfreq = dict(self.frequencies(count=count))
+            with open(outfile, mode='w') as freq_file:
+                json.dump(innerfreq, freq_file)
+            return len(innerfreq)
+        db = sqlite3.connect(outfile)
+        try:
+            db.execute('CREATE TABLE inner_freq (variant TEXT PRIMARY KEY, freq REAL NOT NULL) WITHOUT ROWID')
+            db.executemany('INSERT INTO inner_freq VALUES (?, ?)', self.frequencies(count=count))
+            db.commit()
+            return db.execute('SELECT COUNT(*) FROM inner_freq').fetchone()[0]
+        finally:
+            db.close()
+
+
+def build_inner_freq(files, outfile, statefile=None, workers=None, count='sample'):
+    """
+    Count the vcf files of a cohort and write the inner-freq table used by freq_selection
+    Arguments:
+        files: vcf files, or a directory of vcf files;
+        outfile: inner-freq file, json when it ends with .json, otherwise SQLite;
+        statefile: SQLite count state kept between runs, later runs only read the new vcf files;
+                   outfile + '.state' when None;
+        workers: number of worker processes;
+        count: 'sample' for the fraction of samples carrying the variant, 'allele' for the allele frequency
+    Return:
+        number of variants written
+
+    """
+    builder = InnerFreqBuilder(statefile or outfile + '.state')
+    try:
+        builder.update(files, workers=workers)
+        return builder.write(outfile, count=count)
+    finally:
+        builder.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import mmap
+
+
+class MappedVcf(object):
+    """
+    Memory-mapped plain vcf file. readline() returns text lines like the file object of open, so the header is
+    read with read_vcf_header; the variant lines after it are split into byte ranges ending at line ends which
+    are parsed independently, e.g. by forked worker processes reading the pages of the same mapping, so the file
+    is neither copied nor sent to them.
+    Argument:
+        infile: vcf file with extension .vcf
+
+    """
+
+    def __init__(self, infile):
+        self.infile = infile
+        self.handle = open(infile, mode='rb')
+        self.size = os.fstat(self.handle.fileno()).st_size
+        # empty files cannot be mapped
+        self.map = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        # offset of the line returned by the last readline
+        self.offset = 0
+
+    def readline(self):
+        if self.map is None:
+            return ''
+        self.offset = self.map.tell()
+        return self.map.readline().decode('utf-8', errors='replace')
+
+    def ranges(self, start, parts):
+        """
+        Split the file from a byte offset to its end into byte ranges of about the same size
+        Arguments:
+            start: offset of the first line, e.g. the first variant line;
+            parts: number of ranges
+        Return:
+            list of (start, end) offsets in file order, every range starts at the beginning of a line
+
+        """
+        bounds = [start]
+        for i in range(1, parts):
+            end = self.map.find(b'\n', max(start + (self.size - start) * i // parts, bounds[-1])) + 1
+            if end <= 0:
+                break
+            if end > bounds[-1]:
+                bounds.append(end)
+        if bounds[-1] < self.size:
+            bounds.append(self.size)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def lines(self, start, end):
+        """
+        Yield (offset, line) of the lines starting in a byte range
+
+        """
+        self.map.seek(start)
+        while self.map.tell() < end:
+            offset = self.map.tell()
+            yield offset, self.map.readline().decode('utf-8', errors='replace')
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.handle.close()
@@ -28,9 +28,13 @@ class MetadataParser(object):
             Description="(?P<desc>.*)"
             >''', re.VERBOSE)
         self.id_dict = {'INFO': [], 'FORMAT': [], 'FILTER': []}
+        # (Number, Type) of every INFO and FORMAT ID, e.g. {'DP': ('1', 'Integer')}
+        self.info_types = {}
+        self.format_types = {}
         self.vep_columns = []
         self.header = []
         self.info_keys = ['ID', 'Number', 'Type', 'Description']
+        self.csq_projections = {}
 
     def __iter__(self):
         return iter(self.__dict__.items())
@@ -65,6 +69,7 @@ class MetadataParser(object):
                 self.vep_columns = info_line.get('Format', '').split('|')
 
             self.id_dict['INFO'].append(match.group('id'))
+            self.info_types[match.group('id')] = (match.group('number'), match.group('type'))
 
         elif line_info[0] == 'FILTER':
             match = self.filter_pattern.match(line)
@@ -77,6 +82,23 @@ class MetadataParser(object):
             if not match:
                 raise SyntaxError("One of the FORMAT lines is malformed: {0}".format(line))
             self.id_dict['FORMAT'].append(match.group('id'))
+            self.format_types[match.group('id')] = (match.group('number'), match.group('type'))
+
+    def csq_projection(self, columns=None):
+        """
+        VEP columns decoded from CSQ with their position in the annotation
+        Argument:
+            columns: VEP column names, all columns when None; names not in the header are ignored
+        Return:
+            list of (column name, index) in the order of the header
+
+        """
+        key = None if columns is None else tuple(columns)
+        if key not in self.csq_projections:
+            self.csq_projections[key] = [
+                (column, i) for i, column in enumerate(self.vep_columns) if columns is None or column in columns
+            ]
+        return self.csq_projections[key]
 
     def read_header(self, line):
         """
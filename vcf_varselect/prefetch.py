@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import zlib
+import queue
+import codecs
+import threading
+
+# end of file marker put on the queue by the reading thread
+_EOF = None
+
+
+class PrefetchReader(object):
+    """
+    Read a vcf file (.vcf, or .vcf.gz with gzip or bgzip) on a background thread which reads, decompresses,
+    decodes and splits chunks of the file into lines ahead of the parsing thread. File reads and zlib release
+    the GIL, so waiting for the disk or network storage overlaps with parsing. The chunks wait in a bounded
+    queue, so at most queue_depth chunks are held in memory. readline() returns text lines like the file
+    object of open or gzip.open. The thread starts reading when the reader is created, so a reader opened
+    ahead of time prefetches the start of the next file.
+    Arguments:
+        infile: vcf file with extension .vcf or .vcf.gz;
+        chunk_size: bytes read from the file at a time;
+        queue_depth: maximum number of chunks read ahead
+
+    """
+
+    def __init__(self, infile, chunk_size=1048576, queue_depth=4):
+        self.infile = infile
+        self.chunk_size = chunk_size
+        self.handle = open(infile, mode='rb')
+        self.queue = queue.Queue(maxsize=max(1, queue_depth))
+        self.stop = threading.Event()
+        self.done = False
+        self.lines = []
+        self.i = 0
+        self.thread = threading.Thread(target=self._produce, name='PrefetchReader', daemon=True)
+        self.thread.start()
+
+    def _chunks(self):
+        """
+        Decompressed chunks of the file, gzip members are read one after another (bgzip writes many members)
+
+        """
+        gzipped = self.infile.endswith('.gz')
+        inflate = zlib.decompressobj(31) if gzipped else None
+        while not self.stop.is_set():
+            data = self.handle.read(self.chunk_size)
+            if not data:
+                break
+            if not gzipped:
+                yield data
+                continue
+            text = []
+            while data:
+                text.append(inflate.decompress(data))
+                if not inflate.eof:
+                    break
+                data = inflate.unused_data
+                inflate = zlib.decompressobj(31)
+            yield b''.join(text)
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        carry = ''
+        try:
+            for data in self._chunks():
+                text = carry + decoder.decode(data)
+                end = text.rfind('\n') + 1
+                text, carry = text[:end], text[end:]
+                if text and not self._put(text.splitlines(True)):
+                    return
+            carry += decoder.decode(b'', final=True)
+            if carry:
+                self._put([carry])
+        except Exception as error:
+            # raised again by readline in the parsing thread
+            self._put(error)
+            return
+        self._put(_EOF)
+
+    def readline(self):
+        while self.i >= len(self.lines):
+            if self.done:
+                return ''
+            item = self.queue.get()
+            if item is _EOF:
+                self.done = True
+                return ''
+            if isinstance(item, Exception):
+                self.done = True
+                raise item
+            self.lines = item
+            self.i = 0
+        line = self.lines[self.i]
+        self.i += 1
+        return line
+
+    def close(self):
+        self.stop.set()
+        # unblock the reading thread if it waits on a full queue
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.thread.join()
+        self.handle.close()
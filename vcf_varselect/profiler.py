@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import sys
+import json
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size of the process in MB, None where the resource module is not available
+    Argument:
+        children: peak of the largest finished child process (e.g. worker processes) instead
+
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kB on Linux
+    return peak / 1024.0 / 1024.0 if sys.platform == 'darwin' else peak / 1024.0
+
+
+class Profiler(object):
+    """
+    Wall time, record counts, rejection counts per criterion and peak memory of each stage and each sample.
+    Stages are e.g. 'decompress', 'read_vcf', 'quality_selection', 'freq_selection', 'damaging_selection',
+    'comb_selection', 'match_gene', 'dict_to_df' and 'sample_combine'; the sample is the sample ID,
+    the vcf file name for multi-sample vcf files, or None for stages of a whole run.
+    The peak memory of a stage is the peak resident set size of the process (e.g. a worker process) at the
+    end of the stage. Pass a Profiler as profile= to VariantSelection, match_gene or sample_combine; use
+    to_dict or to_json to aggregate runs, e.g. from worker processes or batch jobs, with merge.
+
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._stages = {}
+
+    def add(self, stage, sample=None, seconds=0.0, records=0, rejected=None, calls=1, rss_mb=None):
+        """
+        Add one measurement of a stage
+        Arguments:
+            stage: stage name;
+            sample: sample ID, vcf file name or None;
+            seconds: wall time;
+            records: number of variants or samples handled;
+            rejected: dictionary of number of variants rejected by each criterion;
+            rss_mb: peak memory in MB, the peak resident set size of this process when None
+
+        """
+        entry = self._stages.get((sample, stage))
+        if entry is None:
+            entry = self._stages[(sample, stage)] = {
+                'sample': sample, 'stage': stage, 'calls': 0, 'seconds': 0.0, 'records': 0, 'rejected': {},
+                'peak_rss_mb': None
+            }
+        if rss_mb is None:
+            rss_mb = peak_rss_mb()
+        if rss_mb is not None and (entry['peak_rss_mb'] is None or rss_mb > entry['peak_rss_mb']):
+            entry['peak_rss_mb'] = rss_mb
+        entry['calls'] += calls
+        entry['seconds'] += seconds
+        entry['records'] += records
+        for criterion, count in (rejected or {}).items():
+            entry['rejected'][criterion] = entry['rejected'].get(criterion, 0) + count
+
+    def merge(self, other):
+        """
+        Add the measurements of another Profiler or of its to_dict()
+
+        """
+        if isinstance(other, Profiler):
+            other = other.to_dict()
+        for entry in other['stages']:
+            self.add(entry['stage'], entry['sample'], seconds=entry['seconds'], records=entry['records'],
+                     rejected=entry['rejected'], calls=entry['calls'], rss_mb=entry.get('peak_rss_mb'))
+
+    def summary(self):
+        """
+        Measurements of each stage summed over all samples, with the highest peak memory
+        Return:
+            dictionary {stage: {'calls', 'seconds', 'records', 'rejected', 'peak_rss_mb'}}
+
+        """
+        total = Profiler()
+        for entry in self._stages.values():
+            total.add(entry['stage'], seconds=entry['seconds'], records=entry['records'],
+                      rejected=entry['rejected'], calls=entry['calls'], rss_mb=entry['peak_rss_mb'])
+        return {stage: {i: entry[i] for i in ('calls', 'seconds', 'records', 'rejected', 'peak_rss_mb')}
+                for (sample, stage), entry in total._stages.items()}
+
+    def peak_rss_mb(self):
+        """
+        Highest peak memory in MB of all measurements, including those of worker processes
+
+        """
+        peaks = [entry['peak_rss_mb'] for entry in self._stages.values() if entry['peak_rss_mb'] is not None]
+        return max(peaks) if peaks else None
+
+    def to_dict(self):
+        """
+        Return:
+            {'stages': [{'sample', 'stage', 'calls', 'seconds', 'records', 'rejected', 'peak_rss_mb'}, ...]}
+
+        """
+        return {'stages': [dict(entry, rejected=dict(entry['rejected'])) for entry in self._stages.values()]}
+
+    def to_json(self, outfile=None):
+        """
+        Measurements as json, written to outfile when given
+
+        """
+        text = json.dumps(dict(self.to_dict(), summary=self.summary(), peak_rss_mb=self.peak_rss_mb()), indent=2)
+        if outfile:
+            with open(outfile, mode='w') as json_file:
+                json_file.write(text)
+        return text
+
+
+class _NullProfiler(Profiler):
+    """
+    Profiler that records nothing, used when profiling is off
+
+    """
+
+    enabled = False
+
+    def add(self, stage, sample=None, seconds=0.0, records=0, rejected=None, calls=1, rss_mb=None):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def get_profiler(profile=None):
+    """
+    Profiler of a profile= option: a new Profiler for True, the Profiler itself, or a Profiler recording
+    nothing for None and False
+
+    """
+    if isinstance(profile, Profiler):
+        return profile
+    if profile:
+        return Profiler()
+    return NULL_PROFILER
+
+
+def caller_profiler(profile=None):
+    """
+    Profiler of the profile= option of a function that does not return its profiler (e.g. sample_combine):
+    the Profiler passed by the caller, or a Profiler recording nothing for None and False
+    Raise ValueError for any other value, e.g. True, whose measurements the caller could not read
+
+    """
+    if isinstance(profile, Profiler) or not profile:
+        return get_profiler(profile)
+    raise ValueError("profile must be a Profiler, the measurements are recorded in it: {0!r}".format(profile))
+
+
+class TimedReader(object):
+    """
+    Text stream measuring the time spent in readline, i.e. reading and decompressing the vcf file
+    Argument:
+        vcf: text stream of a vcf file
+
+    """
+
+    def __init__(self, vcf):
+        self.vcf = vcf
+        self.seconds = 0.0
+        self.lines = 0
+
+    def readline(self):
+        start = time.perf_counter()
+        line = self.vcf.readline()
+        self.seconds += time.perf_counter() - start
+        if line:
+            self.lines += 1
+        return line
+
+    def close(self):
+        self.vcf.close()
@@ -3,12 +3,23 @@
 # __author__ = 'Danyang Li'
 # __date__ = 2020-04-02
 
-def read_variant(line, parser):
+from vcf_varselect.variant_record import LazyVariant, decode_csq, decode_info
+from vcf_varselect.compact_variant import CompactVariant
+
+
+def read_variant(line, parser, record='dict', csq_columns=None, typed_info=False, malformed_info='raw'):
     """
     Yield the variant in the right format.
     Arguments:
         line (str): A string representing a variant line in the vcf
         parser: A MetadataParser object
+        record: 'dict' to parse all information at once, 'lazy' to return a LazyVariant
+                that decodes INFO and VEP annotation when first accessed, or 'compact' to return
+                a memory compact CompactVariant
+        csq_columns: VEP columns decoded from CSQ, e.g. ['Consequence', 'Gene', 'SIFT'], all columns when None
+        typed_info: decode INFO fields with their Number and Type from the header once here (see decode_info),
+                    e.g. DP=12 as 12 instead of ['12'] and flags as True; 'dict' and 'lazy' records only
+        malformed_info: 'raw' to keep values which are not of their Type as strings, 'missing' to read them as None
     Return:
         variant (dict): A dictionary with the variant information.
         dictionary key: variant information, format: chromosome:position:rsID:reference:alternative;
@@ -31,6 +42,18 @@ def read_variant(line, parser):
     key = ':'.join(
         [variant_line[0], variant_line[1], variant_line[2], variant_line[3], variant_line[4]]
     )
+    if record == 'lazy':
+        variant[key] = LazyVariant(variant_line, parser, csq_columns=csq_columns, typed_info=typed_info,
+                                   malformed_info=malformed_info)
+        return variant
+    elif record == 'compact':
+        if typed_info:
+            raise ValueError("typed_info is not available for compact records, which pack numeric fields already")
+        variant[key] = CompactVariant(variant_line, parser, csq_columns=csq_columns)
+        return variant
+    elif record != 'dict':
+        raise ValueError("record must be 'dict', 'lazy' or 'compact'")
+
     variant[key] = {}
 
     variant[key]['QUAL'] = variant_line[5]
@@ -40,9 +63,13 @@ def read_variant(line, parser):
             variant[key]['GT'] = variant_line[9].split(':')[i]
 
     ##### INFO information #####
+    info_types = parser.info_types if typed_info else {}
     for info in variant_line[7].split(';'):
         info = info.split('=')
-        if len(info) > 1:
+        if info[0] in info_types and info[0] != 'CSQ':
+            variant[key][info[0]] = decode_info(info[1] if len(info) > 1 else None, info_types[info[0]],
+                                                malformed_info)
+        elif len(info) > 1:
             if ',' in info[1]:
                 variant[key][info[0]] = info[1].split(',')
             else:
@@ -52,12 +79,6 @@ def read_variant(line, parser):
 
     ##### VEP ANNOTATIONS #####
     if 'CSQ' in variant[key]:
-        vep_columns = parser.vep_columns
-        vep_total = variant[key]['CSQ']
-        variant[key]['CSQ'] = {i: [] for i in vep_columns}
-        for vep in vep_total:
-            vep_list = [[i] for i in vep.split('|')]
-            vep_dict = dict(zip(vep_columns, vep_list))
-            variant[key]['CSQ'] = {i: variant[key]['CSQ'][i] + vep_dict[i] for i in vep_dict.keys()}
+        variant[key]['CSQ'] = decode_csq(variant[key]['CSQ'], parser, csq_columns)
 
     return variant
\ No newline at end of file
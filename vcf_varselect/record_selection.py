@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from vcf_varselect.compact_variant import CompactVariant, text_float
+
+LOF_TERMS = ('frameshift_variant', 'stop_gained', 'splice_acceptor_variant',
+             'splice_donor_variant', 'stop_lost', 'start_lost')
+
+# VEP columns read by the missense algorithms of damaging_check
+CRITERIA_VEP_COLUMNS = {'SIFT': 'SIFT', 'POLYPHEN': 'PolyPhen', 'MPC': 'MPC'}
+
+# classes of a Consequence, SIFT or PolyPhen annotation, bits of Classifier masks
+LOF = 1
+MISSENSE = 2
+DELETERIOUS = 4
+DAMAGING = 8
+
+
+class Classifier(object):
+    """
+    Classify VEP Consequence, SIFT and PolyPhen annotations into a bitmask of LOF, MISSENSE, DELETERIOUS
+    (SIFT) and DAMAGING (PolyPhen possibly or probably damaging). These annotations come from a small
+    vocabulary, so the substring checks run once per distinct string and the mask is memoized; classifying
+    a transcript is then one dictionary lookup.
+    Arguments:
+        lof_terms: Consequence terms of loss-of-function variants, LOF_TERMS when None;
+        max_size: number of memoized strings, the memo is emptied when it is full
+
+    """
+
+    def __init__(self, lof_terms=None, max_size=65536):
+        self.lof_terms = tuple(lof_terms) if lof_terms is not None else LOF_TERMS
+        self.max_size = max_size
+        self.memo = {}
+
+    def classify(self, text):
+        """
+        Bitmask of one annotation string, memoized
+
+        """
+        bits = self.memo.get(text)
+        if bits is not None:
+            return bits
+        bits = 0
+        if any(term in text for term in self.lof_terms):
+            bits |= LOF
+        if 'missense_variant' in text:
+            bits |= MISSENSE
+        if 'deleterious' in text:
+            bits |= DELETERIOUS
+        if 'possibly_damaging' in text or 'probably_damaging' in text:
+            bits |= DAMAGING
+        if len(self.memo) >= self.max_size:
+            self.memo.clear()
+        self.memo[text] = bits
+        return bits
+
+    def mask(self, values):
+        """
+        Union of the bitmasks of the annotations of every transcript, e.g. variant['CSQ']['Consequence']
+
+        """
+        memo = self.memo
+        bits = 0
+        for value in values:
+            value_bits = memo.get(value)
+            bits |= value_bits if value_bits is not None else self.classify(value)
+        return bits
+
+
+# Classifier of each set of loss-of-function terms, shared by all selections of a process
+_classifiers = {}
+
+
+def get_classifier(lof_terms=None):
+    """
+    Classifier of a set of loss-of-function terms, LOF_TERMS when None
+
+    """
+    key = LOF_TERMS if lof_terms is None else tuple(lof_terms)
+    if key not in _classifiers:
+        _classifiers[key] = Classifier(key)
+    return _classifiers[key]
+
+
+def info_float(variant, item):
+    """
+    Numeric value of an INFO field of one variant, text_float(''.join(variant[item])); values decoded with
+    typed_info are used as they are, a missing value ('.' or None) is nan. Selections let variants with
+    a missing value pass, like variants without the field
+
+    """
+    if isinstance(variant, CompactVariant):
+        return variant.info_float(item)
+    value = variant[item]
+    if type(value) == list:
+        if len(value) != 1 or type(value[0]) == str:
+            return text_float(''.join(value))
+        value = value[0]
+    if value is None:
+        return float('nan')
+    return float(value)
+
+
+def csq_floats(variant, column):
+    """
+    Numeric values of a VEP column over the transcripts of one variant, e.g. gnomAD_AF, leaving out missing
+    values ('', '.' or nan) which pass every threshold like a variant without CSQ
+
+    """
+    if 'CSQ' not in variant:
+        return []
+    values = []
+    for i in variant['CSQ'][column]:
+        value = text_float(i)
+        if value == value:
+            values.append(value)
+    return values
+
+
+def info_values(variant, item):
+    """
+    Values of an INFO field of one variant as a list, also for a single value decoded with typed_info
+
+    """
+    value = variant[item]
+    return value if type(value) == list else [value]
+
+
+def quality_check(variant, FILTER=None, DP=None, QD=None, MQ=None):
+    """
+    Check one variant against the quality criteria of VariantSelection.quality_selection
+    Arguments:
+        variant: variant information dictionary of one variant;
+        FILTER, DP, QD, MQ: variants quality threshold
+    Return:
+        True if the variant has good quality
+
+    """
+    if FILTER and 'FILTER' in variant and variant['FILTER'] != FILTER:
+        return False
+    if DP and 'DP' in variant and info_float(variant, 'DP') < float(DP):
+        return False
+    if QD and 'QD' in variant and info_float(variant, 'QD') < float(QD):
+        return False
+    if MQ and 'MQ' in variant and info_float(variant, 'MQ') < float(MQ):
+        return False
+    return True
+
+
+def freq_check(key, variant, innerfreq=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None, INNER=0.01):
+    """
+    Check one variant against the frequency criteria of VariantSelection.freq_selection
+    Arguments:
+        key: variant key, format: chromosome:position:rsID:reference:alternative;
+        variant: variant information dictionary of one variant;
+        innerfreq: InnerFreqStore or dictionary of variant inner-freq from all samples;
+        KG, EXAC, GNOMAD, SWEGEN, INNER: rare variants frequency threshold
+    Return:
+        True if the variant is rare
+
+    """
+    if KG and '1000GAF' in variant and info_float(variant, '1000GAF') > float(KG):
+        return False
+    if EXAC and 'EXACAF' in variant and info_float(variant, 'EXACAF') > float(EXAC):
+        return False
+    if GNOMAD and any(value > float(GNOMAD) for value in csq_floats(variant, 'gnomAD_AF')):
+        return False
+    if SWEGEN and 'SWEGENAF' in variant and info_float(variant, 'SWEGENAF') > float(SWEGEN):
+        return False
+    if innerfreq is not None:
+        inner = innerfreq.get(key)
+        if inner is not None and inner > float(INNER):
+            return False
+    return True
+
+
+def consequence_mask(variant, classifier):
+    """
+    Classifier mask of the Consequence of every transcript of one variant, 0 for variants called by a single
+    caller (set is freebayes, gatk or samtools)
+
+    """
+    if variant['set'] != ['freebayes'] and variant['set'] != ['gatk'] and variant['set'] != ['samtools']:
+        return classifier.mask(variant['CSQ']['Consequence'])
+    return 0
+
+
+def damaging_check(variant, criteria=[], lof_terms=None):
+    """
+    Classify one variant as VariantSelection.damaging_selection does
+    Arguments:
+        variant: variant information dictionary of one variant;
+        criteria: selected missense algorithm list;
+        lof_terms: Consequence terms of loss-of-function variants, LOF_TERMS when None
+    Return:
+        (lof, mis_damage): whether the variant is loss-of-function and whether it is damaging missense
+
+    """
+    classifier = get_classifier(lof_terms)
+    consequence = consequence_mask(variant, classifier)
+    lof = bool(consequence & LOF)
+    if not consequence & MISSENSE:
+        return lof, False
+
+    votes = 0
+    if 'SIFT' in criteria and classifier.mask(variant['CSQ']['SIFT']) & DELETERIOUS:
+        votes += 1
+    if 'POLYPHEN' in criteria and classifier.mask(variant['CSQ']['PolyPhen']) & DAMAGING:
+        votes += 1
+    if 'MPC' in criteria and \
+            any(i != '' and i != 'NA' and float(i) >= 2.0 for i in variant['CSQ']['MPC']):
+        votes += 1
+    if 'CADD' in criteria and 'CADD' in variant and \
+            info_float(variant, 'CADD') >= 20.0:
+        votes += 1
+    if 'SPIDEX' in criteria and 'SPIDEX' in variant and \
+            abs(info_float(variant, 'SPIDEX')) >= 2.0:
+        votes += 1
+    if 'PHYLOP' in criteria and 'dbNSFP_phyloP100way_vertebrate' in variant and \
+            any(i is not None and float(i) >= 2.0 for i in info_values(variant, 'dbNSFP_phyloP100way_vertebrate')):
+        votes += 1
+
+    return lof, votes > 0 and votes > 0.5 * len(criteria)
@@ -4,41 +4,237 @@
 # __date__ = 2020-04-02
 
 import os
-from vcf_varselect.variant_selection import VariantSelection
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from vcf_varselect.variant_selection import VariantSelection, open_vcf, read_vcf_header
 from vcf_varselect.match_gene import match_gene
-from vcf_varselect.dict_to_df import dict_to_df
+from vcf_varselect.gene_panel import GenePanel
+from vcf_varselect.dict_to_df import VariantTable, vcf_columns, dict_columns
+from vcf_varselect.profiler import Profiler, caller_profiler
+from vcf_varselect.filter_pipeline import FilterPipeline, comb_spec
+
+# estimated memory of one parsed variant (dict record with its CSQ columns), used to size chunks by memory
+RECORD_BYTES = 16384
 
 
 def sample_combine(dir=None, innerfreqfile=None, genefile=None, genderfile=None,
                    FILTER=None, DP=None, QD=None, MQ=None,
                    KG=None, EXAC=None, GNOMAD=None, SWEGEN=None,
-                   criteria=[]
+                   criteria=[], workers=None, max_pending=None, INNER=0.01, panel=None,
+                   cache_dir=None, cache_size_mb=None, outfile=None, profile=None, csq_columns=None,
+                   prefetch=None, prefetch_chunk_size=1048576, max_memory_mb=None, chunk_size=None,
+                   lof_terms=None
                    ):
     """
     collect all samples' selected rare damaging variants to a dataframe
     Args:
         dir: directory where all vcf file are
-        innerfreqfile: json file of variant inner-freq from all samples
+        innerfreqfile: json or SQLite file of variant inner-freq from all samples
+        INNER: inner-freq threshold
         genefile: disorder related gene list
         genderfile: male samples list
+        panel: GenePanel object, used instead of genefile and genderfile
+        workers: number of worker processes, samples are processed one after another when None
+        max_pending: maximum number of samples submitted to the worker processes and not yet merged,
+                     bounds how many finished results are held in memory (default 2 * workers)
+        cache_dir: directory of the on-disk cache of parsed vcf files, re-runs with other thresholds
+                   load the parsed variants instead of parsing the vcf files again
+        cache_size_mb: maximum size of the cache directory in MB
+        outfile: parquet file written one row group per sample instead of building the dataframe in memory,
+                 columns are the INFO IDs and VEP columns of the vcf headers, needs pyarrow
+        profile: Profiler recording wall time, record counts and rejection counts of every stage and sample,
+                 including the samples processed by worker processes; it has to be a Profiler instance created
+                 by the caller, which reads the measurements from it (ValueError otherwise, e.g. for True)
+        csq_columns: VEP columns decoded from CSQ, 'auto' for the columns read by the selection and match_gene;
+                     the dataframe only has these CSQ columns; all columns when None
+        prefetch, prefetch_chunk_size: chunks read ahead on a background thread while a vcf file is parsed
+                                       (see VariantSelection); without workers, the next vcf file is opened
+                                       and starts prefetching while the current sample is selected
+        max_memory_mb: memory budget in MB; selected variants waiting for the dataframe are spilled to temporary
+                       files once they take about half of the budget, and vcf files are read chunk_size variant
+                       lines at a time, by default as many as fit in the other half shared by the worker
+                       processes (see memory_chunk_size). The vcf files are then not cached. The peak memory of
+                       the run and of every worker process is recorded by profile (Profiler.peak_rss_mb)
+        chunk_size: read each vcf file this many variant lines at a time (see VariantSelection.read_chunks),
+                    the whole file at once when None; cache_dir is not used with chunks
+        lof_terms: Consequence terms of loss-of-function variants (see VariantSelection.damaging_selection)
 
     return:
-        df with all sample IDs as rows and selected ndd variants annotation information as columns
+        df with all sample IDs as rows and selected ndd variants annotation information as columns,
+        or outfile when the variants are written to a parquet file; rows are in file order, samples of a
+        multi-sample vcf file in header order, also with workers, except in the parquet file, whose row groups
+        (one per sample) are written as samples finish
     """
-    total = {}
     if not dir:
         raise IOError("Please input file directory.")
-    os.chdir(dir)
-    for filename in os.listdir(dir):
-        file_name, file_extension = os.path.splitext(filename)
-        if file_extension == '.vcf.gz' or file_extension == '.vcf':
-            vcf = VariantSelection(infile=filename)
-            damage, lof, mis = vcf.comb_selection(FILTER=FILTER, DP=DP, QD=QD, MQ=MQ,
-                                        innerfreqfile=innerfreqfile, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN,
-                                        criteria=criteria)
-            gene_var = match_gene(damage, genefile=genefile, genderfile=genderfile)
-            total.update(gene_var)
-
-    df_total = dict_to_df(total)
+    files = [
+        os.path.join(dir, filename) for filename in sorted(os.listdir(dir))
+        if filename.endswith('.vcf.gz') or filename.endswith('.vcf')
+    ]
+    profiler = caller_profiler(profile)
+    start = time.perf_counter()
+    if panel is None:
+        panel = GenePanel(genefile=genefile, genderfile=genderfile)
+    if csq_columns == 'auto':
+        csq_columns = selection_csq_columns(criteria=criteria, GNOMAD=GNOMAD)
+    if max_memory_mb and not chunk_size:
+        chunk_size = memory_chunk_size(max_memory_mb, workers)
+    options = dict(FILTER=FILTER, DP=DP, QD=QD, MQ=MQ,
+                   innerfreqfile=innerfreqfile, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN,
+                   criteria=criteria, INNER=INNER, lof_terms=lof_terms, panel=panel,
+                   cache_dir=cache_dir, cache_size_mb=cache_size_mb, csq_columns=csq_columns,
+                   prefetch=prefetch, prefetch_chunk_size=prefetch_chunk_size, chunk_size=chunk_size)
+
+    columns = None
+    if outfile:
+        columns = []
+        for filename in files:
+            vcf = open_vcf(filename)
+            columns.extend(i for i in vcf_columns(read_vcf_header(vcf)[0], csq_columns) if i not in columns)
+            vcf.close()
+    total = VariantTable(outfile=outfile, columns=columns, max_buffer_mb=max_memory_mb and max_memory_mb / 2.0)
+
+    # with workers, samples finish in any order: file index of each row and columns of each file, to put the
+    # dataframe back in file order
+    positions = []
+    file_columns = {}
+
+    def collect(result, stats=None, position=None):
+        if stats is not None:
+            profiler.merge(stats)
+        if position is not None and not outfile:
+            positions.extend([position] * sum(len(result[sample]) for sample in result))
+            file_columns[position] = dict_columns(result)
+        for sample in result:
+            sample_start = time.perf_counter()
+            total.add(sample, result[sample])
+            profiler.add('dict_to_df', sample, seconds=time.perf_counter() - sample_start,
+                         records=len(result[sample]))
+
+    try:
+        if not workers and prefetch:
+            next_vcf = None
+            if files:
+                next_vcf = open_vcf(files[0], prefetch=prefetch, prefetch_chunk_size=prefetch_chunk_size)
+            try:
+                for i, filename in enumerate(files):
+                    vcf, next_vcf = next_vcf, None
+                    if i + 1 < len(files):
+                        next_vcf = open_vcf(files[i + 1], prefetch=prefetch,
+                                            prefetch_chunk_size=prefetch_chunk_size)
+                    collect(select_sample(filename, profile=profiler, vcf=vcf, **options))
+            finally:
+                if next_vcf is not None:
+                    next_vcf.close()
+        elif not workers:
+            for filename in files:
+                collect(select_sample(filename, profile=profiler, **options))
+        else:
+            if not max_pending:
+                max_pending = 2 * workers
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = {}
+                for i, filename in enumerate(files):
+                    if len(pending) >= max_pending:
+                        for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                            collect(*future.result(), position=pending.pop(future))
+                    pending[executor.submit(_select_sample_stats, filename, profiler.enabled, **options)] = i
+                for future in wait(pending).done:
+                    collect(*future.result(), position=pending[future])
+    except BaseException:
+        # remove the temporary files of spilled samples
+        if not outfile:
+            total.close()
+        raise
+
+    build_start = time.perf_counter()
+    if outfile:
+        total.close()
+        df_total = outfile
+    else:
+        try:
+            df_total = total.to_df()
+        finally:
+            total.close()
+        if positions:
+            columns = []
+            for i in sorted(file_columns):
+                columns.extend(column for column in file_columns[i] if column not in columns)
+            rows = sorted(range(len(positions)), key=positions.__getitem__)
+            df_total = df_total.iloc[rows][columns]
+    profiler.add('dict_to_df', seconds=time.perf_counter() - build_start)
+    profiler.add('sample_combine', seconds=time.perf_counter() - start, records=len(files))
 
     return df_total
+
+
+def memory_chunk_size(max_memory_mb, workers=None, record_bytes=RECORD_BYTES):
+    """
+    Variant lines per chunk so that the parsed chunks of all worker processes take about half of a memory budget
+    Arguments:
+        max_memory_mb: memory budget in MB;
+        workers: number of worker processes, one when None;
+        record_bytes: estimated memory of one parsed variant
+    Return:
+        chunk size, at least 1
+
+    """
+    return max(1, int(max_memory_mb * 1048576 / 2.0 / (workers or 1) / record_bytes))
+
+
+def selection_csq_columns(criteria=[], GNOMAD=None):
+    """
+    VEP columns read by comb_selection and match_gene with these criteria
+
+    """
+    return FilterPipeline(comb_spec(criteria=criteria, GNOMAD=GNOMAD)).csq_columns() + ['Gene']
+
+
+def select_sample(filename, panel=None, cache_dir=None, cache_size_mb=None, profile=None, csq_columns=None,
+                  prefetch=None, prefetch_chunk_size=1048576, vcf=None, chunk_size=None, **kwargs):
+    """
+    Select disorder related rare damaging variants of one sample vcf file
+    Args:
+        filename: vcf file
+        panel: GenePanel object of disorder related genes and male samples
+        cache_dir, cache_size_mb: on-disk cache of parsed vcf files (see VariantSelection)
+        profile: Profiler recording the stages of the sample
+        csq_columns: VEP columns decoded from CSQ, all columns when None
+        prefetch, prefetch_chunk_size, vcf: prefetching of the vcf file (see VariantSelection)
+        chunk_size: select the variants of chunk_size variant lines at a time (see VariantSelection.read_chunks),
+                    the vcf file is neither cached nor read from cache_dir
+        kwargs: selection thresholds passed to VariantSelection.comb_selection
+
+    return:
+        nested dictionary of selected variants {sample: {variant: {...}}}
+    """
+    if chunk_size:
+        if cache_dir:
+            warnings.warn("cache_dir is not used when the vcf file is read in chunks: {0}".format(filename))
+        selected = {}
+        for part in VariantSelection.read_chunks(filename, chunk_size=chunk_size, profile=profile,
+                                                 csq_columns=csq_columns, prefetch=prefetch,
+                                                 prefetch_chunk_size=prefetch_chunk_size, vcf=vcf):
+            damage, lof, mis = part.comb_selection(**kwargs)
+            for sample, variants in match_gene(damage, panel=panel, profile=part.profiler).items():
+                selected.setdefault(sample, {}).update(variants)
+        return selected
+    vcf = VariantSelection(infile=filename, cache_dir=cache_dir, cache_size_mb=cache_size_mb, profile=profile,
+                           csq_columns=csq_columns, prefetch=prefetch, prefetch_chunk_size=prefetch_chunk_size,
+                           vcf=vcf)
+    damage, lof, mis = vcf.comb_selection(**kwargs)
+    return match_gene(damage, panel=panel, profile=vcf.profiler)
+
+
+def _select_sample_stats(filename, profile, **kwargs):
+    """
+    select_sample in a worker process, with the profiler measurements sent back to the parent process
+    Return:
+        (nested dictionary of selected variants, Profiler.to_dict() or None)
+
+    """
+    if not profile:
+        return select_sample(filename, **kwargs), None
+    profiler = Profiler()
+    return select_sample(filename, profile=profiler, **kwargs), profiler.to_dict()
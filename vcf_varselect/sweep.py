@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import itertools
+
+from vcf_varselect.record_selection import info_float, csq_floats, damaging_check, consequence_mask, get_classifier, \
+    LOF, MISSENSE
+from vcf_varselect.bitset import to_bitset, bitset_count, at_least
+
+# comb_selection thresholds of INFO fields: (option, INFO ID, a variant passes when its value is >= or <=)
+INFO_THRESHOLDS = (('DP', 'DP', '>='), ('QD', 'QD', '>='), ('MQ', 'MQ', '>='),
+                   ('KG', '1000GAF', '<='), ('EXAC', 'EXACAF', '<='), ('SWEGEN', 'SWEGENAF', '<='))
+
+# missense algorithms voting in damaging_check
+PREDICTORS = ('SIFT', 'POLYPHEN', 'MPC', 'CADD', 'SPIDEX', 'PHYLOP')
+
+
+def expand_grid(grid):
+    """
+    Parameter sets of a grid
+    Argument:
+        grid: list of parameter dictionaries, or a dictionary of lists of values whose every combination
+              is a parameter set, e.g. {'DP': [5, 10, 20], 'GNOMAD': [1e-4, 1e-3], 'criteria': [['SIFT'], []]}
+    Return:
+        list of parameter dictionaries
+
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+    return [dict(params) for params in grid]
+
+
+class ThresholdSweep(object):
+    """
+    Evaluate comb_selection for many parameter sets in one pass over the variants. The value of each
+    criterion (FILTER, INFO fields, highest gnomAD_AF, inner-freq, consequence and the vote of each
+    missense algorithm) is read once per variant the first time a parameter set needs it, every distinct
+    threshold is turned once into a bitset of the passing variants (see bitset), and each parameter set
+    is then a few bitwise operations.
+    Arguments:
+        sites: variant dictionary {variant1: {...}, variant2: {...}};
+        innerfreq: InnerFreqStore or dictionary of variant inner-freq, needed for INNER;
+        lof_terms: Consequence terms of loss-of-function variants (see damaging_selection)
+
+    """
+
+    def __init__(self, sites, innerfreq=None, lof_terms=None):
+        self.sites = sites
+        self.keys = list(sites)
+        self.innerfreq = innerfreq
+        self.lof_terms = lof_terms
+        self.all = (1 << len(self.keys)) - 1
+        self._values = {}
+        self._masks = {}
+        self._consequence = None
+
+    def _field_values(self, field):
+        """
+        Value of a criterion for every variant, None where the variant has no value and passes the criterion
+
+        """
+        if field not in self._values:
+            if field == 'FILTER':
+                values = [variant['FILTER'] if 'FILTER' in variant else None for variant in self.sites.values()]
+            elif field == 'gnomAD_AF':
+                # missing values pass, like the condition of FilterPipeline (see csq_floats)
+                values = [max(csq_floats(variant, 'gnomAD_AF'), default=None) for variant in self.sites.values()]
+            elif field == 'INNER':
+                values = [self.innerfreq.get(key) for key in self.keys]
+            else:
+                values = [info_float(variant, field) if field in variant else None for variant in self.sites.values()]
+                # a missing value (e.g. DP=. read with typed_info) passes like a missing field
+                values = [None if value != value else value for value in values]
+            self._values[field] = values
+        return self._values[field]
+
+    def _threshold_mask(self, field, op, threshold):
+        key = (field, op, threshold)
+        if key not in self._masks:
+            values = self._field_values(field)
+            if op == '==':
+                flags = [value is None or value == threshold for value in values]
+            elif op == '>=':
+                flags = [value is None or value >= threshold for value in values]
+            else:
+                flags = [value is None or value <= threshold for value in values]
+            self._masks[key] = to_bitset(flags)
+        return self._masks[key]
+
+    def _consequence_masks(self):
+        """
+        (loss-of-function bitset, missense bitset, indexes of missense variants)
+
+        """
+        if self._consequence is None:
+            classifier = get_classifier(self.lof_terms)
+            masks = [consequence_mask(variant, classifier) for variant in self.sites.values()]
+            self._consequence = (to_bitset([mask & LOF for mask in masks]),
+                                 to_bitset([mask & MISSENSE for mask in masks]),
+                                 [i for i, mask in enumerate(masks) if mask & MISSENSE])
+        return self._consequence
+
+    def _vote_mask(self, predictor):
+        """
+        Bitset of the missense variants the missense algorithm predicts damaging
+
+        """
+        key = ('vote', predictor)
+        if key not in self._masks:
+            lof, missense, indexes = self._consequence_masks()
+            variants = list(self.sites.values())
+            bits = 0
+            for i in indexes:
+                if damaging_check(variants[i], criteria=[predictor], lof_terms=self.lof_terms)[1]:
+                    bits |= 1 << i
+            self._masks[key] = bits
+        return self._masks[key]
+
+    def _damaging_missense(self, criteria):
+        """
+        Bitset of the damaging missense variants: more than half of the criteria vote damaging
+
+        """
+        key = ('missense', tuple(criteria))
+        if key not in self._masks:
+            votes = [self._vote_mask(predictor) for predictor in PREDICTORS if predictor in criteria]
+            self._masks[key] = self._consequence_masks()[1] & at_least(votes, int(0.5 * len(criteria)) + 1)
+        return self._masks[key]
+
+    def select(self, FILTER=None, DP=None, QD=None, MQ=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None,
+               criteria=[], INNER=0.01):
+        """
+        Bitsets of the variants comb_selection selects with these thresholds
+        Arguments:
+            FILTER, DP, QD, MQ, KG, EXAC, GNOMAD, SWEGEN, INNER, criteria: see VariantSelection.comb_selection,
+            INNER only applies with an innerfreq
+        Return:
+            (damaging, loss-of-function, damaging missense) bitsets of the indexes of self.keys
+
+        """
+        options = {'DP': DP, 'QD': QD, 'MQ': MQ, 'KG': KG, 'EXAC': EXAC, 'SWEGEN': SWEGEN}
+        passed = self.all
+        if FILTER:
+            passed &= self._threshold_mask('FILTER', '==', str(FILTER).strip())
+        for option, field, op in INFO_THRESHOLDS:
+            if options[option]:
+                passed &= self._threshold_mask(field, op, float(options[option]))
+        if GNOMAD:
+            passed &= self._threshold_mask('gnomAD_AF', '<=', float(GNOMAD))
+        if self.innerfreq is not None:
+            passed &= self._threshold_mask('INNER', '<=', float(INNER))
+        lof = passed & self._consequence_masks()[0]
+        mis_damage = passed & self._damaging_missense(criteria)
+        return lof | mis_damage, lof, mis_damage
+
+    def count(self, **params):
+        """
+        Number of (damaging, loss-of-function, damaging missense) variants selected with these thresholds
+
+        """
+        return tuple(bitset_count(bits) for bits in self.select(**params))
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import gzip
+import zlib
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def is_bgzf(infile):
+    """
+    Whether a file is BGZF compressed (bgzip), i.e. its first gzip member has the BC extra subfield
+
+    """
+    with open(infile, mode='rb') as handle:
+        header = handle.read(18)
+    return len(header) == 18 and header[:4] == b'\x1f\x8b\x08\x04' and header[12:14] == b'BC'
+
+
+def read_raw_block(handle):
+    """
+    Read the BGZF block at the current position of a binary file
+    Return:
+        (raw deflate data, compressed block size), (b'', 0) at end of file
+
+    """
+    header = handle.read(12)
+    if len(header) < 12:
+        return b'', 0
+    if header[:4] != b'\x1f\x8b\x08\x04':
+        raise IOError("File is not in BGZF format, please compress it with bgzip.")
+    extra = handle.read(struct.unpack('<H', header[10:12])[0])
+    block_size = None
+    i = 0
+    while i + 4 <= len(extra):
+        subfield_length = struct.unpack('<H', extra[i + 2:i + 4])[0]
+        if extra[i:i + 2] == b'BC':
+            block_size = struct.unpack('<H', extra[i + 4:i + 6])[0] + 1
+        i += 4 + subfield_length
+    if block_size is None:
+        raise IOError("File is not in BGZF format, please compress it with bgzip.")
+    cdata = handle.read(block_size - 12 - len(extra) - 8)
+    handle.read(8)
+    return cdata, block_size
+
+
+class BgzfReader(object):
+    """
+    Read a BGZF compressed file (bgzip) block by block, with seek and tell on virtual offsets
+    (compressed block offset << 16 | offset in the decompressed block)
+    Argument:
+        infile: bgzipped file
+
+    """
+
+    def __init__(self, infile):
+        self.handle = open(infile, mode='rb')
+        self.seek(0)
+
+    def close(self):
+        self.handle.close()
+
+    def read_block(self, offset):
+        """
+        Read and decompress the BGZF block starting at a file offset
+        Return:
+            (decompressed data, compressed block size), (b'', 0) at end of file
+
+        """
+        self.handle.seek(offset)
+        cdata, block_size = read_raw_block(self.handle)
+        if not block_size:
+            return b'', 0
+        return zlib.decompress(cdata, -15), block_size
+
+    def seek(self, virtual_offset):
+        self.block_offset = virtual_offset >> 16
+        self.data, self.block_size = self.read_block(self.block_offset)
+        self.within = virtual_offset & 0xFFFF
+
+    def tell(self):
+        if self.within >= len(self.data) and self.block_size:
+            return (self.block_offset + self.block_size) << 16
+        return self.block_offset << 16 | self.within
+
+    def _next_block(self):
+        if not self.block_size:
+            return False
+        self.block_offset += self.block_size
+        self.data, self.block_size = self.read_block(self.block_offset)
+        self.within = 0
+        return True
+
+    def readline(self):
+        """
+        Read one line as bytes, b'' at end of file
+
+        """
+        parts = []
+        while True:
+            if self.within >= len(self.data):
+                if not self._next_block():
+                    break
+                continue
+            end = self.data.find(b'\n', self.within)
+            if end < 0:
+                parts.append(self.data[self.within:])
+                self.within = len(self.data)
+                continue
+            parts.append(self.data[self.within:end + 1])
+            self.within = end + 1
+            break
+        return b''.join(parts)
+
+
+def _inflate(blocks):
+    return b''.join([zlib.decompress(cdata, -15) for cdata in blocks])
+
+
+class ThreadedBgzfReader(object):
+    """
+    Read a whole BGZF compressed (bgzip) vcf file, decompressing batches of blocks in parallel on a thread
+    pool (zlib releases the GIL) and splitting each decompressed batch into text lines at once.
+    readline() returns text lines like the file object of gzip.open.
+    Arguments:
+        infile: bgzipped file;
+        threads: decompression threads, min(4, number of CPUs) when None;
+        batch_blocks: BGZF blocks (up to 64 kB each) decompressed by one task
+
+    """
+
+    def __init__(self, infile, threads=None, batch_blocks=16):
+        self.handle = open(infile, mode='rb')
+        self.threads = threads or min(4, os.cpu_count() or 1)
+        self.batch_blocks = batch_blocks
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.eof = False
+        self.carry = b''
+        self.lines = []
+        self.i = 0
+        # start decompressing at once, so a reader opened ahead of time prefetches the start of the file
+        self._submit()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.handle.close()
+
+    def _submit(self):
+        # keep every thread busy with one batch and one more waiting
+        while not self.eof and len(self.pending) < 2 * self.threads:
+            blocks = []
+            while len(blocks) < self.batch_blocks:
+                cdata, block_size = read_raw_block(self.handle)
+                if not block_size:
+                    self.eof = True
+                    break
+                blocks.append(cdata)
+            if blocks:
+                self.pending.append(self.executor.submit(_inflate, blocks))
+
+    def _fill(self):
+        while self.i >= len(self.lines):
+            self._submit()
+            if not self.pending:
+                if not self.carry:
+                    return False
+                data, self.carry = self.carry, b''
+            else:
+                data = self.carry + self.pending.popleft().result()
+                end = data.rfind(b'\n') + 1
+                data, self.carry = data[:end], data[end:]
+            self.lines = data.decode('utf-8', errors='replace').splitlines(True)
+            self.i = 0
+        return True
+
+    def readline(self):
+        if self.i >= len(self.lines) and not self._fill():
+            return ''
+        line = self.lines[self.i]
+        self.i += 1
+        return line
+
+
+def reg2bins(beg, end, min_shift=14, depth=5):
+    """
+    Bins of the binning index overlapping the 0-based half-open region [beg, end)
+
+    """
+    bins = []
+    end -= 1
+    shift = min_shift + depth * 3
+    first = 0
+    for level in range(depth + 1):
+        bins.extend(range(first + (beg >> shift), first + (end >> shift) + 1))
+        shift -= 3
+        first += 1 << (level * 3)
+    return bins
+
+
+class TabixIndex(object):
+    """
+    Tabix (.tbi) or coordinate-sorted (.csi) index of a bgzipped vcf file
+    Argument:
+        indexfile: .tbi or .csi index file
+
+    """
+
+    def __init__(self, indexfile):
+        with gzip.open(indexfile, mode='rb') as index_file:
+            data = index_file.read()
+        self.min_shift = 14
+        self.depth = 5
+        self.names = []
+        self.bins = []
+        self.linear = []
+
+        if data[:4] == b'TBI\x01':
+            n_ref, l_nm = struct.unpack('<i', data[4:8])[0], struct.unpack('<i', data[32:36])[0]
+            self.names = [name.decode() for name in data[36:36 + l_nm].split(b'\x00')[:-1]]
+            offset = 36 + l_nm
+            csi = False
+        elif data[:4] == b'CSI\x01':
+            self.min_shift, self.depth, l_aux = struct.unpack('<3i', data[4:16])
+            aux = data[16:16 + l_aux]
+            if l_aux >= 28:
+                l_nm = struct.unpack('<i', aux[24:28])[0]
+                self.names = [name.decode() for name in aux[28:28 + l_nm].split(b'\x00')[:-1]]
+            offset = 16 + l_aux
+            n_ref = struct.unpack('<i', data[offset:offset + 4])[0]
+            offset += 4
+            csi = True
+        else:
+            raise IOError("Index file is not a tabix or csi index: {0}".format(indexfile))
+
+        for ref in range(n_ref):
+            bins = {}
+            n_bin = struct.unpack('<i', data[offset:offset + 4])[0]
+            offset += 4
+            for i in range(n_bin):
+                if csi:
+                    bin_id, loffset, n_chunk = struct.unpack('<IQi', data[offset:offset + 16])
+                    offset += 16
+                else:
+                    bin_id, n_chunk = struct.unpack('<Ii', data[offset:offset + 8])
+                    loffset = 0
+                    offset += 8
+                chunks = struct.unpack('<%dQ' % (2 * n_chunk), data[offset:offset + 16 * n_chunk])
+                offset += 16 * n_chunk
+                bins[bin_id] = (loffset, list(zip(chunks[::2], chunks[1::2])))
+            self.bins.append(bins)
+            if csi:
+                self.linear.append(())
+            else:
+                n_intv = struct.unpack('<i', data[offset:offset + 4])[0]
+                offset += 4
+                self.linear.append(struct.unpack('<%dQ' % n_intv, data[offset:offset + 8 * n_intv]))
+                offset += 8 * n_intv
+
+    def chunks(self, chrom, beg, end):
+        """
+        File chunks (start and end virtual offsets) which may hold records overlapping
+        the 0-based half-open region [beg, end) of a chromosome, sorted and merged
+
+        """
+        if chrom not in self.names:
+            return []
+        ref = self.names.index(chrom)
+        bins = self.bins[ref]
+        max_end = 1 << (self.min_shift + self.depth * 3)
+        beg, end = max(0, min(beg, max_end - 1)), min(end, max_end)
+        region_bins = reg2bins(beg, end, self.min_shift, self.depth)
+
+        # records before the smallest offset of the first window cannot overlap the region
+        min_offset = 0
+        if self.linear[ref]:
+            window = beg >> self.min_shift
+            min_offset = self.linear[ref][min(window, len(self.linear[ref]) - 1)]
+        else:
+            # smallest bin holding beg which is in the index, from the finest level up to the root
+            bin_id = ((1 << 3 * self.depth) - 1) // 7 + (beg >> self.min_shift)
+            while bin_id > 0 and bin_id not in bins:
+                bin_id = (bin_id - 1) >> 3
+            if bin_id in bins:
+                min_offset = bins[bin_id][0]
+
+        chunks = sorted(
+            chunk for bin_id in region_bins if bin_id in bins
+            for chunk in bins[bin_id][1] if chunk[1] > min_offset
+        )
+        merged = []
+        for chunk_beg, chunk_end in chunks:
+            if merged and chunk_beg <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], chunk_end)
+            else:
+                merged.append([chunk_beg, chunk_end])
+        return merged
+
+
+def parse_regions(regions=None, bedfile=None, names=None):
+    """
+    Sorted, merged 0-based half-open regions by chromosome
+    Arguments:
+        regions: list of 'chrom', 'chrom:beg-end' (1-based, inclusive) or (chrom, beg, end) (0-based, half-open, as BED);
+        bedfile: BED file of gene intervals;
+        names: sequence names in file order (e.g. TabixIndex.names), chromosomes are sorted in this order and
+               then by name, so that regions are read in file order; sorted by name when None
+    Return:
+        list of (chrom, beg, end)
+
+    """
+    intervals = []
+    for region in regions or []:
+        if isinstance(region, str):
+            if ':' in region:
+                chrom, span = region.rsplit(':', 1)
+                beg, end = span.replace(',', '').split('-')
+                intervals.append((chrom, int(beg) - 1, int(end)))
+            else:
+                intervals.append((region, 0, 1 << 62))
+        else:
+            intervals.append((region[0], int(region[1]), int(region[2])))
+    if bedfile:
+        with open(bedfile, mode='r') as bed_file:
+            for line in bed_file:
+                if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                intervals.append((fields[0], int(fields[1]), int(fields[2])))
+
+    order = {name: i for i, name in enumerate(names or [])}
+    merged = []
+    for chrom, beg, end in sorted(intervals, key=lambda region: (order.get(region[0], len(order)), region)):
+        if merged and merged[-1][0] == chrom and beg <= merged[-1][2]:
+            merged[-1][2] = max(merged[-1][2], end)
+        else:
+            merged.append([chrom, beg, end])
+    return [tuple(region) for region in merged]
+
+
+class RegionReader(object):
+    """
+    Read the header of a bgzipped, indexed vcf file and then only the variant lines overlapping a set
+    of regions, decompressing only the BGZF blocks of the index chunks overlapping the regions.
+    readline() returns text lines like the file object of a whole vcf file.
+    Arguments:
+        infile: bgzipped vcf file with a .tbi or .csi index next to it;
+        regions: list of 'chrom', 'chrom:beg-end' (1-based, inclusive) or (chrom, beg, end) (0-based, half-open);
+        bedfile: BED file of gene intervals
+
+    """
+
+    def __init__(self, infile, regions=None, bedfile=None):
+        if os.path.exists(infile + '.csi'):
+            self.index = TabixIndex(infile + '.csi')
+        elif os.path.exists(infile + '.tbi'):
+            self.index = TabixIndex(infile + '.tbi')
+        else:
+            raise IOError("Index file not found, please index the vcf file with tabix: {0}".format(infile))
+        self.bgzf = BgzfReader(infile)
+        self.regions = parse_regions(regions=regions, bedfile=bedfile, names=self.index.names)
+        self.in_header = True
+        self._lines = self._region_lines()
+
+    def close(self):
+        self.bgzf.close()
+
+    def _region_lines(self):
+        seen = set()
+        for i, (chrom, beg, end) in enumerate(self.regions):
+            if i and self.regions[i - 1][0] != chrom:
+                # regions of a chromosome are consecutive, earlier lines cannot be read again
+                seen = set()
+            for chunk_beg, chunk_end in self.index.chunks(chrom, beg, end):
+                self.bgzf.seek(chunk_beg)
+                while self.bgzf.tell() < chunk_end:
+                    offset = self.bgzf.tell()
+                    line = self.bgzf.readline()
+                    if not line:
+                        break
+                    fields = line.split(b'\t', 5)
+                    if len(fields) < 5 or fields[0].decode() != chrom:
+                        continue
+                    start = int(fields[1]) - 1
+                    if start >= end:
+                        break
+                    if start + len(fields[3]) <= beg:
+                        continue
+                    # a record overlapping two regions is read once, records at the same position are all read
+                    if offset in seen:
+                        continue
+                    seen.add(offset)
+                    yield line.decode('utf-8', errors='replace')
+
+    def readline(self):
+        if self.in_header:
+            line = self.bgzf.readline().decode('utf-8', errors='replace')
+            if line.startswith('#'):
+                return line
+            self.in_header = False
+        return next(self._lines, '')
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+from collections.abc import Mapping
+
+def _integer(text):
+    # annotation tools often declare decimal scores such as CADD as Integer, these are read as floats
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+# converters of the numeric INFO types
+INFO_CONVERTERS = {'Integer': _integer, 'Float': float}
+
+
+def decode_info(raw, schema, malformed='raw'):
+    """
+    Decode the raw value of an INFO field with its Number and Type from the vcf header
+    Arguments:
+        raw: raw string of the value, None for a flag;
+        schema: (Number, Type) from MetadataParser.info_types;
+        malformed: 'raw' to keep values which are not of their Type as strings, 'missing' to read them as None
+    Return:
+        True for Flag; a number for Integer and Float fields with Number=1, otherwise a list of numbers
+        (Integer values written as decimals are floats); missing values ('.') are None;
+        a list of strings for String and Character fields, as without types
+
+    """
+    number, info_type = schema
+    if info_type == 'Flag':
+        return True
+    values = raw.split(',') if raw is not None else []
+    convert = INFO_CONVERTERS.get(info_type)
+    if convert is None:
+        return values
+    typed = []
+    for value in values:
+        if value == '.' or value == '':
+            typed.append(None)
+            continue
+        try:
+            typed.append(convert(value))
+        except ValueError:
+            if malformed == 'missing':
+                typed.append(None)
+            else:
+                typed.append(value)
+    if number == '1' and len(typed) == 1:
+        return typed[0]
+    return typed
+
+
+def decode_csq(transcripts, parser, columns=None):
+    """
+    Decode VEP annotation into a dictionary of per-column lists in one pass over the transcripts
+    Arguments:
+        transcripts: list of VEP annotation strings, one per transcript;
+        parser: A MetadataParser object;
+        columns: VEP columns to decode, all columns when None
+    Return:
+        {'Gene': [gene of transcript 1, gene of transcript 2, ...], ...}; columns missing from a short
+        annotation are dropped
+
+    """
+    rows = [vep.split('|') for vep in transcripts]
+    width = min([len(row) for row in rows] + [len(parser.vep_columns)])
+    return {column: [row[i] for row in rows] for column, i in parser.csq_projection(columns) if i < width}
+
+
+class LazyVariant(Mapping):
+    """
+    Variant information parsed on demand. Keeps the raw tab-split fields of a variant line, INFO is
+    split on first access to any INFO field and each value (including the VEP annotation sub-dictionary)
+    is decoded on first access and then memoized. Reads like the dictionary built by read_variant:
+    {'QUAL': "", 'FILTER': "", 'GT': "", 'info_ID1': [], 'info_ID2': [], ..., 'CSQ': {'Gene': [], ...}}
+    Arguments:
+        variant_line: tab-split variant line
+        parser: A MetadataParser object
+        csq_columns: VEP columns decoded from CSQ, all columns when None
+        typed_info, malformed_info: decode INFO values with their header Type (see decode_info)
+
+    """
+
+    __slots__ = ('_line', '_parser', '_raw', '_decoded', '_csq_columns', '_typed', '_malformed')
+
+    def __init__(self, variant_line, parser, csq_columns=None, typed_info=False, malformed_info='raw'):
+        self._line = variant_line
+        self._parser = parser
+        self._raw = None
+        self._decoded = {}
+        self._csq_columns = csq_columns
+        self._typed = typed_info
+        self._malformed = malformed_info
+
+    def _raw_fields(self):
+        """
+        Split QUAL, FILTER, GT and INFO to raw strings, None for flags
+
+        """
+        if self._raw is None:
+            variant_line = self._line
+            raw = {'QUAL': variant_line[5], 'FILTER': variant_line[6]}
+            format_keys = variant_line[8].split(':')
+            for i in range(len(format_keys)):
+                if format_keys[i] == 'GT':
+                    raw['GT'] = variant_line[9].split(':')[i]
+            for info in variant_line[7].split(';'):
+                info = info.split('=')
+                raw[info[0]] = info[1] if len(info) > 1 else None
+            self._raw = raw
+        return self._raw
+
+    def __getitem__(self, item):
+        if item in self._decoded:
+            return self._decoded[item]
+        if item == 'FILTER' and self._raw is None:
+            return self._line[6]
+
+        value = self._raw_fields()[item]
+        if item == 'QUAL' or item == 'FILTER' or item == 'GT':
+            return value
+        if self._typed and item != 'CSQ' and item in self._parser.info_types:
+            value = decode_info(value, self._parser.info_types[item], self._malformed)
+        elif value is None:
+            value = []
+        elif ',' in value:
+            value = value.split(',')
+        else:
+            value = [value]
+
+        ##### VEP ANNOTATIONS #####
+        if item == 'CSQ':
+            value = decode_csq(value, self._parser, self._csq_columns)
+
+        self._decoded[item] = value
+        return value
+
+    def __contains__(self, item):
+        if item == 'FILTER' or item == 'QUAL':
+            return True
+        return item in self._raw_fields()
+
+    def __iter__(self):
+        return iter(self._raw_fields())
+
+    def __len__(self):
+        return len(self._raw_fields())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class SampleVariant(Mapping):
+    """
+    Variant information of one sample of a multi-sample vcf, reads the information shared between
+    samples from the site variant and the genotype of the sample
+    Arguments:
+        site: LazyVariant or CompactVariant shared between samples
+        gt: genotype of the sample
+
+    """
+
+    __slots__ = ('site', 'gt')
+
+    def __init__(self, site, gt):
+        self.site = site
+        self.gt = gt
+
+    def __getitem__(self, item):
+        if item == 'GT':
+            return self.gt
+        return self.site[item]
+
+    def __contains__(self, item):
+        return item == 'GT' or item in self.site
+
+    def __iter__(self):
+        if 'GT' in self.site:
+            return iter(self.site)
+        return iter(list(self.site) + ['GT'])
+
+    def __len__(self):
+        return len(self.site) + (0 if 'GT' in self.site else 1)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -5,11 +5,196 @@
 
 import os
 import gzip
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from codecs import open, getreader
-import json
 
 from vcf_varselect.metadata_parser import MetadataParser
 from vcf_varselect.read_variant import read_variant
+from vcf_varselect.variant_record import SampleVariant
+from vcf_varselect.record_selection import damaging_check, info_float, info_values, csq_floats, \
+    CRITERIA_VEP_COLUMNS, consequence_mask, get_classifier, LOF, MISSENSE, DELETERIOUS, DAMAGING
+from vcf_varselect.filter_pipeline import FilterPipeline, comb_spec
+from vcf_varselect.gene_panel import GenePanel
+from vcf_varselect.columnar import VariantColumns
+from vcf_varselect.inner_freq import load_inner_freq
+from vcf_varselect.tabix import RegionReader, ThreadedBgzfReader, is_bgzf
+from vcf_varselect.prefetch import PrefetchReader
+from vcf_varselect.mapped_vcf import MappedVcf
+from vcf_varselect.vcf_cache import VcfCache
+from vcf_varselect.profiler import get_profiler, TimedReader
+from vcf_varselect.sweep import ThresholdSweep, expand_grid
+from vcf_varselect.bitset import to_bitset, indexes_to_bitset, bitset_indexes, bitset_count, at_least
+
+
+def open_vcf(infile, regions=None, bedfile=None, threads=None, prefetch=None, prefetch_chunk_size=1048576):
+    """
+    Open vcf file for reading
+    Argument:
+        infile: vcf file with extension .vcf or .vcf.gz;
+        regions, bedfile: only read variants overlapping these regions from a bgzipped vcf file
+                          with a tabix index (see RegionReader);
+        threads: decompression threads of a bgzipped vcf file (see ThreadedBgzfReader), 0 reads it with gzip;
+        prefetch: number of chunks read ahead on a background thread (see PrefetchReader), no prefetching
+                  when None or 0; bgzipped files read by ThreadedBgzfReader are always decompressed ahead;
+        prefetch_chunk_size: bytes read from the file at a time when prefetching
+    Return:
+        text stream of the vcf file
+
+    """
+    if infile == None:
+        raise IOError("Please input a file.")
+    if regions or bedfile:
+        return RegionReader(infile, regions=regions, bedfile=bedfile)
+
+    file_name, file_extension = os.path.splitext(infile)
+
+    if file_extension == '.gz':
+        if threads != 0 and is_bgzf(infile):
+            return ThreadedBgzfReader(infile, threads=threads)
+        if prefetch:
+            return PrefetchReader(infile, chunk_size=prefetch_chunk_size, queue_depth=prefetch)
+        return getreader('utf-8')(gzip.open(infile), errors='replace')
+    elif file_extension == '.vcf':
+        if prefetch:
+            return PrefetchReader(infile, chunk_size=prefetch_chunk_size, queue_depth=prefetch)
+        return open(infile, mode='r', encoding='utf-8', errors='replace')
+    else:
+        raise IOError("File is not in a supported format!\n"
+                      "Please use correct ending(.vcf or .vcf.gz)")
+
+
+def read_vcf_header(vcf):
+    """
+    Parse vcf metadata and header lines
+    Argument:
+        vcf: text stream of the vcf file
+    Return:
+        (metadata, sample, next_line): MetadataParser object, sample ID and first variant line
+
+    """
+    next_line = vcf.readline().rstrip()
+    metadata = MetadataParser()
+    sample = None
+
+    while next_line.startswith('#'):
+        if next_line.startswith('##fileformat') or next_line.startswith('##FILTER') \
+                or next_line.startswith('##FORMAT') or next_line.startswith('##INFO'):
+            metadata.read_metadata(next_line)
+        elif next_line.startswith('#CHROM'):
+            metadata.read_header(next_line)
+            sample = next_line.split('\t')[9]
+        next_line = vcf.readline().rstrip()
+
+    return metadata, sample, next_line
+
+
+def read_genotypes(variant_line):
+    """
+    Genotype of every sample in a variant line
+    Argument:
+        variant_line: tab-split variant line
+    Return:
+        list of GT of each sample, None for samples without GT
+
+    """
+    format_keys = variant_line[8].split(':')
+    if 'GT' not in format_keys:
+        return [None] * len(variant_line[9:])
+    i = format_keys.index('GT')
+    return [sample.split(':')[i] if sample.count(':') >= i else None for sample in variant_line[9:]]
+
+
+def is_carrier(gt):
+    """
+    Whether a genotype has an alternative allele, e.g. 0/1, 1/1, ./1, 0|2
+
+    """
+    if not gt:
+        return False
+    return any(allele != '0' and allele != '.' and allele != ''
+               for allele in gt.replace('|', '/').split('/'))
+
+
+def sample_variant(variant, gt):
+    """
+    Variant information of one sample of a multi-sample vcf: information shared between samples
+    with the genotype of the sample
+    Arguments:
+        variant: variant information from read_variant;
+        gt: genotype of the sample
+    Return:
+        variant information of the sample, the shared variant itself if the genotype is the same
+
+    """
+    if 'GT' in variant and variant['GT'] == gt:
+        return variant
+    if type(variant) == dict:
+        sample_var = dict(variant)
+        sample_var['GT'] = gt
+        return sample_var
+    return SampleVariant(variant, gt)
+
+
+# VariantSelection data read by forked worker processes of comb_selection
+_shared_selection = None
+
+
+def _classify(variants, criteria, lof_terms=None):
+    """
+    Split (index, variant) pairs into bitsets of loss-of-function and damaging missense variant indexes
+
+    """
+    lof, mis_damage = [], []
+    for i, variant in variants:
+        is_lof, is_mis = damaging_check(variant, criteria=criteria, lof_terms=lof_terms)
+        if is_lof:
+            lof.append(i)
+        if is_mis:
+            mis_damage.append(i)
+    return indexes_to_bitset(lof), indexes_to_bitset(mis_damage)
+
+
+def _check_chunk(chunk):
+    """
+    Check a chunk of variants of the shared VariantSelection
+    Return:
+        (lof bitset, damaging missense bitset, pipeline counters)
+
+    """
+    sites, keys, spec, innerfreq, criteria, lof_terms = _shared_selection
+    pipeline = FilterPipeline(spec, innerfreq=innerfreq, lof_terms=lof_terms)
+    lof, mis_damage = _classify(
+        ((i, sites[keys[i]]) for i in range(chunk[0], min(chunk[1], len(keys))) if pipeline(keys[i], sites[keys[i]])),
+        criteria, lof_terms
+    )
+    return lof, mis_damage, pipeline.stats()
+
+
+# MappedVcf, MetadataParser and read_variant options read by forked worker processes parsing byte ranges
+_shared_parse = None
+
+
+def _parse_range(bounds):
+    """
+    Parse the variant lines of a byte range of the shared MappedVcf
+    Return:
+        (sites, carriers, stop): list of (key, variant), list of [(sample index, gt)] of the carriers of each
+        variant of a multi-sample vcf, and the first line which is not a variant line or None
+
+    """
+    mapped, metadata, options = _shared_parse
+    sites, carriers = [], []
+    for offset, line in mapped.lines(*bounds):
+        line = line.rstrip()
+        variant_line = line.split('\t')
+        if line.startswith('#') or len(variant_line) != len(metadata.header):
+            return sites, carriers, line
+        sites.extend(read_variant(line=line, parser=metadata, **options).items())
+        if len(metadata.header) > 10:
+            carriers.append([(i, gt) for i, gt in enumerate(read_genotypes(variant_line)) if is_carrier(gt)])
+    return sites, carriers, None
 
 
 class VariantSelection(object):
@@ -17,324 +202,723 @@ class VariantSelection(object):
     Change vcf file to dictionary, and select variants such as good quality variants, rare variants,
     and damging variants including loss-of-function and missense.
     Argument:
-        vcf file
+        infile: vcf file;
+        record: variant record type, 'dict', 'lazy' or 'compact' (see read_variant);
+        backend: 'dict' to select variants by looping over the variant dictionary, or 'numpy' to select
+                 variants of quality_selection and freq_selection with vectorized masks over NumPy columns;
+        regions: only read variants overlapping these regions, list of 'chrom', 'chrom:beg-end' (1-based)
+                 or (chrom, beg, end) (0-based, half-open), needs a bgzipped vcf with a .tbi or .csi index;
+        bedfile: BED file of regions, e.g. intervals of the disorder related genes;
+        cache_dir: directory of the on-disk cache of parsed vcf files (see VcfCache), the vcf file is parsed
+                   once and later runs load the parsed variants; no cache when None. Cache files are pickles,
+                   the directory must only be writable by trusted users;
+        cache_size_mb: maximum size of the cache directory in MB, least recently used files are removed first;
+        cache_verify: hash the vcf file on every cache load, also when its size and modification time match;
+        profile: True or a Profiler to record wall time, record counts and rejection counts of reading and
+                 of each selection (see Profiler), kept in self.profiler;
+        threads: threads decompressing a bgzipped vcf file, min(4, number of CPUs) when None,
+                 0 to read it with gzip in one thread; other gzipped files are always read with gzip;
+        csq_columns: VEP columns decoded from CSQ, all columns when None; the selections read Consequence,
+                     gnomAD_AF, SIFT, PolyPhen and MPC, match_gene reads Gene (see FilterPipeline.csq_columns);
+        prefetch: number of chunks of prefetch_chunk_size bytes read and decompressed ahead on a background
+                  thread while the variants are parsed (see PrefetchReader), no prefetching when None or 0;
+        vcf: text stream of infile opened ahead of time with open_vcf, e.g. by sample_combine to prefetch
+             the next file; it is closed after reading;
+        typed_info: decode Integer, Float and Flag INFO fields once when a variant is read, with Number and
+                    Type from the header (see decode_info), so the selections compare numbers directly;
+                    'dict' and 'lazy' records only, compact records pack numeric fields already;
+        malformed_info: 'raw' to keep INFO values which are not of their Type as strings, 'missing' to read
+                        them as missing values;
+        parse_workers: number of worker processes parsing a plain .vcf file, the file is memory-mapped and its
+                       variant lines are split into byte ranges parsed by forked workers and merged in file order
+                       (see MappedVcf); other files, regions and a vcf opened ahead are read in this process
     Return:
         nested variant dictionary {sample:{variant1:{'QUALITY':"", 'FILTER':"", 'GT':"", 'infoID1':[], 'infoID2':[],...}}}
+        For a multi-sample vcf, each sample holds the variants where it carries an alternative allele,
+        INFO and VEP annotation are parsed once per line and shared between samples, and every
+        selection is run on all samples at once.
 
     """
 
-    def __init__(self, infile=None):
+    def __init__(self, infile=None, record='dict', backend='dict', regions=None, bedfile=None,
+                 cache_dir=None, cache_size_mb=None, profile=None, threads=None, csq_columns=None,
+                 prefetch=None, prefetch_chunk_size=1048576, vcf=None, typed_info=False, malformed_info='raw',
+                 parse_workers=None, cache_verify=False):
         super(VariantSelection, self).__init__()
+        self.profiler = get_profiler(profile)
+        start = time.perf_counter()
+
+        if backend not in ('dict', 'numpy'):
+            raise ValueError("backend must be 'dict' or 'numpy'")
+        self.backend = backend
+        self._columns = None
+        self._keys = None
+        self._sample_bits = None
+
+        # only whole files are cached, region reads are already cheap
+        cache, cached = None, None
+        if cache_dir and not (regions or bedfile):
+            if infile == None:
+                raise IOError("Please input a file.")
+            cache = VcfCache(cache_dir, max_size_mb=cache_size_mb, verify=cache_verify)
+            if csq_columns is not None:
+                cache_record = '{0}:{1}'.format(record, ','.join(csq_columns))
+            else:
+                cache_record = record
+            if typed_info:
+                cache_record = '{0}:typed-{1}'.format(cache_record, malformed_info)
+            cached = cache.load(infile, record=cache_record)
+            if cached is not None:
+                self.metadata, self.sample, self.variant, self.sites = cached
+                self.samples = self.metadata.header[9:]
+                self.vcf, self.next_line = None, ''
+                if vcf is not None:
+                    vcf.close()
+
+        if cached is None:
+            mapped = None
+            if vcf is not None:
+                self.vcf = vcf
+            elif parse_workers and infile is not None and os.path.splitext(infile)[1] == '.vcf' \
+                    and not (regions or bedfile):
+                self.vcf = mapped = MappedVcf(infile)
+            else:
+                self.vcf = open_vcf(infile, regions=regions, bedfile=bedfile, threads=threads,
+                                    prefetch=prefetch, prefetch_chunk_size=prefetch_chunk_size)
+            if self.profiler.enabled:
+                self.vcf = TimedReader(self.vcf)
+            try:
+                self._read_variants(record, csq_columns, typed_info=typed_info, malformed_info=malformed_info,
+                                    mapped=mapped, workers=parse_workers)
+            finally:
+                self.vcf.close()
+            if cache is not None:
+                cache.save(infile, (self.metadata, self.sample, self.variant, self.sites), record=cache_record)
+
+        # profiler name of the file: the sample ID, or the file name for multi-sample vcf files
+        self.profile_name = self.sample if len(self.samples) == 1 else os.path.basename(infile)
+        if self.profiler.enabled:
+            if cached is None:
+                self.profiler.add('decompress', self.profile_name, seconds=self.vcf.seconds, records=self.vcf.lines)
+            self.profiler.add('read_vcf' if cached is None else 'read_cache', self.profile_name,
+                              seconds=time.perf_counter() - start, records=len(self.sites))
+
+        self.header = self.metadata.header
+
+        self.id_dict = self.metadata.id_dict
+        self.vep_columns = self.metadata.vep_columns
+
+    @classmethod
+    def read_chunks(cls, infile=None, chunk_size=100000, record='dict', backend='dict', regions=None, bedfile=None,
+                    profile=None, threads=None, csq_columns=None, prefetch=None, prefetch_chunk_size=1048576,
+                    vcf=None, typed_info=False, malformed_info='raw'):
+        """
+        Read a vcf file chunk_size variant lines at a time, so that memory holds one chunk instead of the whole
+        file. The selections and match_gene look at each variant on its own, so the variants selected from the
+        whole file are the union of the variants selected from each chunk.
+        Arguments:
+            infile: vcf file;
+            chunk_size: variant lines of each chunk;
+            record, backend, regions, bedfile, profile, threads, csq_columns, prefetch, prefetch_chunk_size,
+            vcf, typed_info, malformed_info: see VariantSelection, the chunks are not cached
+        Yield:
+            VariantSelection of each chunk of consecutive variant lines, at least one for an empty file
+
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if backend not in ('dict', 'numpy'):
+            raise ValueError("backend must be 'dict' or 'numpy'")
+        profiler = get_profiler(profile)
+        if vcf is None:
+            vcf = open_vcf(infile, regions=regions, bedfile=bedfile, threads=threads,
+                           prefetch=prefetch, prefetch_chunk_size=prefetch_chunk_size)
+        if profiler.enabled:
+            vcf = TimedReader(vcf)
+        try:
+            header = read_vcf_header(vcf)
+            while True:
+                start = time.perf_counter()
+                decompress = vcf.seconds if profiler.enabled else 0.0
+                part = cls.__new__(cls)
+                part.profiler, part.backend, part._columns, part.vcf = profiler, backend, None, vcf
+                part._keys, part._sample_bits = None, None
+                n = part._read_variants(record, csq_columns, header=header, max_records=chunk_size,
+                                        typed_info=typed_info, malformed_info=malformed_info)
+                header = (part.metadata, part.sample, part.next_line)
+                part.profile_name = part.sample if len(part.samples) == 1 else os.path.basename(infile)
+                part.header = part.metadata.header
+                part.id_dict = part.metadata.id_dict
+                part.vep_columns = part.metadata.vep_columns
+                if profiler.enabled:
+                    profiler.add('decompress', part.profile_name, seconds=vcf.seconds - decompress, records=n)
+                    profiler.add('read_vcf', part.profile_name, seconds=time.perf_counter() - start,
+                                 records=len(part.sites))
+                yield part
+                if n < chunk_size or len(part.next_line.split('\t')) != len(part.header):
+                    break
+        finally:
+            vcf.close()
+
+    def _read_variants(self, record, csq_columns=None, header=None, max_records=None, typed_info=False,
+                       malformed_info='raw', mapped=None, workers=None):
+        """
+        Parse the header and variant lines of the vcf file
+        Arguments:
+            record, csq_columns, typed_info, malformed_info: see VariantSelection;
+            header: (metadata, sample, next_line) of read_vcf_header when the header is already read;
+            max_records: stop after this many variant lines, self.next_line is then the next variant line;
+            mapped, workers: MappedVcf of self.vcf, its variant lines are parsed by this many worker processes
+        Return:
+            number of variant lines read
 
-        if infile == None:
-            raise IOError("Please input a file.")
+        """
+        if header is None:
+            header = read_vcf_header(self.vcf)
+        self.metadata, self.sample, self.next_line = header
+        self.samples = self.metadata.header[9:]
+
+        self.variant = {}
+        for sample in self.samples:
+            self.variant[sample] = {}
+        # variants of all samples with information shared between samples, parsed once per line
+        if len(self.samples) == 1:
+            self.sites = self.variant[self.sample]
         else:
+            self.sites = {}
+
+        if mapped is not None:
+            return self._read_mapped(mapped, workers, dict(record=record, csq_columns=csq_columns,
+                                                           typed_info=typed_info, malformed_info=malformed_info))
+        n = 0
+        while not self.next_line.startswith('#'):
+            if max_records is not None and n >= max_records:
+                break
+            variant_line = self.next_line.split('\t')
+            if len(variant_line) != len(self.metadata.header):
+                break
+            n += 1
+            site = read_variant(
+                line=self.next_line,
+                parser=self.metadata,
+                record=record,
+                csq_columns=csq_columns,
+                typed_info=typed_info,
+                malformed_info=malformed_info
+            )
+            self.sites.update(site)
+            if len(self.samples) > 1:
+                for key, variant in site.items():
+                    for sample, gt in zip(self.samples, read_genotypes(variant_line)):
+                        if is_carrier(gt):
+                            self.variant[sample][key] = sample_variant(variant, gt)
+            self.next_line = self.vcf.readline().rstrip()
+        return n
 
-            file_name, file_extension = os.path.splitext(infile)
+    def _read_mapped(self, mapped, workers, options):
+        """
+        Parse the variant lines of a MappedVcf after its header in byte ranges, several ranges per worker
+        process so that the workers stay busy, and add the variants range by range in file order
+        Arguments:
+            mapped: MappedVcf whose header is read;
+            workers: number of worker processes;
+            options: record, csq_columns, typed_info and malformed_info of read_variant
+        Return:
+            number of variant lines read
 
-            if file_extension == '.gz':
-                self.vcf = getreader('utf-8')(gzip.open(infile), errors='replace')
-            elif file_extension == '.vcf':
-                self.vcf = open(infile, mode='r', encoding='utf-8', errors='replace')
+        """
+        global _shared_parse
+        # the first variant line is already read by read_vcf_header
+        bounds = mapped.ranges(mapped.offset, 4 * workers) if self.next_line else []
+        _shared_parse = (mapped, self.metadata, options)
+        n = 0
+        try:
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                results = map(_parse_range, bounds)
+                executor = None
             else:
-                raise IOError("File is not in a supported format!\n"
-                              "Please use correct ending(.vcf or .vcf.gz)")
-            self.next_line = self.vcf.readline().rstrip()
-            self.metadata = MetadataParser()
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                results = executor.map(_parse_range, bounds)
+            try:
+                for sites, carriers, stop in results:
+                    n += len(sites)
+                    self.sites.update(sites)
+                    for (key, variant), carried in zip(sites, carriers):
+                        for i, gt in carried:
+                            self.variant[self.samples[i]][key] = sample_variant(variant, gt)
+                    if stop is not None:
+                        self.next_line = stop
+                        break
+                else:
+                    self.next_line = ''
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+        finally:
+            _shared_parse = None
+        return n
 
-            while self.next_line.startswith('#'):
-                if self.next_line.startswith('##fileformat') or self.next_line.startswith('##FILTER') \
-                        or self.next_line.startswith('##FORMAT') or self.next_line.startswith('##INFO'):
-                    self.metadata.read_metadata(self.next_line)
-                elif self.next_line.startswith('#CHROM'):
-                    self.metadata.read_header(self.next_line)
-                    self.sample = self.next_line.split('\t')[9]
-                self.next_line = self.vcf.readline().rstrip()
+    def __iter__(self):
+        return iter(self.__dict__.items())
 
-            self.variant = {}
-            self.variant[self.sample] = {}
+    def __getitem__(self, item):
+        return getattr(self, str(item))
 
-            while not self.next_line.startswith('#') and len(self.next_line.split('\t')) == 10:
-                self.variant[self.sample].update(read_variant(
-                    line=self.next_line,
-                    parser=self.metadata
-                ))
-                self.next_line = self.vcf.readline().rstrip()
+    @property
+    def columns(self):
+        """
+        VariantColumns of the sample used by the numpy backend, built on first use
 
-            self.header = self.metadata.header
+        """
+        if self._columns is None:
+            self._columns = VariantColumns(self.sites)
+        return self._columns
 
-            self.id_dict = self.metadata.id_dict
-            self.vep_columns = self.metadata.vep_columns
+    @property
+    def keys(self):
+        """
+        Keys of the variants of all samples in file order. The selections identify a variant by its index in
+        this list and a set of variants by a bitset of indexes (see bitset), combined with & and |
 
-    def __iter__(self):
-        return iter(self.__dict__.items())
+        """
+        if self._keys is None:
+            self._keys = list(self.sites)
+        return self._keys
 
-    def __getitem__(self, item):
-        return getattr(self, str(item))
+    @property
+    def sample_bits(self):
+        """
+        Bitset of the variants of each sample {sample: bitset}
 
-    def quality_selection(self, FILTER=None, DP=None, QD=None, MQ=None):
+        """
+        if self._sample_bits is None:
+            if len(self.samples) == 1:
+                self._sample_bits = {self.sample: (1 << len(self.keys)) - 1}
+            else:
+                index = {key: i for i, key in enumerate(self.keys)}
+                self._sample_bits = {
+                    sample: indexes_to_bitset([index[key] for key in self.variant[sample]])
+                    for sample in self.samples
+                }
+        return self._sample_bits
+
+    def select_bits(self, bits):
+        """
+        Nested dictionary of the variants of every sample which are in a bitset of indexes of self.keys,
+        the keys are only looked up for the selected variants
+
+        """
+        keys = self.keys
+        selected = {}
+        for sample in self.samples:
+            variants = self.variant[sample]
+            selected[sample] = {keys[i]: variants[keys[i]] for i in bitset_indexes(bits & self.sample_bits[sample])}
+        return selected
+
+    def _complement(self, bits):
+        """
+        Bitset of the variants which are not in a bitset
+
+        """
+        return ((1 << len(self.keys)) - 1) & ~bits
+
+    def quality_selection(self, FILTER=None, DP=None, QD=None, MQ=None, bitsets=False):
         """
         Select variants with good quality based on selected criteria (FILTER, DP, QD, MQ)
         Arguments:
-            FILTER, DP, QD, MQ: variants quality threshold
+            FILTER, DP, QD, MQ: variants quality threshold;
+            bitsets: return the bitset of the indexes in self.keys of the selected variants (see select_bits)
         Return:
             nested dictionary of selected variants
 
         """
-        quality = {}
+        start = time.perf_counter()
+        if self.backend == 'numpy':
+            quality = self.columns.bitset(self.columns.quality_mask(FILTER=FILTER, DP=DP, QD=QD, MQ=MQ))
+            self.profiler.add('quality_selection', self.profile_name,
+                              seconds=time.perf_counter() - start, records=len(self.sites))
+            return quality if bitsets else self.select_bits(quality)
+
+        sites = [self.sites[key] for key in self.keys]
+
         if FILTER:
-            filt = [
-                key for key in self.variant[self.sample]
-                if 'FILTER' in self.variant[self.sample][key] and self.variant[self.sample][key]['FILTER'] != FILTER
-            ]  # PASS
+            filt = to_bitset([
+                'FILTER' in variant and variant['FILTER'] != FILTER
+                for variant in sites
+            ])  # PASS
         else:
-            filt = []
+            filt = 0
 
         if DP:
-            dp = [
-                key for key in self.variant[self.sample]
-                if
-                'DP' in self.variant[self.sample][key] and float(''.join(self.variant[self.sample][key]['DP'])) < float(DP)
-            ]  # 10.0
+            dp = to_bitset([
+                'DP' in variant and info_float(variant, 'DP') < float(DP)
+                for variant in sites
+            ])  # 10.0
         else:
-            dp = []
+            dp = 0
 
         if QD:
-            qd = [
-                key for key in self.variant[self.sample]
-                if
-                'QD' in self.variant[self.sample][key] and float(''.join(self.variant[self.sample][key]['QD'])) < float(QD)
-            ]  # 2.0
+            qd = to_bitset([
+                'QD' in variant and info_float(variant, 'QD') < float(QD)
+                for variant in sites
+            ])  # 2.0
         else:
-            qd = []
+            qd = 0
 
         if MQ:
-            mq = [
-                key for key in self.variant[self.sample]
-                if 'MQ' in self.variant[self.sample][key] and float(''.join(self.variant[self.sample][key]['MQ'])) < float(MQ)
-            ]  # 40.0
+            mq = to_bitset([
+                'MQ' in variant and info_float(variant, 'MQ') < float(MQ)
+                for variant in sites
+            ])  # 40.0
         else:
-            mq = []
+            mq = 0
 
-        quality[self.sample] = {
-            i: self.variant[self.sample][i]
-            for i in (set(self.variant[self.sample].keys()) - set(filt + dp + qd + mq))
-        }
+        quality = self._complement(filt | dp | qd | mq)
 
-        return quality
+        if self.profiler.enabled:
+            self.profiler.add('quality_selection', self.profile_name, seconds=time.perf_counter() - start,
+                              records=len(self.sites),
+                              rejected={'FILTER': bitset_count(filt), 'DP': bitset_count(dp), 'QD': bitset_count(qd),
+                                        'MQ': bitset_count(mq)})
+        return quality if bitsets else self.select_bits(quality)
 
-    def freq_selection(self, innerfreqfile=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None):
+    def freq_selection(self, innerfreqfile=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None, INNER=0.01,
+                       bitsets=False):
         """
         Select rare variants based on selected databases (1000G, EXAC, GNOMAD, SWEGEN)
         Arguments:
             KG, EXAC, GNOMAD, SWEGEN: rare variants frequency threshold;
-            innerfreqfile: json file of variant frequency in the samples
+            innerfreqfile: json or SQLite file of variant frequency in the samples, or an InnerFreqStore;
+            INNER: inner-freq threshold;
+            bitsets: return the bitset of the indexes in self.keys of the selected variants (see select_bits)
 
         """
-        freq = {}
+        start = time.perf_counter()
+        if self.backend == 'numpy':
+            innerfreq = load_inner_freq(innerfreqfile) if innerfreqfile else None
+            freq = self.columns.bitset(self.columns.freq_mask(
+                innerfreq=innerfreq, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN, INNER=INNER
+            ))
+            self.profiler.add('freq_selection', self.profile_name,
+                              seconds=time.perf_counter() - start, records=len(self.sites))
+            return freq if bitsets else self.select_bits(freq)
+
+        sites = [self.sites[key] for key in self.keys]
+
         if KG:
-            kg = [
-                key for key in self.variant[self.sample]
-                if '1000GAF' in self.variant[self.sample][key] and
-                   float(''.join(self.variant[self.sample][key]['1000GAF'])) > float(KG)
-            ]
+            kg = to_bitset([
+                '1000GAF' in variant and info_float(variant, '1000GAF') > float(KG)
+                for variant in sites
+            ])
         else:
-            kg = []
+            kg = 0
 
         if EXAC:
-            exac = [
-                key for key in self.variant[self.sample]
-                if 'EXACAF' in self.variant[self.sample][key] and
-                   float(''.join(self.variant[self.sample][key]['EXACAF'])) > float(EXAC)
-            ]
+            exac = to_bitset([
+                'EXACAF' in variant and info_float(variant, 'EXACAF') > float(EXAC)
+                for variant in sites
+            ])
         else:
-            exac = []
+            exac = 0
 
         if GNOMAD:
-            gnomad = [
-                key for key in self.variant[self.sample]
-                for i in self.variant[self.sample][key]['CSQ']['gnomAD_AF']
-                if i != "" and float(i) > float(GNOMAD)
-            ]
+            gnomad = to_bitset([
+                any(value > float(GNOMAD) for value in csq_floats(variant, 'gnomAD_AF'))
+                for variant in sites
+            ])
         else:
-            gnomad = []
+            gnomad = 0
 
         if SWEGEN:
-            swegen = [
-                key for key in self.variant[self.sample]
-                if 'SWEGENAF' in self.variant[self.sample][key] and
-                   float(''.join(self.variant[self.sample][key]['SWEGENAF'])) > float(SWEGEN)
-            ]
+            swegen = to_bitset([
+                'SWEGENAF' in variant and info_float(variant, 'SWEGENAF') > float(SWEGEN)
+                for variant in sites
+            ])
         else:
-            swegen = []
+            swegen = 0
 
         if innerfreqfile:
-            innerfreq_file = open(innerfreqfile)
-            innerfreq = json.load(innerfreq_file)
-            inner = [
-                key for key in self.variant[self.sample]
-                if key in innerfreq and innerfreq[key] > float(0.01)
-            ]
+            innerfreq = load_inner_freq(innerfreqfile)
+            inner = to_bitset([
+                innerfreq.get(key, float('nan')) > float(INNER)
+                for key in self.keys
+            ])
         else:
-            inner = []
+            inner = 0
 
-        freq[self.sample] = {
-            i: self.variant[self.sample][i]
-            for i in (set(self.variant[self.sample].keys()) - set(kg + exac + gnomad + swegen + inner))
-        }
+        freq = self._complement(kg | exac | gnomad | swegen | inner)
 
-        return freq
+        if self.profiler.enabled:
+            self.profiler.add('freq_selection', self.profile_name, seconds=time.perf_counter() - start,
+                              records=len(self.sites),
+                              rejected={'KG': bitset_count(kg), 'EXAC': bitset_count(exac),
+                                        'GNOMAD': bitset_count(gnomad), 'SWEGEN': bitset_count(swegen),
+                                        'INNER': bitset_count(inner)})
+        return freq if bitsets else self.select_bits(freq)
 
-    def damaging_selection(self, criteria=[]):
+    def damaging_selection(self, criteria=[], lof_terms=None, bitsets=False):
         """
         Select damaging variants including loss-of-function variants (frameshift_variant, stop_gained,
         splice_acceptor_variant, splice_donor_variant, stop_lost, start_lost), and damaging missense
         variants based on vep annotation (missense_variant) and missense algorithms prediction
         (SIFT, POLYPHEN, MPC, CADD, SPIDEX, PHYLOP)
         Argument:
-            criteria: selected missense algorithm list
+            criteria: selected missense algorithm list;
+            lof_terms: Consequence terms of loss-of-function variants, the terms above when None;
+            bitsets: return bitsets of the indexes in self.keys of the selected variants (see select_bits)
 
         """
-        lof = {}
-        mis = {}
-        mis_damage = {}
-        damaging = {}
-        lof[self.sample] = {}
-        mis[self.sample] = {}
-        mis_damage[self.sample] = {}
-        for key in self.variant[self.sample]:
-            if self.variant[self.sample][key]['set'] != ['freebayes'] and \
-                    self.variant[self.sample][key]['set'] != ['gatk'] and \
-                    self.variant[self.sample][key]['set'] != ['samtools']:
-                for i in self.variant[self.sample][key]['CSQ']['Consequence']:
-                    ###lof####
-                    if 'frameshift_variant' in i or \
-                            'stop_gained' in i or \
-                            'splice_acceptor_variant' in i or \
-                            'splice_donor_variant' in i or \
-                            'stop_lost' in i or \
-                            'start_lost' in i:
-                        lof[self.sample][key] = self.variant[self.sample][key]
-                    ##missense####
-                    if 'missense_variant' in i:
-                        mis[self.sample][key] = self.variant[self.sample][key]
-
+        start = time.perf_counter()
+        classifier = get_classifier(lof_terms)
+        sites = [self.sites[key] for key in self.keys]
+        consequence = [consequence_mask(variant, classifier) for variant in sites]
+        ###lof####
+        lof = to_bitset([mask & LOF for mask in consequence])
+        ##missense####
+        mis = to_bitset([mask & MISSENSE for mask in consequence])
+
+        # variants predicted damaging by each missense algorithm
+        votes = {}
         if 'SIFT' in criteria:
-            sift = [
-                key for key in self.variant[self.sample]
-                for i in self.variant[self.sample][key]['CSQ']['SIFT']
-                if 'deleterious' in i or 'deleterious_low_confidence' in i
-            ]
-        else:
-            sift = []
+            votes['SIFT'] = to_bitset([
+                classifier.mask(variant['CSQ']['SIFT']) & DELETERIOUS
+                for variant in sites
+            ])
 
         if 'POLYPHEN' in criteria:
-            polyphen = [
-                key for key in self.variant[self.sample]
-                for i in self.variant[self.sample][key]['CSQ']['PolyPhen']
-                if 'possibly_damaging' in i or 'probably_damaging' in i
-            ]
-        else:
-            polyphen = []
+            votes['POLYPHEN'] = to_bitset([
+                classifier.mask(variant['CSQ']['PolyPhen']) & DAMAGING
+                for variant in sites
+            ])
 
         if 'MPC' in criteria:
-            mpc = []
-            for key in self.variant[self.sample]:
-                for i in self.variant[self.sample][key]['CSQ']['MPC']:
-                    if i != '':
-                        if i != 'NA':
-                            if float(i) >= 2.0:
-                                mpc.append(key)
-        else:
-            mpc = []
+            votes['MPC'] = to_bitset([
+                any(i != '' and i != 'NA' and float(i) >= 2.0 for i in variant['CSQ']['MPC'])
+                for variant in sites
+            ])
 
         if 'CADD' in criteria:
-            cadd = [
-                key for key in self.variant[self.sample]
-                if 'CADD' in self.variant[self.sample][key] and
-                   float(''.join(self.variant[self.sample][key]['CADD'])) >= 20.0
-            ]
-        else:
-            cadd = []
+            votes['CADD'] = to_bitset([
+                'CADD' in variant and info_float(variant, 'CADD') >= 20.0
+                for variant in sites
+            ])
 
         if 'SPIDEX' in criteria:
-            spidex = [
-                key for key in self.variant[self.sample]
-                if 'SPIDEX' in self.variant[self.sample][key] and
-                   abs(float(''.join(self.variant[self.sample][key]['SPIDEX']))) >= 2.0
-            ]
-        else:
-            spidex = []
+            votes['SPIDEX'] = to_bitset([
+                'SPIDEX' in variant and abs(info_float(variant, 'SPIDEX')) >= 2.0
+                for variant in sites
+            ])
 
         if 'PHYLOP' in criteria:
-            phylop = []
-            for key in self.variant[self.sample]:
-                if 'dbNSFP_phyloP100way_vertebrate' in self.variant[self.sample][key]:
-                    for i in self.variant[self.sample][key]['dbNSFP_phyloP100way_vertebrate']:
-                        if float(i) >= 2.0:
-                            phylop.append(key)
-        else:
-            phylop = []
-
-        # integrate variants together and sum how many variants are from sift, polyphen, mpc....., respectively
-        sum_dict = {}
-        cridict = {'sift': sift, 'polyphen': polyphen, 'mpc': mpc, 'cadd': cadd, 'spidex': spidex, 'phylop': phylop}
-        for i in cridict:
-            for var in cridict[i]:
-                if var not in sum_dict:
-                    sum_dict[var] = {}
-                    sum_dict[var][i] = 1
-                else:
-                    sum_dict[var][i] = 1
-
-        # select missense variants fulfilling damaging prediction
-        for var in sum_dict:
-            if sum(sum_dict[var].values()) > 0.5 * (len(criteria)) and var in mis[self.sample]:
-                mis_damage[self.sample][var] = mis[self.sample][var]
-
-        damaging[self.sample] = {**lof[self.sample], **mis_damage[self.sample]}
-
-        return damaging, lof, mis_damage
+            votes['PHYLOP'] = to_bitset([
+                'dbNSFP_phyloP100way_vertebrate' in variant and
+                any(i is not None and float(i) >= 2.0 for i in info_values(variant, 'dbNSFP_phyloP100way_vertebrate'))
+                for variant in sites
+            ])
+
+        # select missense variants fulfilling damaging prediction: more than half of the criteria vote damaging
+        mis_damage = mis & at_least(list(votes.values()), int(0.5 * len(criteria)) + 1)
+
+        if self.profiler.enabled:
+            # consequence: neither loss-of-function nor missense; criteria: missense variants not predicted damaging
+            rejected = {'consequence': len(self.sites) - bitset_count(lof | mis),
+                        'missense': bitset_count(mis & ~mis_damage)}
+            for criterion in criteria:
+                rejected[criterion] = bitset_count(mis & ~votes.get(criterion, 0))
+            self.profiler.add('damaging_selection', self.profile_name, seconds=time.perf_counter() - start,
+                              records=len(self.sites), rejected=rejected)
+        if bitsets:
+            return lof | mis_damage, lof, mis_damage
+        return self.select_bits(lof | mis_damage), self.select_bits(lof), self.select_bits(mis_damage)
 
     def comb_selection(self, FILTER=None, DP=None, QD=None, MQ=None,
              innerfreqfile=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None,
-             criteria=[]):
+             criteria=[], INNER=0.01, workers=None, lof_terms=None, bitsets=False):
         """
-        Select damaging variants with rare frequency and good quality
+        Select damaging variants with rare frequency and good quality. The criteria are compiled into one
+        FilterPipeline (see comb_spec) evaluated once per variant, its counters are kept in self.pipeline.
+        Argument:
+            workers: number of worker processes checking the variants, the variants are split into
+                     chunks and each worker reads its chunk from a forked copy of this object,
+                     on platforms without fork the variants are checked in this process;
+            lof_terms: Consequence terms of loss-of-function variants (see damaging_selection);
+            bitsets: return bitsets of the indexes in self.keys of the selected variants (see select_bits)
 
         """
-        damaging_sel = {}
-        lof_sel = {}
-        mis_sel = {}
-        quality = {}
-        freq = {}
+        spec = comb_spec(FILTER=FILTER, DP=DP, QD=QD, MQ=MQ,
+                         innerfreqfile=innerfreqfile, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN,
+                         criteria=criteria, INNER=INNER)
+        start = time.perf_counter()
+        innerfreq = load_inner_freq(innerfreqfile) if innerfreqfile else None
+        self.pipeline = FilterPipeline(spec, innerfreq=innerfreq, lof_terms=lof_terms)
+
+        if workers:
+            lof, mis_damage = self._parallel_selection(workers, criteria, lof_terms)
+        else:
+            lof, mis_damage = _classify(
+                ((i, self.sites[key]) for i, key in enumerate(self.keys) if self.pipeline(key, self.sites[key])),
+                criteria, lof_terms
+            )
+
+        selected = lof | mis_damage, lof, mis_damage
+        if not bitsets:
+            selected = tuple(self.select_bits(bits) for bits in selected)
+        if self.profiler.enabled:
+            self.profiler.add('comb_selection', self.profile_name, seconds=time.perf_counter() - start,
+                              records=len(self.sites),
+                              rejected={stat['condition']: stat['rejected'] for stat in self.pipeline.stats()})
+        return selected
+
+    def _parallel_selection(self, workers, criteria, lof_terms=None):
+        """
+        Run self.pipeline on chunks of the variants in worker processes
+        Return:
+            (lof bitset, damaging missense bitset)
 
-        damaging, lof, mis_damage = self.damaging_selection(criteria=criteria)
+        """
+        global _shared_selection
+        keys = self.keys
+        size = -(-len(keys) // workers) if keys else 1
+        chunks = [(start, start + size) for start in range(0, len(keys), size)]
+        _shared_selection = (self.sites, keys, self.pipeline.spec, self.pipeline.innerfreq, criteria, lof_terms)
+        try:
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                results = [_check_chunk(chunk) for chunk in chunks]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                    results = list(executor.map(_check_chunk, chunks))
+        finally:
+            _shared_selection = None
+
+        lof, mis_damage = 0, 0
+        for lof_bits, mis_bits, stats in results:
+            lof |= lof_bits
+            mis_damage |= mis_bits
+            self.pipeline.merge_stats(stats)
+        return lof, mis_damage
+
+    def sweep(self, grid, innerfreqfile=None, counts=False, lof_terms=None):
+        """
+        Run comb_selection for every parameter set of a grid in one pass over the variants, see ThresholdSweep.
+        Each variant value, vote of a missense algorithm and threshold is evaluated once for the whole grid.
+        Arguments:
+            grid: list of parameter dictionaries of comb_selection (FILTER, DP, QD, MQ, KG, EXAC, GNOMAD, SWEGEN,
+                  criteria, INNER), or a dictionary of lists of values whose every combination is a parameter set,
+                  e.g. {'DP': [5, 10, 20], 'GNOMAD': [1e-4, 1e-3, 1e-2], 'criteria': [['SIFT', 'POLYPHEN'], []]};
+            innerfreqfile: inner-freq file, shared by the whole grid;
+            counts: return the number of selected variants of every sample instead of the variants;
+            lof_terms: Consequence terms of loss-of-function variants (see damaging_selection)
+        Return:
+            list of (parameter dictionary, result) in grid order, result is the (damaging, lof, damaging missense)
+            nested dictionaries of comb_selection, or {sample: (damaging, lof, damaging missense)} counts
 
-        if FILTER or DP or QD or MQ:
-            quality = self.quality_selection(FILTER=FILTER, DP=DP, QD=QD, MQ=MQ)
-        else:
-            quality[self.sample] = self.variant[self.sample]
+        """
+        start = time.perf_counter()
+        innerfreq = load_inner_freq(innerfreqfile) if innerfreqfile else None
+        sweeper = ThresholdSweep(self.sites, innerfreq=innerfreq, lof_terms=lof_terms)
+
+        results = []
+        for params in expand_grid(grid):
+            selected = sweeper.select(**params)
+            if counts:
+                result = {sample: tuple(bitset_count(bits & self.sample_bits[sample]) for bits in selected)
+                          for sample in self.samples}
+            else:
+                result = tuple(self.select_bits(bits) for bits in selected)
+            results.append((params, result))
+        self.profiler.add('sweep', self.profile_name, seconds=time.perf_counter() - start,
+                          records=len(self.sites))
+        return results
+
+    @staticmethod
+    def stream(infile=None, FILTER=None, DP=None, QD=None, MQ=None,
+               innerfreqfile=None, KG=None, EXAC=None, GNOMAD=None, SWEGEN=None,
+               criteria=[], genefile=None, genderfile=None, select='damaging', record='lazy', INNER=0.01,
+               panel=None, regions=None, bedfile=None, pipeline=None, csq_columns=None,
+               prefetch=None, prefetch_chunk_size=1048576, typed_info=False, malformed_info='raw', lof_terms=None):
+        """
+        Read vcf file line by line and yield good-quality rare damaging variants as they are read,
+        without keeping the whole file in memory. Yields the same variants as comb_selection
+        (and match_gene when genefile and genderfile, or panel, are given).
+        Arguments:
+            infile: vcf file;
+            FILTER, DP, QD, MQ: variants quality threshold;
+            innerfreqfile, KG, EXAC, GNOMAD, SWEGEN, INNER: rare variants frequency threshold;
+            criteria: selected missense algorithm list;
+            genefile, genderfile: disorder related gene list and male sample ID;
+            panel: GenePanel object, used instead of genefile and genderfile;
+            regions, bedfile: only read variants overlapping these regions (see VariantSelection);
+            pipeline: FilterPipeline used instead of the thresholds, its counters are updated as variants are read;
+                      accepted variants are split into lof and mis with the missense algorithms of its damaging
+                      or damaging_missense condition (criteria when it has none) and its lof_terms;
+            select: 'damaging', 'lof' or 'mis', matching damaging_sel, lof_sel and mis_sel of comb_selection;
+            record: variant record type passed to read_variant ('lazy', 'compact' or 'dict');
+            csq_columns: VEP columns decoded from CSQ, 'auto' for the columns read by the selection and
+                         gene matching, None for all columns;
+            prefetch, prefetch_chunk_size: chunks read ahead on a background thread (see VariantSelection);
+            typed_info, malformed_info: decode INFO fields with their header Type (see VariantSelection);
+            lof_terms: Consequence terms of loss-of-function variants (see damaging_selection)
+        Yield:
+            (sample, key, variant) of each selected variant, for a multi-sample vcf once for every sample
+            carrying the variant
 
-        if innerfreqfile or KG or EXAC or GNOMAD or SWEGEN:
-            freq = self.freq_selection(innerfreqfile=innerfreqfile, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN)
+        """
+        if select not in ('damaging', 'lof', 'mis'):
+            raise ValueError("select must be one of 'damaging', 'lof' or 'mis'")
+        if panel is None and (genefile or genderfile):
+            panel = GenePanel(genefile=genefile, genderfile=genderfile)
+
+        if pipeline is None:
+            pipeline = FilterPipeline(comb_spec(
+                FILTER=FILTER, DP=DP, QD=QD, MQ=MQ,
+                innerfreqfile=innerfreqfile, KG=KG, EXAC=EXAC, GNOMAD=GNOMAD, SWEGEN=SWEGEN,
+                criteria=criteria, INNER=INNER
+            ), innerfreq=load_inner_freq(innerfreqfile) if innerfreqfile else None, lof_terms=lof_terms)
         else:
-            freq[self.sample] = self.variant[self.sample]
-
-        damaging_sel[self.sample] = {
-            key: self.variant[self.sample][key]
-            for key in self.variant[self.sample]
-            if key in quality[self.sample] and key in freq[self.sample] and key in damaging[self.sample]
-        }
-        lof_sel[self.sample] = {
-            key: self.variant[self.sample][key]
-            for key in self.variant[self.sample]
-            if key in quality[self.sample] and key in freq[self.sample] and key in lof[self.sample]
-        }
-        mis_sel[self.sample] = {
-            key: self.variant[self.sample][key]
-            for key in self.variant[self.sample]
-            if key in quality[self.sample] and key in freq[self.sample] and key in mis_damage[self.sample]
-        }
-
-        return damaging_sel, lof_sel, mis_sel
+            # split the accepted variants with the missense algorithms and terms of the pipeline itself
+            if pipeline.missense_criteria() is not None:
+                criteria = pipeline.missense_criteria()
+            if lof_terms is None:
+                lof_terms = pipeline.lof_terms
+
+        if csq_columns == 'auto':
+            csq_columns = pipeline.csq_columns() + [
+                CRITERIA_VEP_COLUMNS[criterion] for criterion in criteria if criterion in CRITERIA_VEP_COLUMNS
+            ]
+            if panel is not None:
+                csq_columns.append('Gene')
+
+        vcf = open_vcf(infile, regions=regions, bedfile=bedfile, prefetch=prefetch,
+                       prefetch_chunk_size=prefetch_chunk_size)
+        try:
+            metadata, sample, next_line = read_vcf_header(vcf)
+            samples = metadata.header[9:]
+            while not next_line.startswith('#'):
+                variant_line = next_line.split('\t')
+                if len(variant_line) != len(metadata.header):
+                    break
+                for key, variant in read_variant(line=next_line, parser=metadata, record=record,
+                                                 csq_columns=csq_columns, typed_info=typed_info,
+                                                 malformed_info=malformed_info).items():
+                    if not pipeline(key, variant):
+                        continue
+                    lof, mis_damage = damaging_check(variant, criteria=criteria, lof_terms=lof_terms)
+                    if select == 'damaging' and not (lof or mis_damage) or \
+                            select == 'lof' and not lof or select == 'mis' and not mis_damage:
+                        continue
+                    if len(samples) == 1:
+                        if panel is None or panel.match(sample, key, variant):
+                            yield sample, key, variant
+                        continue
+                    for sample_id, gt in zip(samples, read_genotypes(variant_line)):
+                        if is_carrier(gt):
+                            sample_var = sample_variant(variant, gt)
+                            if panel is None or panel.match(sample_id, key, sample_var):
+                                yield sample_id, key, sample_var
+                next_line = vcf.readline().rstrip()
+        finally:
+            vcf.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# __author__ = 'Danyang Li'
+# __date__ = 2020-04-02
+
+import os
+import pickle
+import hashlib
+import tempfile
+
+CACHE_VERSION = 2
+
+
+def file_digest(infile):
+    """
+    Content hash (BLAKE2b) of a file
+
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(infile, mode='rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class VcfCache(object):
+    """
+    On-disk cache of parsed vcf files. Each vcf file has one binary cache file, holding a small header
+    (path, size, modification time and content hash of the vcf file) followed by the parsed variants.
+    A cache file is used when size and modification time match, or when only the modification time changed
+    but the content hash is the same; otherwise the vcf file is parsed again and the cache file is rebuilt.
+    A file rewritten with the same size and modification time (e.g. within the resolution of the file system
+    clock) is only detected with verify, which hashes the vcf file on every load.
+    When the cache grows beyond max_size_mb, the least recently used cache files are removed.
+    Cache files are pickles, loading one can run arbitrary code: cache_dir must only be writable by trusted users.
+    Arguments:
+        cache_dir: directory of the cache files, created if needed;
+        max_size_mb: maximum total size of the cache files in MB, no limit when None;
+        verify: compare the content hash on every load, not only when the modification time changed
+
+    """
+
+    def __init__(self, cache_dir, max_size_mb=None, verify=False):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self.verify = verify
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_file(self, infile, record='dict'):
+        """
+        Cache file of a vcf file parsed with a record type
+
+        """
+        name = hashlib.sha1('{0}\t{1}'.format(os.path.abspath(infile), record).encode()).hexdigest()
+        return os.path.join(self.cache_dir, name + '.vcfcache')
+
+    def load(self, infile, record='dict'):
+        """
+        Parsed variants of a vcf file, None if there is no valid cache file
+        Arguments:
+            infile: vcf file;
+            record: variant record type
+        Return:
+            object saved by save(), or None
+
+        """
+        cache_file = self.cache_file(infile, record)
+        if not os.path.exists(cache_file):
+            return None
+        stat = os.stat(infile)
+        try:
+            with open(cache_file, mode='rb') as handle:
+                header = pickle.load(handle)
+                if header.get('version') != CACHE_VERSION or header['size'] != stat.st_size:
+                    return None
+                if header['mtime'] != stat.st_mtime_ns or self.verify:
+                    if header['digest'] != file_digest(infile):
+                        return None
+                parsed = pickle.load(handle)
+                if header['mtime'] != stat.st_mtime_ns:
+                    # same content, later loads skip the hash again
+                    header['mtime'] = stat.st_mtime_ns
+                    self._write(cache_file, header, parsed)
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError):
+            return None
+        # modification time of the cache file marks its last use for eviction
+        os.utime(cache_file)
+        self.evict()
+        return parsed
+
+    def save(self, infile, parsed, record='dict'):
+        """
+        Write parsed variants of a vcf file to its cache file and evict old cache files
+        Arguments:
+            infile: vcf file;
+            parsed: parsed variants;
+            record: variant record type
+
+        """
+        stat = os.stat(infile)
+        header = {
+            'version': CACHE_VERSION, 'path': os.path.abspath(infile), 'record': record,
+            'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'digest': file_digest(infile)
+        }
+        self._write(self.cache_file(infile, record), header, parsed)
+        self.evict()
+
+    def _write(self, cache_file, header, parsed):
+        handle, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(handle, mode='wb') as cache:
+                pickle.dump(header, cache, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(parsed, cache, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    def evict(self):
+        """
+        Remove the least recently used cache files until the cache fits in max_size_mb
+
+        """
+        if self.max_size_mb is None:
+            return
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.vcfcache'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # removed by another process sharing the cache
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.max_size_mb * 1024 * 1024:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Remove all cache files
+
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.vcfcache'):
+                os.remove(os.path.join(self.cache_dir, name))